@@ -0,0 +1,261 @@
+"""
+采集时的趋势规则判断
+
+每条新样本到达时更新该序列的每日首个值（窗口锚点），按 analyze.py 相同的
+规则（determine_change）计算 1d/3d/1w/1m 标记，每个样本只需常数次查找。
+标记发生变化时通过 notify.alert() 推送（同一规则的提醒合并为摘要）。
+
+配置读取 video_config.conf 的 [alerts] 段:
+
+    [alerts]
+    enabled = true
+    notify_marks = 1d_Rising,3d_Rising,1w_Rising,1m_Rising,1d_Falling,3d_Falling,1w_Falling,1m_Falling
+"""
+import configparser
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 比较窗口：(天数, 标记前缀)，顺序与 analyze.py 一致
+TIME_FRAMES = [(1, '1d'), (3, '3d'), (7, '1w'), (30, '1m')]
+# 锚点保留天数
+KEEP_DAYS = 31
+
+# 各类序列对应的 CSV 文件、数值列和 analyze.py 的输出文件
+SERIES_KINDS = {
+    'view': {'suffix': '_views.csv', 'column': '播放量', 'changes_file': 'changes_view.json'},
+    'follower': {'suffix': '_follower.csv', 'column': '粉丝数', 'changes_file': 'changes_follower.json'},
+}
+
+DEFAULT_NOTIFY_MARKS = [f'{frame}_{trend}' for trend in ('Rising', 'Falling') for _, frame in TIME_FRAMES]
+
+# 定义数据变化的判断标准
+def determine_change(value, time_frame, is_view=True):
+    if is_view:  # 如果是播放量
+        if time_frame == '1d':
+            if value > 5000:
+                return '1d_Rising'
+            elif value > 0:
+                return 'climbing'
+            elif value < 0:
+                return '1d_Falling'  # 播放量减少
+        elif time_frame == '3d':
+            if value > 10000:
+                return '3d_Rising'
+            elif value > 0:
+                return 'climbing'
+            elif value < 0:
+                return '3d_Falling'  # 播放量减少
+        elif time_frame == '1w':
+            if value > 20000:
+                return '1w_Rising'
+            elif value > 0:
+                return 'climbing'
+            elif value < 0:
+                return '1w_Falling'  # 播放量减少
+        elif time_frame == '1m':
+            if value > 50000:
+                return '1m_Rising'
+            elif value > 0:
+                return 'climbing'
+            elif value < 0:
+                return '1m_Falling'  # 播放量减少
+    else:  # 如果是粉丝量
+        if time_frame == '1d':
+            if value > 2000:
+                return '1d_Rising'
+            elif value < 0 and value >= -200:
+                return 'Sliding'  # 粉丝量波动
+            elif value < -200:
+                return '1d_Falling'  # 粉丝量减少
+            elif value > 0:
+                return 'climbing'
+            elif value == 0:
+                return 'No Change'  # 粉丝量没有变化
+        elif time_frame == '3d':
+            if value > 5000:
+                return '3d_Rising'
+            elif value < 0 and value >= -200:
+                return 'Sliding'  # 粉丝量波动
+            elif value < -200:
+                return '3d_Falling'  # 粉丝量减少
+            elif value > 0:
+                return 'climbing'
+            elif value == 0:
+                return 'No Change'  # 粉丝量没有变化
+        elif time_frame == '1w':
+            if value > 10000:
+                return '1w_Rising'
+            elif value < 0 and value >= -200:
+                return 'Sliding'  # 粉丝量波动
+            elif value < -200:
+                return '1w_Falling'  # 粉丝量减少
+            elif value > 0:
+                return 'climbing'
+            elif value == 0:
+                return 'No Change'  # 粉丝量没有变化
+        elif time_frame == '1m':
+            if value > 50000:
+                return '1m_Rising'
+            elif value < 0 and value >= -200:
+                return 'Sliding'  # 粉丝量波动
+            elif value < -200:
+                return '1m_Falling'  # 粉丝量减少
+            elif value > 0:
+                return 'climbing'
+            elif value == 0:
+                return 'No Change'  # 粉丝量没有变化
+    
+    return None
+
+
+def load_notify():
+    """导入青龙通知模块，找不到时返回 None"""
+    try:
+        import notify
+        return notify
+    except ImportError:
+        pass
+    qinglong_dir = Path(__file__).resolve().parent.parent / 'qinglong'
+    if qinglong_dir.is_dir():
+        sys.path.append(str(qinglong_dir))
+        try:
+            import notify
+            return notify
+        except ImportError:
+            pass
+    return None
+
+
+def parse_time(value):
+    """解析 CSV 中的时间列"""
+    for fmt in ('%Y-%m-%d %H:%M', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+class SeriesState:
+    """单个序列的窗口锚点与当前标记"""
+    __slots__ = ('daily_first', 'mark')
+
+    def __init__(self, mark=None):
+        self.daily_first = {}  # 日期 -> 当天第一条记录的值
+        self.mark = mark
+
+    def add(self, day, value):
+        if day not in self.daily_first:
+            self.daily_first[day] = value
+            # 新的一天才清理过期锚点
+            cutoff = day - timedelta(days=KEEP_DAYS)
+            for old in [d for d in self.daily_first if d < cutoff]:
+                del self.daily_first[old]
+
+
+class AlertEngine:
+    """采集时的趋势规则引擎"""
+
+    def __init__(self, kind, notify_marks=None, notifier=None):
+        self.kind = kind
+        self.column = SERIES_KINDS[kind]['column']
+        self.suffix = SERIES_KINDS[kind]['suffix']
+        self.is_view = kind == 'view'
+        self.notify_marks = set(notify_marks or DEFAULT_NOTIFY_MARKS)
+        self.notifier = notifier
+        self.series = {}
+        self.lock = threading.Lock()
+        self.known_marks = self._load_known_marks(SERIES_KINDS[kind]['changes_file'])
+
+    @staticmethod
+    def _load_known_marks(filename):
+        """以 analyze.py 上次的结果作为初始标记，重启后不重复推送"""
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _bootstrap(self, target_id):
+        """首次见到该序列时，从已有 CSV 读取最近 KEEP_DAYS 天的每日首值"""
+        state = SeriesState(self.known_marks.get(str(target_id)))
+        filename = f'{target_id}{self.suffix}'
+        if os.path.exists(filename):
+            try:
+                with open(filename, 'r', encoding='utf-8-sig', newline='') as f:
+                    for row in csv.DictReader(f):
+                        ts = parse_time(row.get('时间', ''))
+                        value = row.get(self.column)
+                        if ts is None or not value:
+                            continue
+                        value = int(float(value))
+                        if value:
+                            state.add(ts.date(), value)
+            except (OSError, ValueError) as e:
+                logging.warning(f"读取 {filename} 初始化趋势锚点失败: {e}")
+        return state
+
+    def evaluate(self, state, day, value):
+        """按 analyze.py 的规则计算标记：取最后一个有结果的时间窗口"""
+        mark = None
+        for days, time_frame in TIME_FRAMES:
+            anchor = state.daily_first.get(day - timedelta(days=days))
+            if anchor is None:
+                continue
+            result = determine_change(value - anchor, time_frame, is_view=self.is_view)
+            if result:
+                mark = result
+        return mark
+
+    def observe(self, target_id, sample_time, value):
+        """
+        处理一条新样本，标记变化时推送并返回新标记，否则返回 None
+
+        与 analyze.py 一样忽略值为0的样本（视为采集失败）。
+        """
+        if not value:
+            return None
+        target_id = str(target_id)
+        with self.lock:
+            state = self.series.get(target_id)
+            if state is None:
+                state = self._bootstrap(target_id)
+                self.series[target_id] = state
+            day = sample_time.date()
+            state.add(day, value)
+            mark = self.evaluate(state, day, value)
+            if mark is None or mark == state.mark:
+                return None
+            previous, state.mark = state.mark, mark
+        self.emit(target_id, previous, mark, value)
+        return mark
+
+    def emit(self, target_id, previous, mark, value):
+        name = '视频' if self.is_view else '用户'
+        message = f"{name} {target_id} 趋势变化: {previous or '无'} -> {mark}（当前{self.column} {value}）"
+        logging.info(message)
+        if mark in self.notify_marks and self.notifier is not None:
+            try:
+                self.notifier.alert(mark, f"{name} {target_id} {mark}", message)
+            except Exception as e:
+                logging.error(f"推送趋势提醒失败: {e}")
+
+
+def create_engine(kind, config_file='video_config.conf'):
+    """按 [alerts] 配置创建规则引擎，未启用时返回 None"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if not config.getboolean('alerts', 'enabled', fallback=False):
+        return None
+    marks = config.get('alerts', 'notify_marks', fallback='')
+    notify_marks = [m.strip() for m in marks.split(',') if m.strip()] or None
+    notifier = load_notify()
+    if notifier is None:
+        print("未找到 notify.py，趋势变化只写入日志")
+    return AlertEngine(kind, notify_marks, notifier)
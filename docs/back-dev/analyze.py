@@ -5,6 +5,11 @@ from datetime import datetime, timedelta
 import configparser
 import time  # 导入time模块以实现定期运行
 
+import anomaly
+import profiler
+import rollup
+from alert_rules import determine_change
+
 # 读取配置文件
 def read_config():
     config = configparser.ConfigParser()
@@ -25,84 +30,63 @@ def read_config():
     else:
         raise ValueError("不支持的时间单位")
 
-# 定义数据变化的判断标准
-def determine_change(value, time_frame, is_view=True):
-    if is_view:  # 如果是播放量
-        if time_frame == '1d':
-            if value > 5000:
-                return '1d_Rising'
-            elif value > 0:
-                return 'climbing'
-            elif value < 0:
-                return '1d_Falling'  # 播放量减少
-        elif time_frame == '3d':
-            if value > 10000:
-                return '3d_Rising'
-            elif value > 0:
-                return 'climbing'
-            elif value < 0:
-                return '3d_Falling'  # 播放量减少
-        elif time_frame == '1w':
-            if value > 20000:
-                return '1w_Rising'
-            elif value > 0:
-                return 'climbing'
-            elif value < 0:
-                return '1w_Falling'  # 播放量减少
-        elif time_frame == '1m':
-            if value > 50000:
-                return '1m_Rising'
-            elif value > 0:
-                return 'climbing'
-            elif value < 0:
-                return '1m_Falling'  # 播放量减少
-    else:  # 如果是粉丝量
-        if time_frame == '1d':
-            if value > 2000:
-                return '1d_Rising'
-            elif value < 0 and value >= -200:
-                return 'Sliding'  # 粉丝量波动
-            elif value < -200:
-                return '1d_Falling'  # 粉丝量减少
-            elif value > 0:
-                return 'climbing'
-            elif value == 0:
-                return 'No Change'  # 粉丝量没有变化
-        elif time_frame == '3d':
-            if value > 5000:
-                return '3d_Rising'
-            elif value < 0 and value >= -200:
-                return 'Sliding'  # 粉丝量波动
-            elif value < -200:
-                return '3d_Falling'  # 粉丝量减少
-            elif value > 0:
-                return 'climbing'
-            elif value == 0:
-                return 'No Change'  # 粉丝量没有变化
-        elif time_frame == '1w':
-            if value > 10000:
-                return '1w_Rising'
-            elif value < 0 and value >= -200:
-                return 'Sliding'  # 粉丝量波动
-            elif value < -200:
-                return '1w_Falling'  # 粉丝量减少
-            elif value > 0:
-                return 'climbing'
-            elif value == 0:
-                return 'No Change'  # 粉丝量没有变化
-        elif time_frame == '1m':
-            if value > 50000:
-                return '1m_Rising'
-            elif value < 0 and value >= -200:
-                return 'Sliding'  # 粉丝量波动
-            elif value < -200:
-                return '1m_Falling'  # 粉丝量减少
-            elif value > 0:
-                return 'climbing'
-            elif value == 0:
-                return 'No Change'  # 粉丝量没有变化
+# 比较窗口：天数 -> determine_change 的时间段
+WINDOWS = list(zip([1, 3, 7, 30], ['1d', '3d', '1w', '1m']))
+
+def csv_compare(filename, column):
+    """
+    从原始CSV取最新值和比较日的第一条记录：
+    返回 (最新值, {天数: 当天第一条的值})
+    """
+    df = pd.read_csv(filename)
+    df['时间'] = pd.to_datetime(df['时间'])  # 确保时间列被解析为日期时间
+    df.dropna(subset=['时间', column], inplace=True)  # 删除空行（旧的行没有“抓取时间”列）
+    latest_record = df.iloc[-1]
+    
+    # 检查最新记录是否为0
+    if latest_record[column] == 0:
+        latest_record = df.iloc[-2]  # 使用上一条记录
     
-    return None
+    date_latest = latest_record['时间']
+    firsts = {}
+    for days, _ in WINDOWS:
+        date_compare = date_latest - timedelta(days=days)
+        record = df[df['时间'].dt.date == date_compare.date()]
+        if not record.empty:
+            firsts[days] = record.iloc[0][column]
+    return latest_record[column], firsts
+
+def first_sample_time(filename):
+    """CSV 中第一条记录的时间，没有记录时返回 None"""
+    with open(filename, 'r', encoding='utf-8-sig') as f:
+        f.readline()
+        line = f.readline()
+    return line.split(',', 1)[0].strip() or None
+
+def rollup_compare(rollups, kind, target, metric, filename):
+    """
+    从按天汇总取同样的结果，只读取天数级别的行；
+    没有汇总、汇总晚于 CSV 的第一条记录开始（启用 [rollup] 后没有执行 rollup.py rebuild，
+    较早的比较日不在汇总中）或最新值为0（需要回退到上一条原始记录）时返回 None
+    """
+    since = rollups.covered_since(kind, target, metric)
+    first_time = first_sample_time(filename)
+    if since is None or first_time is None or since > rollup.wall_seconds(first_time):
+        return None
+    days_rows = rollups.query(kind, target, metric, '1d')
+    if not days_rows:
+        return None
+    latest_bucket, _, latest_value = days_rows[-1][:3]
+    if latest_value == 0:
+        return None
+    latest_value = rollup.as_number(latest_value)
+    first_by_bucket = {row[0]: rollup.as_number(row[1]) for row in days_rows}
+    firsts = {}
+    for days, _ in WINDOWS:
+        bucket = latest_bucket - days * rollup.RESOLUTIONS['1d']
+        if bucket in first_by_bucket:
+            firsts[days] = first_by_bucket[bucket]
+    return latest_value, firsts
 
 # 读取CSV文件并分析数据
 def analyze_data():
@@ -111,68 +95,37 @@ def analyze_data():
     
     # 获取整理间隔和调试模式
     interval, dev_mode = read_config()
+    # 启用 [rollup] 时优先使用按天汇总，不再读取全部原始样本
+    rollups = rollup.from_config('video_config.conf')
 
     # 获取当前目录下的所有CSV文件
     for filename in os.listdir('.'):
         if filename.endswith('follower.csv'):
             print(f"正在分析粉丝数据文件: {filename}")  # 输出正在分析的文件名
-            df_follower = pd.read_csv(filename)
-            df_follower['时间'] = pd.to_datetime(df_follower['时间'])  # 确保时间列被解析为日期时间
-            df_follower.dropna(inplace=True)  # 删除空行
-            user_id = filename.split('_')[0]
-            latest_record = df_follower.iloc[-1]
-            
-            # 检查最新记录的粉丝数是否为0
-            if latest_record['粉丝数'] == 0:
-                latest_record = df_follower.iloc[-2]  # 使用上一条记录
-            
-            date_latest = latest_record['时间']  # 使用正确的列名
-            
-            # 查找1天、3天、一周和一个月前的记录
-            for days, time_frame in zip([1, 3, 7, 30], ['1d', '3d', '1w', '1m']):
-                date_compare = date_latest - timedelta(days=days)
-                record = df_follower[df_follower['时间'].dt.date == date_compare.date()]  # 使用正确的列名
-                if not record.empty:
-                    earliest_record = record.iloc[0]
-                    change = latest_record['粉丝数'] - earliest_record['粉丝数']  # 最新减去之前
-                    mark = determine_change(change, time_frame, is_view=False)
-                    
-                    # 调试输出
-                    if dev_mode:
-                        print(f"比对粉丝数据: {latest_record['粉丝数']} - {earliest_record['粉丝数']} = {change}, 标记: {mark}")
-                    
-                    if mark:
-                        changes_follower[f"{user_id}"] = mark
-
+            kind, metric, column, label, is_view, changes = 'follower', 'follower', '粉丝数', '粉丝', False, changes_follower
         elif filename.endswith('views.csv'):
             print(f"正在分析播放量数据文件: {filename}")  # 输出正在分析的文件名
-            df_views = pd.read_csv(filename)
-            df_views['时间'] = pd.to_datetime(df_views['时间'])  # 确保时间列被解析为日期时间
-            df_views.dropna(inplace=True)  # 删除空行
-            video_id = filename.split('_')[0]
-            latest_record = df_views.iloc[-1]
+            kind, metric, column, label, is_view, changes = 'video', 'view', '播放量', '播放量', True, changes_view
+        else:
+            continue
+        target = filename.split('_')[0]
+        
+        compared = rollup_compare(rollups, kind, target, metric, filename) if rollups else None
+        latest_value, firsts = compared or csv_compare(filename, column)
+        
+        # 查找1天、3天、一周和一个月前的记录
+        for days, time_frame in WINDOWS:
+            if days not in firsts:
+                continue
+            change = latest_value - firsts[days]  # 最新减去之前
+            mark = determine_change(change, time_frame, is_view=is_view)
             
-            # 检查最新记录的播放量是否为0
-            if latest_record['播放量'] == 0:
-                latest_record = df_views.iloc[-2]  # 使用上一条记录
+            # 调试输出
+            if dev_mode:
+                print(f"比对{label}数据: {latest_value} - {firsts[days]} = {change}, 标记: {mark}")
             
-            date_latest = latest_record['时间']  # 使用正确的列名
-            
-            # 查找1天、3天、一周和一个月前的记录
-            for days, time_frame in zip([1, 3, 7, 30], ['1d', '3d', '1w', '1m']):
-                date_compare = date_latest - timedelta(days=days)
-                record = df_views[df_views['时间'].dt.date == date_compare.date()]  # 使用正确的列名
-                if not record.empty:
-                    earliest_record = record.iloc[0]
-                    change = latest_record['播放量'] - earliest_record['播放量']  # 最新减去之前
-                    mark = determine_change(change, time_frame, is_view=True)
-                    
-                    # 调试输出
-                    if dev_mode:
-                        print(f"比对播放量数据: {latest_record['播放量']} - {earliest_record['播放量']} = {change}, 标记: {mark}")
-                    
-                    if mark:
-                        changes_view[f"{video_id}"] = mark
+            if mark:
+                changes[f"{target}"] = mark
 
     # 保存结果到JSON文件
     with open('changes_view.json', 'w', encoding='utf-8') as f:
@@ -183,9 +136,15 @@ def analyze_data():
         json.dump({"更新时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), **changes_follower}, f, ensure_ascii=False, indent=4)
     print("粉丝变化结果已保存到 changes_follower.json")  # 输出保存结果的状态
 
+    # 全部序列的短时异常检测，结果写入 anomalies_*.json
+    anomaly_settings = anomaly.read_settings('video_config.conf')
+    if anomaly_settings['enabled']:
+        anomaly.run('video_config.conf', settings=anomaly_settings)
+
 if __name__ == "__main__":
     try:
         interval, dev_mode = read_config()  # 获取整理间隔和调试模式
+        profiler.install('analyze')
         while True:  # 循环运行
             analyze_data()
             time.sleep(interval.total_seconds())  # 等待指定的时间间隔 
@@ -0,0 +1,200 @@
+"""
+全部序列的异常检测（一次向量化计算）
+
+determine_change 按固定阈值判断长期趋势，这里找的是短时间内的异常跳变，
+例如刷播放量或粉丝突然大量流失。所有序列最近 window_hours 小时的数据对齐到同一个
+按小时的网格，组成 (序列数, 小时数) 的矩阵，逐小时增量的中位数和 MAD
+（中位数绝对偏差）一次算出，最近 recent_hours 小时的增量按稳健 z 分数判断：
+
+    z = 0.6745 * (增量 - 中位数) / MAD
+
+|z| 超过 threshold 且偏离中位数至少 min_change 时标记为 spike（暴涨）或 drop（暴跌）。
+
+启用 [rollup] 时矩阵直接由 1h 汇总的一次查询得到（同一进程中之后每轮只查询新增的
+小时），否则逐个读取 CSV。
+结果写入 anomalies_view.json 和 anomalies_follower.json，与 changes_view.json 放在一起。
+
+配置读取 video_config.conf 的 [anomaly] 段，analyze.py 每轮分析后执行:
+
+    [anomaly]
+    enabled = true
+    window_hours = 168
+    recent_hours = 1
+    threshold = 6
+    min_change = 10
+
+手动执行（--end 指定网格的结束时间，用于检查历史数据）:
+    python anomaly.py --end "2025-06-01 00:00"
+"""
+import argparse
+import configparser
+import json
+from datetime import datetime
+
+import numpy as np
+
+import retention
+import rollup
+import sampling_grid
+
+HOUR = 3600
+# (种类, 指标, 输出文件)
+TARGETS = [
+    ('video', 'view', 'anomalies_view.json'),
+    ('follower', 'follower', 'anomalies_follower.json'),
+]
+
+
+def grid_end(end=None):
+    """网格结束于最近一个完整小时，避免把未结束的小时当成增量骤降"""
+    seconds = rollup.wall_seconds(end or datetime.now())
+    return seconds - seconds % HOUR
+
+
+class HourlyMatrix:
+    """
+    由 1h 汇总构造的 (目标数, hours + 1) 矩阵，每个元素为该小时最后一个值。
+    analyze.py 循环运行时在多轮之间保留，之后每轮只查询新增的几个小时。
+    """
+
+    def __init__(self, kind, metric, hours):
+        self.kind = kind
+        self.metric = metric
+        self.hours = hours
+        self.end = None
+        self.targets = []
+        self.rows = {}
+        self.matrix = np.empty((0, hours + 1))
+
+    def refresh(self, rollups, end):
+        start = end - (self.hours + 1) * HOUR
+        if self.end is None or end < self.end or end - self.end >= self.hours * HOUR:
+            self.matrix[:] = np.nan
+            fetch_from = start
+        else:
+            shift = (end - self.end) // HOUR
+            if shift:
+                self.matrix[:, :-shift] = self.matrix[:, shift:]
+                self.matrix[:, -shift:] = np.nan
+            # 上一轮的最后一个小时可能还有迟到的样本，重新读取
+            fetch_from = max(start, self.end - 2 * HOUR)
+        self.end = end
+
+        rows = rollups.query_all(self.kind, self.metric, '1h', fetch_from, end - HOUR)
+        count = len(rows)
+        if not count:
+            return self.targets, self.matrix
+        known = len(self.rows)
+        index = np.fromiter((self.rows.setdefault(row[0], len(self.rows)) for row in rows), np.int64, count)
+        buckets = np.fromiter((row[1] for row in rows), np.int64, count)
+        values = np.fromiter((row[2] for row in rows), np.float64, count)
+        if len(self.rows) > known:
+            self.targets = list(self.rows)
+            added = np.full((len(self.rows) - known, self.hours + 1), np.nan)
+            self.matrix = np.vstack([self.matrix, added])
+        self.matrix[index, (buckets - start) // HOUR] = values
+        return self.targets, self.matrix
+
+
+_matrices = {}
+
+
+def matrix_from_rollups(rollups, kind, metric, end, hours):
+    """由 1h 汇总构造矩阵: (目标列表, 每小时最后一个值的矩阵)，矩阵在调用之间复用"""
+    key = (rollups.path, kind, metric, hours)
+    if key not in _matrices:
+        _matrices[key] = HourlyMatrix(kind, metric, hours)
+    return _matrices[key].refresh(rollups, end)
+
+
+def matrix_from_csv(kind, metric, end, hours, data_dir='.', archive_dir=None):
+    """逐个读取 CSV，每个序列取每小时最后一个样本放到同一网格上"""
+    start = end - (hours + 1) * HOUR
+    return sampling_grid.load_matrix(kind, metric, start, end, HOUR, data_dir=data_dir, archive_dir=archive_dir)
+
+
+def detect(targets, matrix, recent=1, threshold=6.0, min_change=10.0):
+    """
+    对 (序列数, 小时数 + 1) 的累计值矩阵做稳健 z 分数检测，
+    返回 {目标: {mark, z, delta, median, hour}}，hour 为最近窗口中的第几个小时
+    """
+    if not len(targets):
+        return {}
+    with np.errstate(invalid='ignore'):
+        deltas = np.diff(matrix, axis=1)
+    history, latest = deltas[:, :-recent], deltas[:, -recent:]
+    valid = np.isfinite(history).any(axis=1)
+    history = history[valid]
+    latest = latest[valid]
+    names = np.asarray(targets)[valid]
+    if not len(names):
+        return {}
+    median = np.nanmedian(history, axis=1)
+    mad = np.nanmedian(np.abs(history - median[:, None]), axis=1)
+    # MAD 为 0（平稳序列）时按 1 计，避免除零
+    scale = np.maximum(mad, 1.0)
+    with np.errstate(invalid='ignore'):
+        z = 0.6745 * (latest - median[:, None]) / scale[:, None]
+        flagged = (np.abs(z) > threshold) & (np.abs(latest - median[:, None]) >= min_change)
+    # 每个序列只报告最近窗口中 |z| 最大的一个小时
+    z_abs = np.where(flagged, np.abs(z), -1.0)
+    hit = np.flatnonzero(flagged.any(axis=1))
+    worst = z_abs[hit].argmax(axis=1)
+    anomalies = {}
+    for row, col in zip(hit, worst):
+        anomalies[str(names[row])] = {
+            'mark': 'spike' if z[row, col] > 0 else 'drop',
+            'z': round(float(z[row, col]), 1),
+            'delta': float(latest[row, col]),
+            'median': float(median[row]),
+            'hour': int(col) - recent,
+        }
+    return anomalies
+
+
+def hour_label(end, offset):
+    """detect 返回的 hour（-1 为最后一个完整小时）对应的小时开始时间"""
+    return rollup.format_bucket(end + offset * HOUR)[:16]
+
+
+def read_settings(config_file='video_config.conf'):
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    return {
+        'enabled': config.getboolean('anomaly', 'enabled', fallback=False),
+        'window_hours': config.getint('anomaly', 'window_hours', fallback=168),
+        'recent_hours': config.getint('anomaly', 'recent_hours', fallback=1),
+        'threshold': config.getfloat('anomaly', 'threshold', fallback=6.0),
+        'min_change': config.getfloat('anomaly', 'min_change', fallback=10.0),
+    }
+
+
+def run(config_file='video_config.conf', end=None, settings=None):
+    """检测全部序列并写出 anomalies_*.json，返回 {输出文件: 异常数}"""
+    settings = settings or read_settings(config_file)
+    rollups = rollup.from_config(config_file)
+    archive_dir = retention.archive_dir_from_config(config_file)
+    end = grid_end(end)
+    hours = settings['window_hours']
+    counts = {}
+    for kind, metric, output in TARGETS:
+        if rollups:
+            targets, matrix = matrix_from_rollups(rollups, kind, metric, end, hours)
+        else:
+            targets, matrix = matrix_from_csv(kind, metric, end, hours, archive_dir=archive_dir)
+        anomalies = detect(targets, matrix, settings['recent_hours'], settings['threshold'], settings['min_change'])
+        for info in anomalies.values():
+            info['time'] = hour_label(end, info.pop('hour'))
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({"更新时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), **anomalies},
+                      f, ensure_ascii=False, indent=4)
+        counts[output] = len(anomalies)
+        print(f"{len(targets)} 个序列中发现 {len(anomalies)} 个异常，已保存到 {output}")
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='全部序列的异常检测')
+    parser.add_argument('--end', help='网格结束时间，默认为当前时间')
+    args = parser.parse_args()
+    run(end=datetime.fromisoformat(args.end) if args.end else None)
@@ -0,0 +1,196 @@
+"""
+采集热点路径微基准与回归门禁
+
+覆盖 WBI 签名、fetch_data_for_video 的行组装（含 "1000+" 解析）、
+determine_change、两类 CSV 写入，以及 analyze_data 在一个月合成数据上的耗时。
+结果与 benchmarks/baseline.json 比较，任一路径慢于基线超过阈值时以非零状态退出。
+
+基线与机器相关，换机器或升级 Python 后先用 --save 重新生成。
+
+用法:
+    python benchmarks/bench_hotpaths.py               # 与基线比较
+    python benchmarks/bench_hotpaths.py --save        # 写入新基线
+    python benchmarks/bench_hotpaths.py --threshold 0.5 --filter csv
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACK_DEV = os.path.dirname(BENCH_DIR)
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+sys.path.insert(0, BACK_DEV)
+
+# 默认允许比基线慢 30%
+DEFAULT_THRESHOLD = 0.3
+
+# analyze_data 的合成规模：一个月、每5分钟一条
+SERIES_DAYS = 30
+SERIES_STEP_MINUTES = 5
+SERIES_FILES = 10
+
+
+def write_month_series(filename, header, value_column, start, rng):
+    """生成一个月的累计计数序列"""
+    steps = SERIES_DAYS * 24 * 60 // SERIES_STEP_MINUTES
+    value = rng.randint(1000, 100000)
+    with open(filename, 'w', encoding='utf-8-sig') as f:
+        f.write(','.join(header) + '\n')
+        for i in range(steps):
+            value += rng.randint(0, 20)
+            row = [(start + timedelta(minutes=i * SERIES_STEP_MINUTES)).strftime('%Y-%m-%d %H:%M')]
+            row += [str(value) if column == value_column else '0' for column in header[1:]]
+            f.write(','.join(row) + '\n')
+
+
+def prepare_workdir(workdir):
+    """写入 analyze_data 所需的配置和合成CSV"""
+    with open(os.path.join(workdir, 'video_config.conf'), 'w', encoding='utf-8') as f:
+        f.write('[analyze]\ninterval = 2\ninterval_unit = hours\ndev_mode = false\n')
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    view_header = ['时间', '播放量', '在线观看人数', '点赞', '投币', '收藏', '分享', '弹幕']
+    for i in range(SERIES_FILES // 2):
+        write_month_series(os.path.join(workdir, f'BV{i:010d}_views.csv'), view_header, '播放量', start, rng)
+        write_month_series(os.path.join(workdir, f'{10000 + i}_follower.csv'), ['时间', '粉丝数'], '粉丝数', start, rng)
+
+
+def build_cases():
+    """返回 {名称: 无参可调用对象}，依赖的模块在临时目录中导入"""
+    import alert_rules
+    import analyze
+    import dynamic_comment_monitor
+    import dynamic_monitor
+    import main
+
+    api = dynamic_monitor.BiliAPI.__new__(dynamic_monitor.BiliAPI)
+    api.wbi_keys = ('7cd084941338484aae1ad9425b84077c', '4932caff0ff746eab6f01bf08b70ac45')
+    api.wbi_keys_time = time.time() + 10 ** 9  # 永不过期，避免访问网络
+    detail_params = {'id': '1049320642121302020', 'timezone_offset': -480,
+                     'features': 'itemOpusStyle,opusBigCover,onlyfansVote'}
+
+    sample_time = datetime(2024, 1, 1, 12, 0)
+    stats = {'view': 123456, 'like': 1213, 'coin': 910, 'favorite': 678, 'share': 11, 'danmaku': 321}
+    video_config = {'bvid': 'BV1xx411c7mD', 'cid': '2'}
+    row = main.build_row(sample_time, 1000, stats)
+
+    changes = [(value, frame, is_view) for value in (-5, 0, 3, 8000, 60000)
+               for frame in ('1d', '3d', '1w', '1m') for is_view in (True, False)]
+
+    def run_determine_change():
+        for value, frame, is_view in changes:
+            alert_rules.determine_change(value, frame, is_view)
+
+    monitor = dynamic_comment_monitor.CommentMonitor.__new__(dynamic_comment_monitor.CommentMonitor)
+    now = int(time.time())
+    comments = [{'ctime': now - i * 60, 'member': {'uname': f'用户{i}', 'mid': str(100000 + i)},
+                 'content': {'message': f'第{i}条评论\n换行内容'}} for i in range(20)]
+
+    return {
+        'get_mixin_key': lambda: api.get_mixin_key(*api.wbi_keys),
+        'sign_wbi': lambda: api.sign_wbi(dict(detail_params)),
+        'parse_online_total': lambda: main.parse_online_total('1000+', video_config['bvid']),
+        'build_row': lambda: main.build_row(sample_time, main.parse_online_total('1000+', 'BV'), stats),
+        'determine_change_x40': run_determine_change,
+        'append_to_csv': lambda: main.append_to_csv(row, video_config),
+        'save_comments_to_csv_x20': lambda: monitor.save_comments_to_csv(comments, 'bench_commentlist.csv'),
+        'analyze_data_month': analyze.analyze_data,
+    }
+
+
+def measure(func, repeat=5, min_time=0.2):
+    """返回单次调用的最短耗时（秒）"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    # autorange 的目标是 0.2 秒，这里按 min_time 调整
+    number = max(1, int(number * min_time / 0.2))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def format_seconds(seconds):
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:9.3f}ms"
+    return f"{seconds * 1e6:9.3f}us"
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE_FILE):
+        return None
+    with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def environment():
+    return {'python': platform.python_version(), 'machine': platform.machine(), 'system': platform.system(),
+            'processor': platform.processor() or platform.node()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='采集热点路径微基准')
+    parser.add_argument('--save', action='store_true', help='把本次结果写入基线')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='允许的相对变慢比例')
+    parser.add_argument('--filter', default='', help='只运行名称包含该字符串的用例')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bili-bench-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        prepare_workdir(workdir)
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+            cases = build_cases()
+            logging.disable(logging.CRITICAL)
+            results = {}
+            for name, func in cases.items():
+                if args.filter in name:
+                    results[name] = measure(func, repeat=args.repeat)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = load_baseline()
+    base_cases = baseline['cases'] if baseline else {}
+    if baseline and baseline.get('environment') != environment():
+        print(f"注意: 基线来自不同环境 {baseline.get('environment')}，比较结果仅供参考")
+
+    regressions = []
+    print(f"{'用例':<26}{'本次':>12}{'基线':>12}{'变化':>9}")
+    for name, seconds in results.items():
+        base = base_cases.get(name)
+        if base:
+            ratio = seconds / base - 1
+            status = '  回归' if ratio > args.threshold else ''
+            if status:
+                regressions.append(name)
+            print(f"{name:<26}{format_seconds(seconds):>12}{format_seconds(base):>12}{ratio:>+8.1%}{status}")
+        else:
+            print(f"{name:<26}{format_seconds(seconds):>12}{'-':>12}{'-':>9}")
+
+    if args.save:
+        cases = dict(base_cases)
+        cases.update(results)
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'saved': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                       'cases': cases}, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存到 {BASELINE_FILE}")
+        return 0
+
+    if regressions:
+        print(f"以下路径比基线慢 {args.threshold:.0%} 以上: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
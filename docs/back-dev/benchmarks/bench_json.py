@@ -0,0 +1,105 @@
+"""
+JSON 解码微基准
+
+对比 response.json() 完整解码与 fast_json.pluck() 按路径取字段，
+使用构造的 /x/web-interface/view 与动态详情响应（含合集、分P等大字段）。
+
+用法: python benchmarks/bench_json.py [次数]
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+
+import fast_json  # noqa: E402
+from main import VIEW_STAT_PATHS  # noqa: E402
+from dynamic_monitor import DETAIL_STAT_PATHS  # noqa: E402
+
+
+def make_view_payload(episodes=300):
+    """构造接近真实大小的视频详情响应"""
+    stat = {'aid': 1, 'view': 123456, 'danmaku': 321, 'reply': 45, 'favorite': 678,
+            'coin': 910, 'share': 11, 'like': 1213, 'now_rank': 0, 'his_rank': 0}
+    arc = {'aid': 1, 'videos': 1, 'title': '合集视频标题' * 3, 'pic': 'https://i0.hdslb.com/bfs/archive/x.jpg',
+           'desc': '视频简介' * 40, 'stat': stat, 'author': {'mid': 1, 'name': 'up', 'face': 'https://x'}}
+    return {
+        'code': 0, 'message': '0', 'ttl': 1,
+        'data': {
+            'bvid': 'BV1xx411c7mD', 'aid': 1, 'cid': 2, 'title': '标题', 'pubdate': 1700000000,
+            'desc': '简介' * 200,
+            'desc_v2': [{'raw_text': '简介' * 200, 'type': 1, 'biz_id': 0}],
+            'owner': {'mid': 1, 'name': 'up', 'face': 'https://x'},
+            'stat': stat,
+            'pages': [{'cid': i, 'page': i, 'part': f'P{i}', 'duration': 600,
+                       'dimension': {'width': 1920, 'height': 1080, 'rotate': 0}} for i in range(20)],
+            'ugc_season': {'id': 1, 'title': '合集', 'sections': [{'episodes': [
+                {'aid': i, 'cid': i, 'bvid': f'BV{i:010d}', 'title': f'第{i}集', 'arc': arc}
+                for i in range(episodes)]}]},
+            'subtitle': {'allow_submit': False, 'list': []},
+            'honor_reply': {'honor': [{'aid': 1, 'type': 4, 'desc': '热门'}]},
+        }
+    }
+
+
+def make_detail_payload(items=50):
+    """构造动态详情响应"""
+    module_stat = {'comment': {'count': 540, 'forbidden': False},
+                   'forward': {'count': 585, 'forbidden': False},
+                   'like': {'count': 198, 'forbidden': False, 'status': False}}
+    nodes = [{'type': 'RICH_TEXT_NODE_TYPE_TEXT', 'text': '动态正文' * 20, 'orig_text': '动态正文' * 20}
+             for _ in range(items)]
+    return {
+        'code': 0, 'message': '0', 'ttl': 1,
+        'data': {'item': {
+            'id_str': '1049320642121302020', 'type': 'DYNAMIC_TYPE_DRAW', 'visible': True,
+            'modules': {
+                'module_author': {'mid': 1, 'name': 'up', 'face': 'https://x', 'pub_ts': 1700000000},
+                'module_dynamic': {'desc': {'rich_text_nodes': nodes, 'text': '动态正文' * 20 * items},
+                                   'major': {'draw': {'items': [{'src': 'https://x', 'width': 1080,
+                                                                 'height': 1920, 'size': 300.5}] * 9}}},
+                'module_stat': module_stat,
+            }}}
+    }
+
+
+def make_response(payload):
+    """把 payload 包装成 requests.Response，与线上读取路径一致"""
+    response = requests.models.Response()
+    response._content = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    response.status_code = 200
+    response.headers['Content-Type'] = 'application/json; charset=utf-8'
+    return response
+
+
+def bench(name, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5))
+    per_call = seconds / number * 1e6
+    print(f"{name:<36} {per_call:>10.1f} us/次")
+    return per_call
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"JSON 后端: {fast_json.BACKEND}")
+
+    view = make_response(make_view_payload())
+    print(f"\n/x/web-interface/view 响应大小: {len(view.content) / 1024:.1f} KB")
+    base = bench('response.json() + 取 stat', lambda: view.json()['data']['stat'], number)
+    fast = bench('fast_json.pluck(VIEW_STAT_PATHS)', lambda: fast_json.pluck(view.content, VIEW_STAT_PATHS), number)
+    print(f"{'加速比':<36} {base / fast:>10.1f} x")
+
+    detail = make_response(make_detail_payload())
+    print(f"\n/x/polymer/web-dynamic/v1/detail 响应大小: {len(detail.content) / 1024:.1f} KB")
+    base = bench('response.json() + 取 module_stat',
+                 lambda: detail.json()['data']['item']['modules']['module_stat'], number)
+    fast = bench('fast_json.pluck(DETAIL_STAT_PATHS)',
+                 lambda: fast_json.extract(fast_json.decode_response(detail)['data'], DETAIL_STAT_PATHS), number)
+    print(f"{'加速比':<36} {base / fast:>10.1f} x")
+
+
+if __name__ == '__main__':
+    main()
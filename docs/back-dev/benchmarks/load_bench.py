@@ -0,0 +1,210 @@
+"""
+采集器负载基准
+
+启动本地模拟服务器（mock_bili_server.py），把 BILI_API_BASE 指向它，
+分别用 main、follower_monitor、dynamic_monitor 的采集与写入逻辑处理
+N 个目标，报告吞吐量、单目标耗时分位数和进程内存峰值。
+所有 CSV 写入临时目录，不影响当前目录下的数据。
+
+用法:
+    python benchmarks/load_bench.py --targets 1000,10000 --concurrency 16 --latency 30 --jitter 10
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BACK_DEV = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACK_DEV)
+
+
+def start_mock(args):
+    """在子进程中启动模拟服务器，避免与被测代码争用 GIL"""
+    cmd = [sys.executable, os.path.join(BACK_DEV, 'mock_bili_server.py'), '--port', str(args.port),
+           '--latency', str(args.latency), '--jitter', str(args.jitter),
+           '--error-rate', str(args.error_rate), '--risk-rate', str(args.risk_rate)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{args.port}'
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(base_url + '/__stats', timeout=1).read()
+            return proc, base_url
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"模拟服务器未能在 {base_url} 启动")
+
+
+def mock_stats(base_url):
+    with urllib.request.urlopen(base_url + '/__stats', timeout=5) as response:
+        return json.load(response)
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def timed(func, durations, lock):
+    """包装单个目标的处理函数，记录耗时"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with lock:
+                durations.append(elapsed)
+    return wrapper
+
+
+def bench_main(count, concurrency):
+    import main
+
+    def one(i):
+        video_config = {'bvid': f'BV{i:010d}', 'cid': str(i + 1)}
+        data = main.fetch_data_for_video(video_config, None)
+        if data:
+            main.append_to_csv(data, video_config)
+        return data is not None
+
+    return run_pool(one, count, concurrency)
+
+
+def bench_follower(count, concurrency):
+    import follower_monitor
+
+    def one(i):
+        follower_count = follower_monitor.get_follower_stat(100000 + i, {})
+        if follower_count is not None:
+            follower_monitor.append_to_csv(100000 + i, follower_count)
+        return follower_count is not None
+
+    return run_pool(one, count, concurrency)
+
+
+def run_pool(one, count, concurrency):
+    durations, lock = [], threading.Lock()
+    one = timed(one, durations, lock)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        ok = sum(pool.map(one, range(count)))
+    return ok, durations
+
+
+def bench_dynamic(count, concurrency):
+    """直接使用 DynamicMonitor 的抓取线程池和写入线程"""
+    import dynamic_monitor
+
+    monitor = dynamic_monitor.DynamicMonitor()
+    monitor.workers = concurrency
+    # 模拟服务器只对带 SESSDATA 的请求返回 WBI 密钥
+    monitor.api.session.cookies.set('SESSDATA', 'mock')
+    durations, lock = [], threading.Lock()
+    ok = [0]
+    process = timed(monitor.process_dynamic, durations, lock)
+
+    def counted(detail_id):
+        data = process(detail_id)
+        if data:
+            with lock:
+                ok[0] += 1
+        return data
+    monitor.process_dynamic = counted
+
+    workers = [threading.Thread(target=monitor.fetch_worker, daemon=True) for _ in range(monitor.workers)]
+    writer = threading.Thread(target=monitor.writer_loop, daemon=True)
+    for thread in workers + [writer]:
+        thread.start()
+    for i in range(count):
+        monitor.fetch_queue.put({'detail_id': str(900000000000000000 + i), 'interval': 60,
+                                 'next_run': 0, 'in_flight': True})
+    for _ in workers:
+        monitor.fetch_queue.put(None)
+    for thread in workers:
+        thread.join()
+    monitor.write_queue.put(None)
+    writer.join()
+    return ok[0], durations
+
+
+COLLECTORS = {
+    'main': bench_main,
+    'follower': bench_follower,
+    'dynamic': bench_dynamic,
+}
+
+
+def report(name, count, ok, durations, elapsed):
+    durations.sort()
+    rss = peak_rss_mb()
+    rss_text = f"{rss:.1f}MB" if rss is not None else "n/a"
+    print(f"{name:<9} 目标={count:<7} 成功={ok:<7} 耗时={elapsed:7.2f}s 吞吐={count / elapsed:8.1f}/s "
+          f"p50={percentile(durations, 0.50) * 1000:7.1f}ms p95={percentile(durations, 0.95) * 1000:7.1f}ms "
+          f"p99={percentile(durations, 0.99) * 1000:7.1f}ms 峰值内存={rss_text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='采集器负载基准')
+    parser.add_argument('--targets', default='1000', help='目标数量，逗号分隔，如 1000,10000,100000')
+    parser.add_argument('--collectors', default='main,follower,dynamic')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--latency', type=float, default=20, help='模拟服务器平均延迟（毫秒）')
+    parser.add_argument('--jitter', type=float, default=5, help='延迟标准差（毫秒）')
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--risk-rate', type=float, default=0)
+    args = parser.parse_args()
+
+    proc, base_url = start_mock(args)
+    os.environ['BILI_API_BASE'] = base_url
+    workdir = tempfile.mkdtemp(prefix='bili-load-')
+    os.chdir(workdir)
+    logging.disable(logging.CRITICAL)
+
+    import bili_http
+    bili_http.settings['api_base'] = base_url
+    # 每个目标只请求一次，关闭缓存避免缓存本身占用内存影响结果
+    bili_http.cache_policy.clear()
+
+    print(f"模拟服务器: {base_url}  工作目录: {workdir}  并发: {args.concurrency}")
+    try:
+        for count in [int(value) for value in args.targets.split(',')]:
+            for name in args.collectors.split(','):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    ok, durations = COLLECTORS[name](count, args.concurrency)
+                    elapsed = time.perf_counter() - start
+                report(name, count, ok, durations, elapsed)
+        print(f"模拟服务器请求数: {mock_stats(base_url)}")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == '__main__':
+    main()
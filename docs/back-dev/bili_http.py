@@ -0,0 +1,394 @@
+"""
+采集请求的统一出口：每个请求都带超时和总期限，幂等 GET 可选对冲
+
+总期限对整个调用生效：请求在线程池中执行，调用方最多等待 deadline 秒，
+服务端慢慢吐数据、连接和读取各自接近超时等情况也不会超出。响应体分块读取，
+超过期限后执行请求的线程关闭连接退出，不会一直占着线程池等到套接字超时。
+
+对冲：第一次请求在该接口近期 p95 延迟内没有返回时，再发一个相同请求，
+取先成功返回的结果。配置读取 video_config.conf 的 [http] 段:
+
+    [http]
+    timeout = 10            # 单次请求的读超时（秒）
+    connect_timeout = 3.05  # 连接超时（秒）
+    hedge = false           # 是否对冲 GET 请求
+    hedge_min_delay = 0.2   # 对冲等待的下限（秒）
+    workers = 32            # 执行请求的线程数
+    api_base = https://api.bilibili.com  # 接口地址，压测时指向本地模拟服务器
+    rate_limit = 20         # 每秒最多发出的请求数，0 为不限制
+    rate_burst = 10         # 允许的突发请求数
+
+环境变量 BILI_API_BASE 优先于 api_base。速率限制对进程内所有实际发出的请求生效
+（命中缓存或被合并的请求不计入）。
+
+并发的相同请求会合并为一次网络调用（single-flight），成功的响应按接口
+缓存一小段时间，[http_cache] 段设置容量与各接口的有效期（秒，0 为不缓存）:
+
+    [http_cache]
+    max_entries = 1024
+    /x/web-interface/view = 30
+"""
+import configparser
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+
+import requests
+
+import metrics
+
+# 默认设置，可由 load_settings() 覆盖
+settings = {
+    'timeout': 10.0,
+    'connect_timeout': 3.05,
+    'hedge': False,
+    'hedge_min_delay': 0.2,
+    'workers': 32,
+    'api_base': os.getenv('BILI_API_BASE', 'https://api.bilibili.com'),
+    'rate_limit': 0.0,
+    'rate_burst': 10,
+}
+
+# 各接口响应的缓存有效期（秒），未列出的接口不缓存
+cache_policy = {
+    '/x/web-interface/view': 30.0,
+}
+CACHE_MAX_ENTRIES = 1024
+
+# 只缓存 code 为 0 的响应
+_OK_PREFIX = re.compile(rb'^\s*\{\s*"code"\s*:\s*0\s*[,}]')
+# 从响应开头取业务码，用于错误计数
+_CODE_PREFIX = re.compile(rb'^\s*\{\s*"code"\s*:\s*(-?\d+)')
+
+# 样本数不足时使用的对冲等待时间（秒）
+DEFAULT_HEDGE_DELAY = 1.0
+# 计算 p95 所需的最少样本数
+MIN_SAMPLES = 20
+# 读取响应体时每次最多取的字节数
+READ_CHUNK = 65536
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def load_settings(config_file='video_config.conf'):
+    """从配置文件的 [http] 段读取设置"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if config.has_section('http'):
+        settings['timeout'] = config.getfloat('http', 'timeout', fallback=settings['timeout'])
+        settings['connect_timeout'] = config.getfloat('http', 'connect_timeout', fallback=settings['connect_timeout'])
+        settings['hedge'] = config.getboolean('http', 'hedge', fallback=settings['hedge'])
+        settings['hedge_min_delay'] = config.getfloat('http', 'hedge_min_delay', fallback=settings['hedge_min_delay'])
+        settings['workers'] = config.getint('http', 'workers', fallback=settings['workers'])
+        if not os.getenv('BILI_API_BASE'):
+            settings['api_base'] = config.get('http', 'api_base', fallback=settings['api_base']).rstrip('/')
+        settings['rate_limit'] = config.getfloat('http', 'rate_limit', fallback=settings['rate_limit'])
+        settings['rate_burst'] = config.getint('http', 'rate_burst', fallback=settings['rate_burst'])
+        rate_limiter.configure(settings['rate_limit'], settings['rate_burst'])
+    if config.has_section('http_cache'):
+        response_cache.max_entries = config.getint('http_cache', 'max_entries', fallback=CACHE_MAX_ENTRIES)
+        for key, value in config.items('http_cache'):
+            if key.startswith('/'):
+                cache_policy[key] = float(value)
+    return settings
+
+
+def limit_cache_ttl(seconds):
+    """缓存有效期不超过采样间隔，避免同一份统计被记录两次"""
+    for endpoint, ttl in cache_policy.items():
+        cache_policy[endpoint] = min(ttl, seconds)
+
+
+def api_url(path):
+    """拼接接口地址"""
+    return settings['api_base'] + path
+
+
+def default_timeout():
+    """requests 使用的 (连接, 读取) 超时"""
+    return (settings['connect_timeout'], settings['timeout'])
+
+
+def endpoint_of(url):
+    """用于统计的接口名，即 URL 路径"""
+    return urlsplit(url).path
+
+
+class LatencyTracker:
+    """按接口记录最近的请求耗时"""
+
+    def __init__(self, window=200):
+        self.window = window
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, seconds):
+        with self.lock:
+            if endpoint not in self.samples:
+                self.samples[endpoint] = deque(maxlen=self.window)
+            self.samples[endpoint].append(seconds)
+
+    def percentile(self, endpoint, q):
+        """返回耗时分位数，样本不足时返回 None"""
+        with self.lock:
+            samples = self.samples.get(endpoint)
+            if not samples or len(samples) < MIN_SAMPLES:
+                return None
+            ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+
+class RateLimiter:
+    """令牌桶：超出速率的请求在发出前等待，rate 为 0 时不限制"""
+
+    def __init__(self, rate=0.0, burst=10):
+        self.lock = threading.Lock()
+        self.configure(rate, burst)
+
+    def configure(self, rate, burst):
+        with self.lock:
+            self.rate = rate
+            self.burst = max(1, burst)
+            self.tokens = float(self.burst)
+            self.updated = time.monotonic()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # 令牌可以透支，透支部分按速率折算成等待时间，保证排队的请求均匀发出
+            self.tokens -= 1
+            wait_seconds = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait_seconds:
+            time.sleep(wait_seconds)
+
+
+class SingleFlight:
+    """合并并发的相同请求：同一时刻只有一个调用真正执行，其余等待它的结果"""
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, func):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'event': threading.Event(), 'result': None, 'error': None}
+                self.calls[key] = call
+        if not leader:
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+        try:
+            call['result'] = func()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call['event'].set()
+
+
+class ResponseCache:
+    """带有效期的 LRU 响应缓存"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, response = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return response
+
+    def put(self, key, response, ttl):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, response)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+latency = LatencyTracker()
+flight = SingleFlight()
+rate_limiter = RateLimiter()
+response_cache = ResponseCache()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings['workers'], thread_name_prefix='bili-http')
+        return _executor
+
+
+def hedge_delay(endpoint):
+    """对冲前等待的时间：近期 p95，不低于 hedge_min_delay"""
+    p95 = latency.percentile(endpoint, 0.95)
+    if p95 is None:
+        p95 = DEFAULT_HEDGE_DELAY
+    return max(p95, settings['hedge_min_delay'])
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """调用的总期限已过，由调用方计入 deadline 错误"""
+
+
+def _read_body(response, expires):
+    """分块读取响应体，超过 expires 时关闭连接并抛出 DeadlineExceeded"""
+    read = getattr(response.raw, 'read1', None) or response.raw.read
+    chunks = []
+    while True:
+        if time.monotonic() > expires:
+            response.close()
+            raise DeadlineExceeded(f"读取 {response.url} 的响应超过期限")
+        chunk = read(READ_CHUNK, decode_content=True)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    response._content = b''.join(chunks)
+    response._content_consumed = True
+    response.raw.release_conn()
+
+
+def _send(client, url, endpoint, expires, **kwargs):
+    start = time.monotonic()
+    try:
+        response = client.get(url, stream=True, **kwargs)
+        _read_body(response, expires)
+    except DeadlineExceeded:
+        raise
+    except requests.exceptions.Timeout:
+        metrics.request_errors.inc(endpoint=endpoint, code='timeout')
+        raise
+    except Exception:
+        metrics.request_errors.inc(endpoint=endpoint, code='exception')
+        raise
+    elapsed = time.monotonic() - start
+    latency.record(endpoint, elapsed)
+    metrics.request_duration.observe(elapsed, endpoint=endpoint)
+    _count_error(endpoint, response)
+    return response
+
+
+def _count_error(endpoint, response):
+    """按 HTTP 状态码或 Bilibili 业务码统计错误"""
+    if response.status_code != 200:
+        metrics.request_errors.inc(endpoint=endpoint, code=f'http_{response.status_code}')
+        return
+    match = _CODE_PREFIX.match(response.content[:64])
+    if match and match.group(1) != b'0':
+        metrics.request_errors.inc(endpoint=endpoint, code=match.group(1).decode())
+
+
+def request_key(url, params=None):
+    """请求的缓存键：URL 加排序后的参数"""
+    if not params:
+        return url
+    return url + '?' + '&'.join(f'{k}={v}' for k, v in sorted(params.items()))
+
+
+def _is_ok(response):
+    return response.status_code == 200 and bool(_OK_PREFIX.match(response.content[:64]))
+
+
+def get(url, session=None, deadline=None, hedge=None, cache=True, **kwargs):
+    """
+    发送带期限的 GET 请求
+
+    session: 使用的 requests.Session，默认直接用 requests
+    deadline: 整个调用（含对冲）的总期限（秒），默认等于读超时
+    hedge: 是否对冲，默认取 [http] hedge 设置
+    cache: 是否使用响应缓存（按 cache_policy），并发的相同请求总会被合并
+    """
+    client = session or requests
+    endpoint = endpoint_of(url)
+    kwargs.setdefault('timeout', default_timeout())
+    if deadline is None:
+        deadline = settings['timeout']
+    if hedge is None:
+        hedge = settings['hedge']
+
+    key = request_key(url, kwargs.get('params'))
+    ttl = cache_policy.get(endpoint, 0) if cache else 0
+    if ttl > 0:
+        response = response_cache.get(key)
+        if response is not None:
+            return response
+
+    def fetch():
+        response = _fetch(client, url, endpoint, deadline, hedge, kwargs)
+        if ttl > 0 and _is_ok(response):
+            response_cache.put(key, response, ttl)
+        return response
+
+    return flight.do(key, fetch)
+
+
+def _deadline_exceeded(endpoint, deadline, futures):
+    """放弃尚未开始的请求，已在执行的请求读到期限后自行退出"""
+    for future in futures:
+        future.cancel()
+    metrics.request_errors.inc(endpoint=endpoint, code='deadline')
+    return requests.exceptions.Timeout(f"请求 {endpoint} 超过 {deadline} 秒期限")
+
+
+def _fetch(client, url, endpoint, deadline, hedge, kwargs):
+    # 速率限制都在调用方等待，不占用线程池；第一次请求等待的时间不计入期限
+    executor = _get_executor()
+    rate_limiter.acquire()
+    expires = time.monotonic() + deadline
+    first = executor.submit(_send, client, url, endpoint, expires, **kwargs)
+    done, _ = wait([first], timeout=min(hedge_delay(endpoint), deadline) if hedge else deadline)
+    if done:
+        if isinstance(first.exception(), DeadlineExceeded):
+            raise _deadline_exceeded(endpoint, deadline, [])
+        return first.result()
+    if not hedge:
+        raise _deadline_exceeded(endpoint, deadline, [first])
+
+    # 第一次请求超过 p95 仍未返回，发出对冲请求
+    rate_limiter.acquire()
+    second = executor.submit(_send, client, url, endpoint, expires, **kwargs)
+    pending = {first, second}
+    error = None
+    while pending:
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            if not isinstance(future.exception(), DeadlineExceeded):
+                error = future.exception()
+    if error is not None and not pending:
+        raise error
+    raise _deadline_exceeded(endpoint, deadline, pending)
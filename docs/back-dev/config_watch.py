@@ -0,0 +1,69 @@
+"""
+配置文件热加载的触发检测
+
+采集进程在自己的调度循环里调用 changed()：配置文件的修改时间或大小变化、
+或者收到 SIGHUP（kill -HUP <pid>）时返回 True，由调用方重新读取配置并只调整
+变化的目标。检测不另开线程，重新加载与调度在同一个线程中进行。
+
+配置读取 [reload] 段:
+
+    [reload]
+    enabled = true
+    interval = 5
+"""
+import configparser
+import os
+import threading
+import time
+
+try:
+    import signal
+except ImportError:
+    signal = None
+
+
+class ConfigWatcher:
+    def __init__(self, path, interval=5.0):
+        self.path = path
+        self.interval = interval
+        self.signature = self._signature()
+        self.requested = False
+        self.last_check = time.monotonic()
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def request(self):
+        """要求下一次 changed() 返回 True，例如收到 SIGHUP 时"""
+        self.requested = True
+
+    def install_sighup(self):
+        if hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.request())
+
+    def changed(self):
+        now = time.monotonic()
+        if not self.requested and now - self.last_check < self.interval:
+            return False
+        self.last_check = now
+        signature = self._signature()
+        if self.requested or signature != self.signature:
+            self.signature = signature
+            self.requested = False
+            return True
+        return False
+
+
+def from_config(config_file='video_config.conf'):
+    """按 [reload] 段创建检测器并注册 SIGHUP，未启用时返回 None"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if not config.getboolean('reload', 'enabled', fallback=True):
+        return None
+    watcher = ConfigWatcher(config_file, config.getfloat('reload', 'interval', fallback=5.0))
+    watcher.install_sighup()
+    return watcher
@@ -0,0 +1,260 @@
+"""
+调度器与抓取线程之间的持久化工作队列
+
+调度器只负责把到期的采集任务写入 SQLite，抓取线程（可以在其他进程里）
+从队列租用任务执行。租用的任务在 visibility 秒内对其他抓取者不可见，
+超时未完成（进程崩溃）会被重新租用；失败按指数退避重试，超过 max_attempts
+次后转入死信（status = dead），不再自动重试，死信保留 dead_days 天后删除。
+完成或失败时核对租约（worker 与 lease_until），租约超时后已被别人重新租用的任务
+不会被原来的抓取者改写。
+
+同一目标在队列中最多只有一个未完成的任务，调度器重复写入会被合并，
+重启后积压的任务不会成倍增加。
+
+配置读取 video_config.conf 的 [queue] 段:
+
+    [queue]
+    enabled = true
+    db = work_queue.db
+    workers = 2
+    visibility = 120
+    max_attempts = 3
+    dead_days = 7
+
+查看与处理:
+    python durable_queue.py stats
+    python durable_queue.py dead
+    python durable_queue.py retry      # 死信重新排队
+    python durable_queue.py purge      # 删除过期的已完成任务和死信
+"""
+import configparser
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+DEFAULT_VISIBILITY = 120
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_DEAD_DAYS = 7
+RETRY_BASE_DELAY = 30
+
+
+class Job:
+    __slots__ = ('id', 'kind', 'target', 'payload', 'attempts', 'lease_until')
+
+    def __init__(self, id, kind, target, payload, attempts, lease_until):
+        self.id = id
+        self.kind = kind
+        self.target = target
+        self.payload = payload
+        self.attempts = attempts
+        self.lease_until = lease_until  # 租约凭证，完成或失败时核对
+
+
+class WorkQueue:
+    """SQLite 实现的租约式工作队列"""
+
+    def __init__(self, path='work_queue.db', visibility=DEFAULT_VISIBILITY, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 dead_days=DEFAULT_DEAD_DAYS):
+        self.path = path
+        self.visibility = visibility
+        self.max_attempts = max_attempts
+        self.dead_days = dead_days
+        self.lock = threading.Lock()
+        self.worker_id = f'{socket.gethostname()}-{os.getpid()}'
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                target TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                due REAL NOT NULL,
+                lease_until REAL NOT NULL DEFAULT 0,
+                worker TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                finished_at REAL
+            )""")
+        # 每个目标最多一个未完成的任务
+        self.conn.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_open ON jobs (kind, target)
+            WHERE status IN ('pending', 'leased')""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs (kind, status, due)")
+
+    def put(self, kind, target, payload, due=None):
+        """写入任务，该目标已有未完成的任务时合并并返回 False"""
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO jobs (kind, target, payload, due, created_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, str(target), json.dumps(payload, ensure_ascii=False), due or now, now))
+        return cursor.rowcount > 0
+
+    def lease(self, kind):
+        """租用一个到期的任务，包括租约已超时的任务；没有时返回 None"""
+        now = time.time()
+        lease_until = now + self.visibility
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT id, kind, target, payload, attempts FROM jobs"
+                    " WHERE kind = ? AND ((status = 'pending' AND due <= ?) OR (status = 'leased' AND lease_until < ?))"
+                    " ORDER BY due LIMIT 1",
+                    (kind, now, now)).fetchone()
+                if row:
+                    self.conn.execute(
+                        "UPDATE jobs SET status = 'leased', lease_until = ?, worker = ?, attempts = attempts + 1"
+                        " WHERE id = ?",
+                        (lease_until, self.worker_id, row[0]))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return Job(row[0], row[1], row[2], json.loads(row[3]), row[4] + 1, lease_until)
+
+    def _settle(self, job, assignments, params):
+        """仍持有租约时更新任务，返回 False 表示租约已超时、任务已被重新租用"""
+        cursor = self.conn.execute(
+            f"UPDATE jobs SET {assignments}"
+            " WHERE id = ? AND status = 'leased' AND worker = ? AND lease_until = ?",
+            (*params, job.id, self.worker_id, job.lease_until))
+        if cursor.rowcount == 0:
+            print(f"任务 {job.kind}:{job.target} 的租约已超时，结果未写入")
+            return False
+        return True
+
+    def complete(self, job):
+        with self.lock:
+            return self._settle(job, "status = 'done', finished_at = ?", (time.time(),))
+
+    def fail(self, job, error=''):
+        """失败的任务按指数退避重新排队，次数用尽后转入死信"""
+        now = time.time()
+        with self.lock:
+            if job.attempts >= self.max_attempts:
+                if self._settle(job, "status = 'dead', last_error = ?, finished_at = ?", (str(error), now)):
+                    print(f"任务 {job.kind}:{job.target} 失败 {job.attempts} 次，已转入死信: {error}")
+                    return True
+                return False
+            delay = RETRY_BASE_DELAY * 2 ** (job.attempts - 1)
+            return self._settle(job, "status = 'pending', due = ?, last_error = ?", (now + delay, str(error)))
+
+    def purge(self, older_than=86400):
+        """删除已完成的旧任务和超过 dead_days 天的死信，返回删除的行数"""
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                "DELETE FROM jobs WHERE (status = 'done' AND finished_at < ?) OR (status = 'dead' AND finished_at < ?)",
+                (now - older_than, now - self.dead_days * 86400))
+        return cursor.rowcount
+
+    def depth(self, kind):
+        """等待租用的任务数，包括退避中等待重试的任务"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE kind = ? AND status = 'pending'", (kind,)).fetchone()[0]
+
+    def stats(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT kind, status, COUNT(*) FROM jobs GROUP BY kind, status").fetchall()
+        return {(kind, status): count for kind, status, count in rows}
+
+    def dead(self):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT id, kind, target, attempts, last_error FROM jobs WHERE status = 'dead' ORDER BY id").fetchall()
+
+    def retry_dead(self):
+        """死信重新排队；该目标已有未完成任务的直接丢弃"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "DELETE FROM jobs WHERE status = 'dead' AND EXISTS (SELECT 1 FROM jobs AS o"
+                " WHERE o.kind = jobs.kind AND o.target = jobs.target AND o.status IN ('pending', 'leased'))")
+            cursor = self.conn.execute(
+                "UPDATE jobs SET status = 'pending', attempts = 0, due = ? WHERE status = 'dead'", (now,))
+        return cursor.rowcount
+
+    def run_worker(self, kind, handler, stop=None, idle_sleep=1.0):
+        """
+        抓取循环：租用任务交给 handler(payload)，返回真值视为成功。
+        stop 为 threading.Event，置位后退出。
+        """
+        last_purge = 0
+        while not (stop and stop.is_set()):
+            job = self.lease(kind)
+            if job is None:
+                if time.time() - last_purge > 3600:
+                    self.purge()
+                    last_purge = time.time()
+                time.sleep(idle_sleep)
+                continue
+            try:
+                if handler(job.payload):
+                    self.complete(job)
+                else:
+                    self.fail(job, '采集失败')
+            except Exception as e:
+                self.fail(job, repr(e))
+
+
+def from_config(config_file='video_config.conf'):
+    """按 [queue] 段打开工作队列，未启用时返回 None"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if not config.getboolean('queue', 'enabled', fallback=False):
+        return None
+    return WorkQueue(config.get('queue', 'db', fallback='work_queue.db'),
+                     visibility=config.getfloat('queue', 'visibility', fallback=DEFAULT_VISIBILITY),
+                     max_attempts=config.getint('queue', 'max_attempts', fallback=DEFAULT_MAX_ATTEMPTS),
+                     dead_days=config.getfloat('queue', 'dead_days', fallback=DEFAULT_DEAD_DAYS))
+
+
+def worker_count(config_file='video_config.conf', fallback=2):
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    return config.getint('queue', 'workers', fallback=fallback)
+
+
+def start_workers(work_queue, kind, handler, count):
+    """启动 count 个抓取线程，返回用于停止它们的 Event"""
+    stop = threading.Event()
+    for i in range(count):
+        thread = threading.Thread(target=work_queue.run_worker, args=(kind, handler, stop),
+                                  name=f'{kind}-queue-{i}', daemon=True)
+        thread.start()
+    return stop
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    config = configparser.ConfigParser()
+    config.read('video_config.conf', encoding='utf-8')
+    work_queue = WorkQueue(config.get('queue', 'db', fallback='work_queue.db'),
+                           dead_days=config.getfloat('queue', 'dead_days', fallback=DEFAULT_DEAD_DAYS))
+    if command == 'stats':
+        for (kind, status), count in sorted(work_queue.stats().items()):
+            print(f"{kind:<10}{status:<10}{count}")
+    elif command == 'dead':
+        for job_id, kind, target, attempts, error in work_queue.dead():
+            print(f"#{job_id} {kind}:{target} 尝试 {attempts} 次: {error}")
+    elif command == 'retry':
+        print(f"已重新排队 {work_queue.retry_dead()} 个死信任务")
+    elif command == 'purge':
+        print(f"已删除 {work_queue.purge()} 个过期任务")
+    else:
+        print("用法: python durable_queue.py [stats|dead|retry|purge]")
+
+
+if __name__ == '__main__':
+    main()
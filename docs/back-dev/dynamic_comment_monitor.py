@@ -2,7 +2,6 @@ import os
 import time
 import csv
 import json
-import logging
 import configparser
 import requests
 import qrcode
@@ -12,12 +11,17 @@ import urllib.parse
 from datetime import datetime
 from io import StringIO
 
+import bili_http
+import structured_log
+
 # 全局常量
 CONFIG_FILE = 'video_lottery.conf'
 COOKIE_FILE = 'cookie.txt'
 SESSION_FILE = 'session.json'
 LOG_FILE = 'comment_log.log'
 WBI_CACHE_FILE = 'wbi_cache.json'
+# 接口地址，压测时可用环境变量指向本地模拟服务器
+API_BASE = os.getenv('BILI_API_BASE', 'https://api.bilibili.com')
 
 # 用户代理
 USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36'
@@ -30,16 +34,8 @@ MIXIN_KEY_ENC_TAB = [
     36, 20, 34, 44, 52
 ]
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
+# 配置日志：[logging] mode = async 时为后台线程写入的 JSON 行日志
+logger = structured_log.setup(__name__, LOG_FILE, CONFIG_FILE)
 
 class BiliAPI:
     def __init__(self):
@@ -99,7 +95,8 @@ class BiliAPI:
             print("开始获取登录二维码...")
             try:
                 # 使用新的二维码生成接口
-                qr_resp = self.session.get('https://passport.bilibili.com/x/passport-login/web/qrcode/generate')
+                qr_resp = self.session.get('https://passport.bilibili.com/x/passport-login/web/qrcode/generate',
+                                           timeout=bili_http.default_timeout())
                 qr_data = qr_resp.json()
                 
                 if qr_data['code'] != 0:
@@ -132,7 +129,8 @@ class BiliAPI:
                     try:
                         check_resp = self.session.get(
                             'https://passport.bilibili.com/x/passport-login/web/qrcode/poll',
-                            params={'qrcode_key': qrcode_key}
+                            params={'qrcode_key': qrcode_key},
+                            timeout=bili_http.default_timeout()
                         )
                         check_data = check_resp.json()
                         
@@ -187,7 +185,8 @@ class BiliAPI:
             "csrf": self.session.cookies.get('bili_jct', '')
         }
         
-        response = self.session.post("https://api.bilibili.com/bapis/bilibili.api.ticket.v1.Ticket/GenWebTicket", params=params)
+        response = self.session.post(f'{API_BASE}/bapis/bilibili.api.ticket.v1.Ticket/GenWebTicket', params=params,
+                                     timeout=bili_http.default_timeout())
         data = response.json()
         
         if data['code'] == 0:
@@ -218,13 +217,13 @@ class BiliAPI:
         
         # 从API获取
         try:
-            response = self.session.get('https://api.bilibili.com/x/web-interface/nav')
+            response = self.session.get(f'{API_BASE}/x/web-interface/nav', timeout=bili_http.default_timeout())
             data = response.json()
             
             if data['code'] != 0:
                 # 尝试使用bili_ticket接口
                 self.get_bili_ticket()
-                response = self.session.get('https://api.bilibili.com/x/web-interface/nav')
+                response = self.session.get(f'{API_BASE}/x/web-interface/nav', timeout=bili_http.default_timeout())
                 data = response.json()
                 
                 if data['code'] != 0:
@@ -315,25 +314,25 @@ class BiliAPI:
         params = self.sign_wbi(params)
         
         try:
-            response = self.session.get('https://api.bilibili.com/x/v2/reply/wbi/main', params=params)
+            response = bili_http.get(f'{API_BASE}/x/v2/reply/wbi/main', session=self.session, params=params)
             data = response.json()
             
             if data['code'] != 0:
-                # 记录失败的请求和响应详情
-                logger.error(f"获取评论失败 - 请求详情:")
-                logger.error(f"URL: {response.url}")
-                logger.error(f"Headers: {json.dumps(dict(response.request.headers), ensure_ascii=False, indent=2)}")
-                logger.error(f"Params: {json.dumps(params, ensure_ascii=False, indent=2)}")
-                logger.error(f"响应详情:")
-                logger.error(f"Status Code: {response.status_code}")
-                logger.error(f"Response Headers: {json.dumps(dict(response.headers), ensure_ascii=False, indent=2)}")
-                logger.error(f"Response Body: {json.dumps(data, ensure_ascii=False, indent=2)}")
+                # 记录失败的请求和响应详情，同一 code 的重复错误会被采样
+                logger.error("获取评论失败", extra={
+                    'event': 'reply_fetch_failed',
+                    'code': data['code'],
+                    'url': response.url,
+                    'status': response.status_code,
+                    'response_headers': dict(response.headers),
+                    'body': data
+                })
                 
                 if data['code'] == -403:  # 访问权限不足
-                    logger.info("尝试刷新bili_ticket...")
+                    logger.info("尝试刷新bili_ticket...", extra={'event': 'bili_ticket_refresh', 'code': data['code']})
                     if self.get_bili_ticket():  # 刷新bili_ticket
                         # 重试请求
-                        response = self.session.get('https://api.bilibili.com/x/v2/reply/wbi/main', params=params)
+                        response = bili_http.get(f'{API_BASE}/x/v2/reply/wbi/main', session=self.session, params=params)
                         data = response.json()
                         if data['code'] == 0:
                             # 保存session_id用于后续请求
@@ -342,13 +341,19 @@ class BiliAPI:
                             return data['data']
                 
                 if data['code'] == -352:  # 风控校验失败
-                    logger.info("尝试刷新WBI密钥...")
+                    logger.info("尝试刷新WBI密钥...", extra={'event': 'wbi_keys_refresh', 'code': data['code']})
                     self.get_wbi_keys(force_refresh=True)
                     params = self.sign_wbi(params)
-                    response = self.session.get('https://api.bilibili.com/x/v2/reply/wbi/main', params=params)
+                    response = bili_http.get(f'{API_BASE}/x/v2/reply/wbi/main', session=self.session, params=params)
                     data = response.json()
                     if data['code'] != 0:
-                        logger.error(f"刷新WBI密钥后仍然失败: {data}")
+                        logger.error("刷新WBI密钥后仍然失败", extra={
+                            'event': 'reply_fetch_failed_after_refresh',
+                            'code': data['code'],
+                            'api_message': data.get('message'),
+                            'url': response.url,
+                            'status': response.status_code
+                        })
                         return None
                 
                 print(f"获取评论失败: {data['message']} (详细信息已记录到{LOG_FILE})")
@@ -361,10 +366,12 @@ class BiliAPI:
             return data['data']
         except Exception as e:
             # 记录异常详情
-            logger.error(f"获取评论出错 - 异常信息: {str(e)}")
-            logger.error(f"请求详情:")
-            logger.error(f"URL: https://api.bilibili.com/x/v2/reply/wbi/main")
-            logger.error(f"Params: {json.dumps(params, ensure_ascii=False, indent=2)}")
+            logger.error(f"获取评论出错: {e}", extra={
+                'event': 'reply_fetch_error',
+                'code': type(e).__name__,
+                'url': f'{API_BASE}/x/v2/reply/wbi/main',
+                'params': params
+            })
             print(f"获取评论出错: {e} (详细信息已记录到{LOG_FILE})")
             return None
 
@@ -379,6 +386,7 @@ class CommentMonitor:
     def load_config(self):
         """加载配置文件"""
         self.config.read(CONFIG_FILE)
+        bili_http.load_settings(CONFIG_FILE)
         self.dynamic_id = self.config.get('detail', 'detail_id')
         self.interval = self.config.getint('detail', 'interval')
         self.interval_unit = self.config.get('detail', 'interval_unit')
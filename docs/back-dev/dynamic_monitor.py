@@ -10,15 +10,31 @@ import requests
 import qrcode
 from datetime import datetime, timedelta
 import threading
+import queue
+import heapq
+import itertools
 import sys
 from io import StringIO
 
+import bili_http
+import fast_json
+import metrics
+import profiler
+import sharding
+import durable_queue
+import config_watch
+import rollup
+import retention
+
 # 全局变量
 CONFIG_FILE = 'video_config.conf'
 COOKIE_FILE = 'cookie.txt'
 SESSION_FILE = 'session.json'
 WBI_CACHE_FILE = 'wbi_cache.json'
 
+# 默认抓取线程数
+DEFAULT_WORKERS = 4
+
 # 常量
 MIXIN_KEY_ENC_TAB = [
     46, 47, 18, 2, 53, 8, 23, 32, 15, 50, 10, 31, 58, 3, 45, 35, 27, 43, 5, 49,
@@ -27,6 +43,13 @@ MIXIN_KEY_ENC_TAB = [
     36, 20, 34, 44, 52
 ]
 
+# 动态详情中需要的计数字段
+DETAIL_STAT_PATHS = {
+    'like_count': 'item.modules.module_stat.like.count',
+    'forward_count': 'item.modules.module_stat.forward.count',
+    'comment_count': 'item.modules.module_stat.comment.count'
+}
+
 # 用户代理
 USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36'
 
@@ -88,7 +111,8 @@ class BiliAPI:
             print("开始获取登录二维码...")
             try:
                 # 使用新的二维码生成接口
-                qr_resp = self.session.get('https://passport.bilibili.com/x/passport-login/web/qrcode/generate')
+                qr_resp = self.session.get('https://passport.bilibili.com/x/passport-login/web/qrcode/generate',
+                                           timeout=bili_http.default_timeout())
                 qr_data = qr_resp.json()
                 
                 if qr_data['code'] != 0:
@@ -122,7 +146,8 @@ class BiliAPI:
                         # 使用新的状态查询接口
                         check_resp = self.session.get(
                             'https://passport.bilibili.com/x/passport-login/web/qrcode/poll',
-                            params={'qrcode_key': qrcode_key}
+                            params={'qrcode_key': qrcode_key},
+                            timeout=bili_http.default_timeout()
                         )
                         check_data = check_resp.json()
                         
@@ -180,7 +205,8 @@ class BiliAPI:
             "csrf": self.session.cookies.get('bili_jct', '')
         }
         
-        response = self.session.post("https://api.bilibili.com/bapis/bilibili.api.ticket.v1.Ticket/GenWebTicket", params=params)
+        response = self.session.post(bili_http.api_url('/bapis/bilibili.api.ticket.v1.Ticket/GenWebTicket'), params=params,
+                                     timeout=bili_http.default_timeout())
         data = response.json()
         
         if data['code'] == 0:
@@ -211,13 +237,13 @@ class BiliAPI:
         
         # 从API获取
         try:
-            response = self.session.get('https://api.bilibili.com/x/web-interface/nav')
+            response = self.session.get(bili_http.api_url('/x/web-interface/nav'), timeout=bili_http.default_timeout())
             data = response.json()
             
             if data['code'] != 0:
                 # 尝试使用bili_ticket接口
                 self.get_bili_ticket()
-                response = self.session.get('https://api.bilibili.com/x/web-interface/nav')
+                response = self.session.get(bili_http.api_url('/x/web-interface/nav'), timeout=bili_http.default_timeout())
                 data = response.json()
                 
                 if data['code'] != 0:
@@ -288,8 +314,8 @@ class BiliAPI:
         signed_params = self.sign_wbi(params)
         
         try:
-            response = self.session.get('https://api.bilibili.com/x/polymer/web-dynamic/v1/detail', params=signed_params)
-            data = response.json()
+            response = bili_http.get(bili_http.api_url('/x/polymer/web-dynamic/v1/detail'), session=self.session, params=signed_params)
+            data = fast_json.decode_response(response)
             
             if data['code'] != 0:
                 print(f"获取动态详情失败: {data}")
@@ -297,8 +323,8 @@ class BiliAPI:
                     print("尝试刷新WBI密钥...")
                     self.get_wbi_keys(force_refresh=True)
                     signed_params = self.sign_wbi(params)
-                    response = self.session.get('https://api.bilibili.com/x/polymer/web-dynamic/v1/detail', params=signed_params)
-                    data = response.json()
+                    response = bili_http.get(bili_http.api_url('/x/polymer/web-dynamic/v1/detail'), session=self.session, params=signed_params)
+                    data = fast_json.decode_response(response)
                     if data['code'] != 0:
                         print(f"刷新WBI密钥后仍然失败: {data}")
                         return None
@@ -316,18 +342,35 @@ class DynamicMonitor:
         self.api = BiliAPI()
         self.tasks = []
         self.running = True
+        self.workers = DEFAULT_WORKERS
+        self.fetch_queue = queue.Queue()  # 调度器 -> 抓取线程
+        self.write_queue = queue.Queue()  # 抓取线程 -> 写入线程
+        self.shard = None  # 分片协调器，未启用时为 None
+        self.job_queue = None  # 持久化工作队列，启用时代替 fetch_queue
+        self.rollups = None  # 多分辨率汇总，未启用时为 None
+        self.task_seq = itertools.count()  # 堆中同一时间的任务按加入顺序排列
     
     def load_config(self):
         """加载配置文件"""
         self.config.read(CONFIG_FILE)
-        self.tasks = []
+        bili_http.load_settings(CONFIG_FILE)
+        self.workers = max(1, self.config.getint('dynamic', 'workers', fallback=DEFAULT_WORKERS))
+        self.tasks = self.read_tasks()
+        
+        print(f"已加载 {len(self.tasks)} 个动态监控任务")
+    
+    def read_tasks(self):
+        """读取所有启用的 [detail_*] 段，每次使用新的解析器以便发现被删除的段"""
+        config = configparser.ConfigParser()
+        config.read(CONFIG_FILE)
+        tasks = []
         
-        for section in self.config.sections():
+        for section in config.sections():
             if section.startswith('detail_'):
                 detail_id = section.split('_')[1]
-                if self.config.getboolean(section, 'enabled', fallback=True):
-                    interval = self.config.getint(section, 'interval', fallback=5)
-                    interval_unit = self.config.get(section, 'interval_unit', fallback='minutes')
+                if config.getboolean(section, 'enabled', fallback=True):
+                    interval = config.getint(section, 'interval', fallback=5)
+                    interval_unit = config.get(section, 'interval_unit', fallback='minutes')
                     
                     # 转换为秒
                     if interval_unit == 'minutes':
@@ -337,13 +380,40 @@ class DynamicMonitor:
                     else:
                         interval_seconds = interval * 60  # 默认为分钟
                     
-                    self.tasks.append({
+                    tasks.append({
                         'detail_id': detail_id,
                         'interval': interval_seconds,
-                        'next_run': time.time()
+                        'next_run': time.time(),
+                        'in_flight': False
                     })
-        
-        print(f"已加载 {len(self.tasks)} 个动态监控任务")
+        return tasks
+    
+    def reload_tasks(self, heap):
+        """热加载：新增的动态立即加入调度，删除的标记后在出堆时丢弃，未变化的保持原有节奏"""
+        try:
+            tasks = self.read_tasks()
+        except Exception as e:
+            print(f"重新加载配置失败，继续使用旧配置: {e}")
+            return
+        current = {task['detail_id']: task for task in self.tasks}
+        merged, added, changed = [], 0, 0
+        for task in tasks:
+            old = current.pop(task['detail_id'], None)
+            if old is None:
+                heapq.heappush(heap, (task['next_run'], next(self.task_seq), task))
+                merged.append(task)
+                added += 1
+            else:
+                if old['interval'] != task['interval']:
+                    # 下次运行时间不变，之后按新间隔
+                    old['interval'] = task['interval']
+                    changed += 1
+                merged.append(old)
+        for task in current.values():
+            task['removed'] = True
+        self.tasks = merged
+        if added or changed or current:
+            print(f"配置已重新加载: 新增 {added}，移除 {len(current)}，修改 {changed} 个动态")
     
     def ensure_login(self):
         """确保已登录"""
@@ -352,64 +422,117 @@ class DynamicMonitor:
                 print("登录失败，程序退出")
                 sys.exit(1)
     
-    def save_data(self, detail_id, data):
-        """保存数据到CSV文件"""
+    def save_data(self, detail_id, data, sample_time=None):
+        """保存数据到CSV文件（只由写入线程调用）"""
         filename = f"{detail_id}_detailcount.csv"
         file_exists = os.path.exists(filename)
+        current_time = sample_time or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if self.rollups:
+            rollup.observe_row(self.rollups, 'dynamic', detail_id, current_time, {
+                '点赞数': data['like_count'], '转发数': data['forward_count'], '评论数': data['comment_count']})
         
-        with open(filename, 'a', newline='', encoding='utf-8') as f:
+        with retention.file_lock(filename), open(filename, 'a', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
             
             if not file_exists:
                 writer.writerow(['时间', '点赞数', '转发数', '评论数'])
             
-            current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             writer.writerow([
                 current_time,
                 data['like_count'],
                 data['forward_count'],
                 data['comment_count']
             ])
+        metrics.rows_written.inc(collector='dynamic')
         
         print(f"已保存动态 {detail_id} 的数据: 点赞={data['like_count']}, 转发={data['forward_count']}, 评论={data['comment_count']}")
     
     def process_dynamic(self, detail_id):
-        """处理单个动态"""
+        """处理单个动态，成功时返回计数数据"""
         detail_data = self.api.get_dynamic_detail(detail_id)
         if not detail_data:
             print(f"获取动态 {detail_id} 详情失败")
-            return False
+            return None
         
-        try:
-            module_stat = detail_data['item']['modules']['module_stat']
-            data = {
-                'like_count': module_stat['like']['count'],
-                'forward_count': module_stat['forward']['count'],
-                'comment_count': module_stat['comment']['count']
-            }
-            self.save_data(detail_id, data)
+        data = fast_json.extract(detail_data, DETAIL_STAT_PATHS)
+        missing = [name for name, value in data.items() if value is None]
+        if missing:
+            print(f"处理动态 {detail_id} 数据出错: 缺少字段 {missing}")
+            return None
+        return data
+    
+    def run_task(self, detail_id, interval):
+        """抓取单个动态，结果交给写入线程，返回是否成功"""
+        if self.shard and not self.shard.acquire(detail_id, min_gap=interval / 2):
+            # 不归属本进程或原归属者仍持有租约
             return True
-        except Exception as e:
-            print(f"处理动态 {detail_id} 数据出错: {e}")
-            return False
+        try:
+            print(f"执行动态 {detail_id} 的监控任务")
+            sample_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            data = self.process_dynamic(detail_id)
+            if data:
+                self.write_queue.put((detail_id, data, sample_time))
+            return data is not None
+        finally:
+            if self.shard:
+                self.shard.release(detail_id)
+    
+    def fetch_worker(self):
+        """抓取线程：从队列取任务，结果交给写入线程"""
+        while True:
+            task = self.fetch_queue.get()
+            if task is None:
+                break
+            try:
+                self.run_task(task['detail_id'], task['interval'])
+            finally:
+                task['in_flight'] = False
     
-    def run_task(self, task):
-        """运行单个任务"""
+    def writer_loop(self):
+        """写入线程：唯一负责 _detailcount.csv 的写入"""
+        while True:
+            item = self.write_queue.get()
+            if item is None:
+                break
+            try:
+                self.save_data(*item)
+            except Exception as e:
+                print(f"保存动态 {item[0]} 数据出错: {e}")
+    
+    def schedule_loop(self):
+        """调度循环：按下次运行时间把到期任务放入抓取队列"""
+        heap = [(task['next_run'], next(self.task_seq), task) for task in self.tasks]
+        heapq.heapify(heap)
+        watcher = config_watch.from_config(CONFIG_FILE)
+        
         while self.running:
-            current_time = time.time()
-            if current_time >= task['next_run']:
-                print(f"执行动态 {task['detail_id']} 的监控任务")
-                success = self.process_dynamic(task['detail_id'])
-                
-                # 更新下次运行时间
-                task['next_run'] = current_time + task['interval']
-                
-                if not success:
-                    # 如果失败，稍微延迟一下再重试
-                    time.sleep(10)
+            if watcher and watcher.changed():
+                self.reload_tasks(heap)
+            now = time.time()
+            while heap and heap[0][0] <= now:
+                due, seq, task = heapq.heappop(heap)
+                if task.get('removed'):
+                    continue
+                metrics.scheduler_lag.observe(now - due, collector='dynamic')
+                if self.job_queue:
+                    # 只写入持久化队列，重复的未完成任务由队列合并
+                    task['next_run'] = now + task['interval']
+                    self.job_queue.put('dynamic', task['detail_id'],
+                                       {'detail_id': task['detail_id'], 'interval': task['interval']}, due)
+                    heapq.heappush(heap, (task['next_run'], seq, task))
+                    continue
+                if task['in_flight']:
+                    # 上一次还没执行完，稍后再看
+                    heapq.heappush(heap, (now + 5, seq, task))
+                    continue
+                task['in_flight'] = True
+                task['next_run'] = now + task['interval']
+                self.fetch_queue.put(task)
+                heapq.heappush(heap, (task['next_run'], seq, task))
             
-            # 休眠一段时间
-            time.sleep(5)
+            # 休眠到下一个任务到期，最多1秒以便响应退出
+            wait = heap[0][0] - time.time() if heap else 1
+            time.sleep(min(max(wait, 0.05), 1))
     
     def run(self):
         """运行监控程序"""
@@ -420,25 +543,49 @@ class DynamicMonitor:
             print("没有找到有效的动态监控任务，请检查配置文件")
             return
         
-        # 为每个任务创建线程
-        threads = []
-        for task in self.tasks:
-            thread = threading.Thread(target=self.run_task, args=(task,))
-            thread.daemon = True
-            threads.append(thread)
-            thread.start()
+        metrics.start_from_config('dynamic', CONFIG_FILE)
+        profiler.install('dynamic', CONFIG_FILE)
+        self.shard = sharding.from_config('dynamic', CONFIG_FILE)
+        self.job_queue = durable_queue.from_config(CONFIG_FILE)
+        self.rollups = rollup.from_config(CONFIG_FILE)
+        metrics.queue_depth.set_function(self.fetch_queue.qsize, collector='dynamic', queue='fetch')
+        metrics.queue_depth.set_function(self.write_queue.qsize, collector='dynamic', queue='write')
+        
+        # 固定数量的抓取线程 + 一个写入线程
+        workers = []
+        stop_queue_workers = None
+        if self.job_queue:
+            stop_queue_workers = durable_queue.start_workers(
+                self.job_queue, 'dynamic',
+                lambda payload: self.run_task(payload['detail_id'], payload['interval']), self.workers)
+        else:
+            for i in range(self.workers):
+                thread = threading.Thread(target=self.fetch_worker, name=f"fetch-{i}")
+                thread.daemon = True
+                workers.append(thread)
+                thread.start()
+        writer = threading.Thread(target=self.writer_loop, name="writer")
+        writer.daemon = True
+        writer.start()
+        print(f"已启动 {self.workers} 个抓取线程处理 {len(self.tasks)} 个动态")
         
         try:
-            # 主线程保持运行
-            while self.running:
-                time.sleep(1)
+            self.schedule_loop()
         except KeyboardInterrupt:
             print("接收到退出信号，正在停止...")
             self.running = False
             
-            # 等待所有线程结束
-            for thread in threads:
+            # 先停止抓取线程，再让写入线程写完剩余数据
+            if stop_queue_workers:
+                stop_queue_workers.set()
+            for _ in workers:
+                self.fetch_queue.put(None)
+            for thread in workers:
                 thread.join(timeout=5)
+            self.write_queue.put(None)
+            writer.join(timeout=5)
+            if self.shard:
+                self.shard.leave()
             
             print("程序已退出")
 
@@ -0,0 +1,83 @@
+"""
+接口响应的快速 JSON 解码
+
+优先使用 orjson / ujson 等快速后端，未安装时回退到标准库 json。
+extract() 按路径只取出需要的字段，调用方不再持有整份响应。
+
+decode_response() 和 pluck() 解码失败时与 response.json() 一样抛出
+requests.exceptions.JSONDecodeError（属于 RequestException），限流或维护时
+返回的 HTML 页面由调用方原有的异常处理记录，不会中断调度。
+"""
+import json
+
+import requests
+
+try:
+    import orjson
+
+    def _loads(raw):
+        return orjson.loads(raw)
+
+    BACKEND = 'orjson'
+except ImportError:
+    try:
+        import ujson
+
+        def _loads(raw):
+            return ujson.loads(raw)
+
+        BACKEND = 'ujson'
+    except ImportError:
+        def _loads(raw):
+            if isinstance(raw, (bytes, bytearray)):
+                raw = raw.decode('utf-8')
+            return json.loads(raw)
+
+        BACKEND = 'json'
+
+_MISSING = object()
+
+
+def loads(raw):
+    """解码 bytes 或 str"""
+    return _loads(raw)
+
+
+def _decode(raw, response=None):
+    """解码接口响应，各后端的解码错误统一转为 requests 的 JSONDecodeError"""
+    try:
+        return _loads(raw)
+    except ValueError as e:
+        doc = raw.decode('utf-8', 'replace') if isinstance(raw, (bytes, bytearray)) else str(raw)
+        raise requests.exceptions.JSONDecodeError(getattr(e, 'msg', str(e)), doc, getattr(e, 'pos', 0) or 0,
+                                                  response=response) from e
+
+
+def decode_response(response):
+    """解码 requests 响应体，跳过 response.json() 的编码探测"""
+    return _decode(response.content, response)
+
+
+def get_path(doc, path, default=None):
+    """按 'data.stat.view' 形式的路径取值，路径不存在时返回 default"""
+    node = doc
+    for key in path.split('.'):
+        if isinstance(node, dict):
+            node = node.get(key, _MISSING)
+        elif isinstance(node, list) and key.isdigit() and int(key) < len(node):
+            node = node[int(key)]
+        else:
+            return default
+        if node is _MISSING:
+            return default
+    return node
+
+
+def extract(doc, paths, default=None):
+    """按 {名称: 路径} 批量取值"""
+    return {name: get_path(doc, path, default) for name, path in paths.items()}
+
+
+def pluck(raw, paths, default=None):
+    """解码原始响应并只返回需要的字段"""
+    return extract(_decode(raw), paths, default)
@@ -7,6 +7,17 @@ import sys
 from datetime import datetime
 from pathlib import Path
 
+import alert_rules
+import bili_http
+import metrics
+import sharding
+import config_watch
+import rollup
+import retention
+
+# 采集间隔（秒）
+FOLLOWER_INTERVAL = 3600
+
 # 设置控制台输出编码
 if sys.platform.startswith('win'):
     sys.stdout.reconfigure(encoding='utf-8')
@@ -17,18 +28,36 @@ class Config:
         self.load_config()
 
     def load_config(self):
-        config = configparser.ConfigParser()
         try:
-            config.read(self.config_file, encoding='utf-8')
-            # 读取多个mid并转换为整数列表
-            mid_str = config.get('user', 'mids')
-            self.mids = [int(mid.strip()) for mid in mid_str.split(',')]
-            if not self.mids:
-                raise ValueError("未配置用户mid")
+            self.mids = self.read_mids()
         except Exception as e:
             print(f"读取配置文件失败: {e}")
             sys.exit(1)
 
+    def read_mids(self):
+        """读取 [user] 段的 mid 列表，配置无效时抛出异常"""
+        config = configparser.ConfigParser()
+        config.read(self.config_file, encoding='utf-8')
+        # 读取多个mid并转换为整数列表
+        mid_str = config.get('user', 'mids')
+        mids = [int(mid.strip()) for mid in mid_str.split(',')]
+        if not mids:
+            raise ValueError("未配置用户mid")
+        return mids
+
+    def reload(self):
+        """重新读取 mid 列表；定时任务每次运行时读取 self.mids，执行节奏不变"""
+        try:
+            mids = self.read_mids()
+        except Exception as e:
+            print(f"重新加载配置失败，继续使用旧配置: {e}")
+            return
+        added = [mid for mid in mids if mid not in self.mids]
+        removed = [mid for mid in self.mids if mid not in mids]
+        self.mids = mids
+        if added or removed:
+            print(f"配置已重新加载: 新增用户 {added}，移除用户 {removed}")
+
 def get_cookies():
     """从cookie.txt文件中读取cookie"""
     cookies = {}
@@ -45,14 +74,14 @@ def get_cookies():
 
 def get_follower_stat(mid, cookies):
     """获取用户粉丝数 /x/relation/stat"""
-    url = 'https://api.bilibili.com/x/relation/stat'
+    url = bili_http.api_url('/x/relation/stat')
     params = {'vmid': mid}
     headers = {
         'User-Agent': 'Mozilla/5.0'
     }
     
     try:
-        response = requests.get(url, params=params, cookies=cookies, headers=headers)
+        response = bili_http.get(url, params=params, cookies=cookies, headers=headers)
         response.raise_for_status()
         data = response.json()
         if data['code'] == 0:
@@ -61,13 +90,13 @@ def get_follower_stat(mid, cookies):
         print(f"获取用户 {mid} 的粉丝数据失败: {e}")
     return None
 
-def append_to_csv(mid, follower_count):
+def append_to_csv(mid, follower_count, sample_time=None):
     """将数据写入CSV文件"""
     filename = f'{mid}_follower.csv'
     file_exists = Path(filename).exists()
     
     try:
-        with open(filename, 'a', newline='', encoding='utf-8-sig') as csvfile:
+        with retention.file_lock(filename), open(filename, 'a', newline='', encoding='utf-8-sig') as csvfile:
             fieldnames = ['时间', '粉丝数']
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             
@@ -75,53 +104,83 @@ def append_to_csv(mid, follower_count):
                 writer.writeheader()
             
             writer.writerow({
-                '时间': datetime.now().strftime('%Y-%m-%d %H:%M'),
+                '时间': (sample_time or datetime.now()).strftime('%Y-%m-%d %H:%M'),
                 '粉丝数': follower_count
             })
+            metrics.rows_written.inc(collector='follower')
             print(f"用户 {mid} 的数据已写入CSV文件")
     except Exception as e:
         print(f"写入用户 {mid} 的CSV文件失败: {e}")
 
-def job(config):
-    """定时任务"""
+def collect(mid, cookies, alert_engine=None, rollups=None):
+    """获取并记录单个用户的粉丝数"""
+    sample_time = datetime.now()
+    follower_count = get_follower_stat(mid, cookies)
+    if follower_count is not None:
+        print(f"用户 {mid} 当前粉丝数: {follower_count}")
+        if rollups:
+            rollup.observe_row(rollups, 'follower', mid, sample_time.replace(second=0, microsecond=0),
+                               {'粉丝数': follower_count})
+        append_to_csv(mid, follower_count, sample_time)
+        if alert_engine:
+            alert_engine.observe(mid, sample_time, follower_count)
+    else:
+        print(f"用户 {mid} 获取粉丝数据失败")
+
+def job(config, alert_engine=None, shard=None, rollups=None):
+    """定时任务，分片模式下只处理归属本进程的用户"""
     cookies = get_cookies()
     current_time = datetime.now().strftime('%Y-%m-%d %H:%M')
     print(f"\n开始获取数据 - {current_time}")
     
-    for mid in config.mids:
-        follower_count = get_follower_stat(mid, cookies)
-        if follower_count is not None:
-            print(f"用户 {mid} 当前粉丝数: {follower_count}")
-            append_to_csv(mid, follower_count)
+    mids = [mid for mid in config.mids if not shard or shard.owner(str(mid)) == shard.worker_id]
+    for mid in mids:
+        if shard:
+            if not shard.acquire(str(mid), min_gap=FOLLOWER_INTERVAL / 2):
+                continue
+            try:
+                collect(mid, cookies, alert_engine, rollups)
+            finally:
+                shard.release(str(mid))
         else:
-            print(f"用户 {mid} 获取粉丝数据失败")
+            collect(mid, cookies, alert_engine, rollups)
         
         # 两次查询之间间隔30秒
-        if mid != config.mids[-1]:  # 如果不是最后一个用户
+        if mid != mids[-1]:  # 如果不是最后一个用户
             print(f"等待30秒后查询下一个用户...")
             time.sleep(30)
 
 def main():
     # 加载配置
     config = Config()
+    bili_http.load_settings(config.config_file)
+    metrics.start_from_config('follower', config.config_file)
+    alert_engine = alert_rules.create_engine('follower', config.config_file)
+    shard = sharding.from_config('follower', config.config_file)
+    rollups = rollup.from_config(config.config_file)
     
     print(f"开始监控以下用户的粉丝数据:")
     for mid in config.mids:
         print(f"- 用户 {mid}")
     
     # 立即执行一次
-    job(config)
+    job(config, alert_engine, shard, rollups)
     
     # 设置定时任务，每小时执行一次
-    schedule.every(1).hours.do(job, config)
+    metrics.track_lag(schedule.every(FOLLOWER_INTERVAL).seconds.do(job, config, alert_engine, shard, rollups), 'follower')
 
     print("\n监控脚本已启动，按Ctrl+C停止")
+    watcher = config_watch.from_config(config.config_file)
     try:
         while True:
+            if watcher and watcher.changed():
+                config.reload()
             schedule.run_pending()
             time.sleep(1)
     except KeyboardInterrupt:
         print("\n脚本已被用户停止")
+        if shard:
+            shard.leave()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
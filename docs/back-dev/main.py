@@ -5,9 +5,54 @@ import schedule
 import configparser
 import sys
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
+import alert_rules
+import bili_http
+import metrics
+import fast_json
+import profiler
+import sharding
+import durable_queue
+import config_watch
+import target_registry
+import rollup
+import retention
+import sampling_grid
+
+# /x/web-interface/view 响应中需要的字段
+VIEW_INFO_PATHS = {
+    'code': 'code',
+    'cid': 'data.cid',
+    'title': 'data.title',
+    'pubdate': 'data.pubdate'
+}
+VIEW_STAT_PATHS = {
+    'code': 'code',
+    'message': 'message',
+    'view': 'data.stat.view',
+    'like': 'data.stat.like',
+    'coin': 'data.stat.coin',
+    'favorite': 'data.stat.favorite',
+    'share': 'data.stat.share',
+    'danmaku': 'data.stat.danmaku'
+}
+STAT_KEYS = ('view', 'like', 'coin', 'favorite', 'share', 'danmaku')
+
+# 采集时的趋势规则引擎，由 main() 按 [alerts] 配置创建
+alert_engine = None
+# 分片协调器，由 main() 按 [shard] 配置创建，未启用时为 None
+shard = None
+# 持久化工作队列，由 main() 按 [queue] 配置打开，未启用时调度回调直接采集
+job_queue = None
+# 多分辨率汇总，由 main() 按 [rollup] 配置打开，未启用时为 None
+rollups = None
+# 整点对齐的采样网格，由 main() 按 [grid] 配置创建，未启用时为 None
+grid = None
+
 # 设置控制台输出编码
 if sys.platform.startswith('win'):
     sys.stdout.reconfigure(encoding='utf-8')
@@ -27,49 +72,70 @@ class Config:
     def __init__(self):
         self.config_file = 'video_config.conf'
         self.videos = []  # 存储多个视频的配置
+        self.save_lock = threading.Lock()
+        # 启用 [registry] 时视频目标从登记表读取，不再读取 [video_*] 段
+        self.registry = target_registry.from_config(self.config_file)
         self.load_config()
 
     def load_config(self):
-        config = configparser.ConfigParser()
         try:
-            config.read(self.config_file, encoding='utf-8')
-            
-            # 读取所有以video_开头的section
-            for section in config.sections():
-                if section.startswith('video_'):
-                    video_config = {
-                        'enabled': config.getboolean(section, 'enabled', fallback=True),  # 默认为启用
-                        'bvid': config.get(section, 'bvid'),
-                        'start_now': config.getboolean(section, 'start_now'),
-                        'start_time': config.get(section, 'start_time'),
-                        'interval': config.getint(section, 'interval'),
-                        'interval_unit': config.get(section, 'interval_unit', fallback='minutes'),
-                        'cid': config.get(section, 'cid', fallback='')
-                    }
-                    if video_config['cid'] == '':
-                        video_config['cid'] = None
-                    self.videos.append(video_config)
-                    
-            if not self.videos:
-                raise ValueError("未找到视频配置")
-            
-            # 检查是否有启用的视频
-            enabled_videos = [v for v in self.videos if v['enabled']]
-            if not enabled_videos:
-                raise ValueError("没有启用的视频配置")
-                
+            self.videos = self.read_videos()
         except Exception as e:
             print(f"读取配置文件失败: {e}")
             sys.exit(1)
 
-    def save_cid(self, bvid, cid):
+    def read_videos(self):
+        """读取所有视频配置，配置无效时抛出异常"""
+        videos = self.registry.videos() if self.registry else self.read_conf_videos()
+        if not videos:
+            raise ValueError("未找到视频配置")
+        
+        # 检查是否有启用的视频
+        enabled_videos = [v for v in videos if v['enabled']]
+        if not enabled_videos:
+            raise ValueError("没有启用的视频配置")
+        return videos
+
+    def read_conf_videos(self):
+        """读取配置文件中所有 [video_*] 段"""
         config = configparser.ConfigParser()
-        try:
-            config.read(self.config_file, encoding='utf-8')
-            section = f'video_{bvid}'
-            
-            if section in config:
-                config.set(section, 'cid', str(cid))
+        config.read(self.config_file, encoding='utf-8')
+        videos = []
+        
+        # 读取所有以video_开头的section
+        for section in config.sections():
+            if section.startswith('video_'):
+                video_config = {
+                    'enabled': config.getboolean(section, 'enabled', fallback=True),  # 默认为启用
+                    'bvid': config.get(section, 'bvid'),
+                    'start_now': config.getboolean(section, 'start_now'),
+                    'start_time': config.get(section, 'start_time'),
+                    'interval': config.getint(section, 'interval'),
+                    'interval_unit': config.get(section, 'interval_unit', fallback='minutes'),
+                    'cid': config.get(section, 'cid', fallback='')
+                }
+                if video_config['cid'] == '':
+                    video_config['cid'] = None
+                videos.append(video_config)
+        return videos
+
+    def save_cid(self, bvid, cid):
+        self.save_cids({bvid: cid})
+
+    def save_cids(self, cids):
+        """把 {bvid: cid} 一次写入配置文件，多个线程同时保存时串行执行"""
+        if self.registry:
+            self.save_cids_to_registry(cids)
+            return
+        with self.save_lock:
+            config = configparser.ConfigParser()
+            try:
+                config.read(self.config_file, encoding='utf-8')
+                updated = {bvid: str(cid) for bvid, cid in cids.items() if f'video_{bvid}' in config}
+                if not updated:
+                    return
+                for bvid, cid in updated.items():
+                    config.set(f'video_{bvid}', 'cid', cid)
                 
                 # 使用临时文件写入新配置
                 temp_file = Path(self.config_file + '.tmp')
@@ -81,13 +147,27 @@ class Config:
                 
                 # 更新内存中的配置
                 for video in self.videos:
-                    if video['bvid'] == bvid:
-                        video['cid'] = str(cid)
-                        break
+                    if video['bvid'] in updated:
+                        video['cid'] = updated[video['bvid']]
                 
-                print(f"视频 {bvid} 的CID已更新到配置文件: {cid}")
+                for bvid, cid in updated.items():
+                    print(f"视频 {bvid} 的CID已更新到配置文件: {cid}")
+            except Exception as e:
+                print(f"更新CID到配置文件失败: {e}")
+
+    def save_cids_to_registry(self, cids):
+        """登记表模式下只更新对应视频的一行"""
+        updated = {bvid: str(cid) for bvid, cid in cids.items()}
+        try:
+            self.registry.set_cids(updated)
         except Exception as e:
-            print(f"更新CID到配置文件失败: {e}")
+            print(f"更新CID到登记表失败: {e}")
+            return
+        for video in self.videos:
+            if video['bvid'] in updated:
+                video['cid'] = updated[video['bvid']]
+        for bvid, cid in updated.items():
+            print(f"视频 {bvid} 的CID已更新到登记表: {cid}")
 
 # 从cookie.txt文件中读取cookie
 def get_cookies():
@@ -106,18 +186,18 @@ def get_cookies():
 # 获取视频cid
 def get_video_view(bvid, cookies, headers):
     """获取视频基本信息 /x/web-interface/view"""
-    url = 'https://api.bilibili.com/x/web-interface/view'
+    url = bili_http.api_url('/x/web-interface/view')
     params = {'bvid': bvid}
     
     try:
-        response = requests.get(url, params=params, cookies=cookies, headers=headers)
+        response = bili_http.get(url, params=params, cookies=cookies, headers=headers)
         response.raise_for_status()
-        data = response.json()
-        if data['code'] == 0:
+        fields = fast_json.pluck(response.content, VIEW_INFO_PATHS)
+        if fields['code'] == 0:
             return {
-                'cid': data['data']['cid'],
-                'title': data['data']['title'],
-                'pubdate': data['data']['pubdate']
+                'cid': fields['cid'],
+                'title': fields['title'],
+                'pubdate': fields['pubdate']
             }
     except Exception as e:
         print(f"获取视频信息失败: {e}")
@@ -153,16 +233,16 @@ def try_get_cid(config):
 
 def get_online_total(video_config, cookies, headers):
     """获取实时在线观看数据 /x/player/online/total"""
-    url = 'https://api.bilibili.com/x/player/online/total'
+    url = bili_http.api_url('/x/player/online/total')
     params = {
         'bvid': video_config['bvid'],
         'cid': video_config['cid']
     }
     
     try:
-        response = requests.get(url, params=params, cookies=cookies, headers=headers)
+        response = bili_http.get(url, params=params, cookies=cookies, headers=headers)
         response.raise_for_status()
-        data = response.json()
+        data = fast_json.decode_response(response)
         
         # 检查API返回的业务状态码
         if data.get('code') != 0:
@@ -186,32 +266,24 @@ def get_online_total(video_config, cookies, headers):
 
 def get_video_stat(video_config, cookies, headers):
     """获取视频统计数据 /x/web-interface/view"""
-    url = 'https://api.bilibili.com/x/web-interface/view'
+    url = bili_http.api_url('/x/web-interface/view')
     params = {
         'bvid': video_config['bvid']
     }
     
     try:
-        response = requests.get(url, params=params, cookies=cookies, headers=headers)
+        response = bili_http.get(url, params=params, cookies=cookies, headers=headers)
         response.raise_for_status()
-        data = response.json()
+        # 只取出 stat 中的计数，不保留整份响应
+        fields = fast_json.pluck(response.content, VIEW_STAT_PATHS)
         
         # 检查API返回的业务状态码
-        if data.get('code') != 0:
-            error_msg = f"视频 {video_config['bvid']} 统计数据API返回错误: {data.get('message', '未知错误')}"
+        if fields['code'] != 0:
+            error_msg = f"视频 {video_config['bvid']} 统计数据API返回错误: {fields['message'] or '未知错误'}"
             logging.error(error_msg)
             return None
-            
-        stat = data.get('data', {}).get('stat', {})
         
-        return {
-            'view': stat.get('view', 0),
-            'like': stat.get('like', 0),
-            'coin': stat.get('coin', 0),
-            'favorite': stat.get('favorite', 0),
-            'share': stat.get('share', 0),
-            'danmaku': stat.get('danmaku', 0)
-        }
+        return {key: fields[key] or 0 for key in STAT_KEYS}
     except requests.exceptions.HTTPError as e:
         if response.status_code == 404:
             error_msg = f"视频 {video_config['bvid']} 不存在或已设为私有 (404)"
@@ -235,6 +307,8 @@ def fetch_data(config):
     headers = {
         'User-Agent': 'Mozilla/5.0'
     }
+    # 以发起请求的时间作为采样时间
+    sample_time = datetime.now()
     
     # 获取在线观看数据
     online_total = get_online_total(config, cookies, headers)
@@ -252,7 +326,7 @@ def fetch_data(config):
         print("警告：所有数据值都为0，可能获取失败")
     
     return {
-        '时间': datetime.now().strftime('%Y-%m-%d %H:%M'),
+        '时间': sample_time.strftime('%Y-%m-%d %H:%M'),
         '播放量': stats['view'],
         '在线观看人数': online_total,
         '点赞': stats['like'],
@@ -268,14 +342,20 @@ def append_to_csv(data, video_config):
     file_exists = Path(filename).exists()
     
     try:
-        with open(filename, 'a', newline='', encoding='utf-8-sig') as csvfile:
+        with retention.file_lock(filename):
             fieldnames = ['时间', '播放量', '在线观看人数', '点赞', '投币', '收藏', '分享', '弹幕']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            if not file_exists:
-                writer.writeheader()
-            
-            writer.writerow(data)
+            if sampling_grid.FETCH_TIME in data:
+                fieldnames.append(sampling_grid.FETCH_TIME)
+                if file_exists:
+                    fieldnames = sampling_grid.ensure_column(filename, fieldnames)
+            with open(filename, 'a', newline='', encoding='utf-8-sig') as csvfile:
+                writer = csv.DictWriter(csvfile, fieldnames=fieldnames, restval='')
+
+                if not file_exists:
+                    writer.writeheader()
+
+                writer.writerow(data)
+            metrics.rows_written.inc(collector='main')
             print(f"视频 {video_config['bvid']} 的数据已写入CSV文件")
     except Exception as e:
         print(f"写入CSV文件失败: {e}")
@@ -285,20 +365,27 @@ def job(config):
     if data:
         append_to_csv(data, config)
 
+def interval_seconds(video_config):
+    """视频采样间隔（秒）"""
+    unit_seconds = {'seconds': 1, 'minutes': 60, 'hours': 3600}
+    return video_config['interval'] * unit_seconds.get(video_config['interval_unit'].lower(), 60)
+
 def schedule_video_task(schedule_obj, video_config, job_func, config):
     """设置视频的定时任务"""
     interval = video_config['interval']
     unit = video_config['interval_unit'].lower()
     
+    # 以 bvid 作为标签，热加载时只清除变化的视频的任务
+    tag = video_config['bvid']
     if unit == 'seconds':
-        schedule_obj.every(interval).seconds.do(job_func, video_config, config)
+        job = schedule_obj.every(interval).seconds.do(job_func, video_config, config).tag(tag)
     elif unit == 'minutes':
-        schedule_obj.every(interval).minutes.do(job_func, video_config, config)
+        job = schedule_obj.every(interval).minutes.do(job_func, video_config, config).tag(tag)
     elif unit == 'hours':
-        schedule_obj.every(interval).hours.do(job_func, video_config, config)
+        job = schedule_obj.every(interval).hours.do(job_func, video_config, config).tag(tag)
     else:
         print(f"警告：视频 {video_config['bvid']} 的时间单位 {unit} 无效，默认使用分钟")
-        schedule_obj.every(interval).minutes.do(job_func, video_config, config)
+        job = schedule_obj.every(interval).minutes.do(job_func, video_config, config).tag(tag)
     
     unit_str = {
         'seconds': '秒',
@@ -306,7 +393,12 @@ def schedule_video_task(schedule_obj, video_config, job_func, config):
         'hours': '小时'
     }.get(unit, '分钟')
     
+    metrics.track_lag(job, 'main')
     print(f"已设置视频 {video_config['bvid']} 的监控间隔为 {interval} {unit_str}")
+    if grid:
+        period = grid.attach(job, interval_seconds(video_config))
+        if period != interval_seconds(video_config):
+            print(f"视频 {video_config['bvid']} 的间隔按网格调整为 {period // 60} 分钟")
 
 def main():
     # 设置日志记录
@@ -314,6 +406,32 @@ def main():
     
     # 加载配置
     config = Config()
+    if '--worker' in sys.argv:
+        run_fetch_workers(config)
+        return
+    bili_http.load_settings(config.config_file)
+    metrics.start_from_config('main', config.config_file)
+    profiler.install('main', config.config_file)
+    global alert_engine, shard, job_queue, rollups, grid
+    alert_engine = alert_rules.create_engine('view', config.config_file)
+    shard = sharding.from_config('main', config.config_file)
+    job_queue = durable_queue.from_config(config.config_file)
+    rollups = rollup.from_config(config.config_file)
+    grid = sampling_grid.from_config(config.config_file)
+    # 压缩旧样本的后台线程，压缩 follower、dynamic 写入的 CSV 也由这里负责
+    retention.start_from_config(config.config_file)
+    # 启用队列时调度回调只写入任务，由抓取线程（本进程或 main.py --worker）执行
+    video_job = enqueue_video if job_queue else job_for_video
+    if job_queue:
+        durable_queue.start_workers(job_queue, 'video', video_job_handler(config),
+                                    durable_queue.worker_count(config.config_file))
+    enabled_intervals = [interval_seconds(v) for v in config.videos if v['enabled']]
+    if enabled_intervals:
+        bili_http.limit_cache_ttl(min(enabled_intervals))
+    
+    # 并发取得 start_now 视频的CID和第一轮样本
+    start_now = [v for v in config.videos if v['enabled'] and v['start_now']]
+    failed = warm_up(start_now, config, video_job, warmup_concurrency(config.config_file)) if start_now else set()
     
     # 为每个启用的视频创建单独的任务
     for video_config in config.videos:
@@ -322,47 +440,173 @@ def main():
             continue
             
         bvid = video_config['bvid']
+        if bvid in failed:
+            print(f"无法获取视频 {bvid} 的CID，跳过该视频")
+            continue
         print(f"正在设置视频 {bvid} 的监控任务...")
-        
-        if video_config['start_now']:
-            print(f"立即开始监控视频 {bvid}...")
-            if not video_config['cid']:
-                if try_get_cid_for_video(video_config, config):
-                    job_for_video(video_config, config)
-                else:
-                    print(f"无法获取视频 {bvid} 的CID，跳过该视频")
-                    continue
-            else:
-                job_for_video(video_config, config)
-        else:
-            # 处理定时启动的逻辑...
-            pass
 
         # 设置每个视频的定时任务
-        schedule_video_task(schedule, video_config, job_for_video, config)
+        schedule_video_task(schedule, video_config, video_job, config)
 
     enabled_count = sum(1 for v in config.videos if v['enabled'])
     print(f"\n已启动 {enabled_count} 个视频的监控任务，按Ctrl+C停止")
+    watcher = config_watch.from_config(config.config_file)
     try:
         while True:
+            if (watcher and watcher.changed()) or (config.registry and config.registry.changed()):
+                reload_videos(config, video_job)
             schedule.run_pending()
+            if grid:
+                grid.align(schedule.jobs)
+            if job_queue:
+                report_queue_depth()
             time.sleep(1)
     except KeyboardInterrupt:
         print("\n脚本已被用户停止")
+        if shard:
+            shard.leave()
+
+# 变化后需要重建定时任务的字段；cid 由程序自己写回，不触发重建
+SCHEDULE_KEYS = ('enabled', 'interval', 'interval_unit')
+
+def reload_videos(config, video_job):
+    """
+    重新读取视频配置，只增删或重建变化的视频的定时任务，
+    未变化的视频保持原有的执行节奏
+    """
+    try:
+        videos = config.read_videos()
+    except Exception as e:
+        print(f"重新加载配置失败，继续使用旧配置: {e}")
+        return
+    old = {v['bvid']: v for v in config.videos}
+    new = {v['bvid']: v for v in videos}
+    added, changed = [], []
+    
+    for bvid, video_config in new.items():
+        current = old.get(bvid)
+        if current is None:
+            added.append(video_config)
+        elif any(current[key] != video_config[key] for key in SCHEDULE_KEYS):
+            changed.append(video_config)
+        else:
+            # 任务仍引用旧的字典，原地更新不影响调度的字段
+            current.update({k: v for k, v in video_config.items() if k not in SCHEDULE_KEYS and v is not None})
+            new[bvid] = current
+    removed = [bvid for bvid in old if bvid not in new]
+    
+    for bvid in removed:
+        schedule.clear(bvid)
+    for video_config in changed:
+        schedule.clear(video_config['bvid'])
+    config.videos = list(new.values())
+    added_ids = {v['bvid'] for v in added}
+    for video_config in added + changed:
+        if not video_config['enabled']:
+            continue
+        if video_config['bvid'] in added_ids and video_config['start_now']:
+            video_job(video_config, config)
+        schedule_video_task(schedule, video_config, video_job, config)
+    
+    if added or removed or changed:
+        logging.info(f"配置已重新加载: 新增 {len(added)}，移除 {len(removed)}，修改 {len(changed)} 个视频")
+
+def warmup_concurrency(config_file, fallback=16):
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    return max(1, config.getint('warmup', 'concurrency', fallback=fallback))
+
+def warm_up(videos, config, job, concurrency):
+    """
+    启动阶段：并发解析缺失的CID（一次写回配置文件），再并发采集第一轮样本，
+    请求速率受 [http] rate_limit 约束。返回CID获取失败的 bvid 集合。
+    """
+    start = time.monotonic()
+    print(f"开始预热 {len(videos)} 个视频，并发 {concurrency}")
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='warmup') as pool:
+        missing = [v for v in videos if not v['cid']]
+        resolved = list(pool.map(lambda v: try_get_cid_for_video(v, config, save=False), missing))
+        cids = {v['bvid']: v['cid'] for v, ok in zip(missing, resolved) if ok}
+        if cids:
+            config.save_cids(cids)
+        failed = {v['bvid'] for v, ok in zip(missing, resolved) if not ok}
+        
+        ready = [v for v in videos if v['bvid'] not in failed]
+        list(pool.map(lambda v: job(v, config), ready))
+    
+    elapsed = time.monotonic() - start
+    metrics.warmup_duration.set(elapsed, collector='main')
+    logging.info(f"预热完成: {len(ready)} 个视频取得第一轮样本，{len(failed)} 个CID获取失败，用时 {elapsed:.1f} 秒")
+    return failed
 
 def job_for_video(video_config, config):
-    """针对单个视频的任务"""
+    """针对单个视频的任务，分片模式下只处理归属本进程的视频；返回是否采集成功"""
+    if shard:
+        if not shard.acquire(video_config['bvid'], min_gap=interval_seconds(video_config) / 2):
+            return True  # 不归属本进程，不算失败
+        try:
+            return collect_video(video_config, config)
+        finally:
+            shard.release(video_config['bvid'])
+    return collect_video(video_config, config)
+
+def collect_video(video_config, config):
+    """采集单个视频并写入CSV，返回是否成功"""
     # 尝试获取CID，如果没有CID则主动查询
     if not video_config['cid']:
         print(f"视频 {video_config['bvid']} 缺少CID，尝试获取...")
         if not try_get_cid_for_video(video_config, config):
             print(f"视频 {video_config['bvid']} 的CID获取失败，跳过该视频")
-            return  # 如果获取CID失败，直接返回
+            return False  # 如果获取CID失败，直接返回
 
     # 继续获取数据
     data = fetch_data_for_video(video_config, config)
-    if data:
-        append_to_csv(data, video_config)
+    if not data:
+        return False
+    if rollups:
+        # 先更新汇总再写 CSV，查询服务按 CSV 的签名判断数据是否变化
+        rollup.observe_row(rollups, 'video', video_config['bvid'], data['时间'], data)
+    append_to_csv(data, video_config)
+    if alert_engine:
+        sample_time = datetime.strptime(data['时间'], '%Y-%m-%d %H:%M')
+        alert_engine.observe(video_config['bvid'], sample_time, data['播放量'])
+    return True
+
+def enqueue_video(video_config, config):
+    """调度回调（队列模式）：只把到期的采集任务写入持久化队列"""
+    if not job_queue.put('video', video_config['bvid'], dict(video_config)):
+        print(f"视频 {video_config['bvid']} 已有未完成的采集任务，本次合并")
+
+def report_queue_depth():
+    """把持久化队列中等待抓取的视频任务数写入 queue_depth 指标"""
+    metrics.queue_depth.set(job_queue.depth('video'), collector='main', queue='video')
+
+def video_job_handler(config):
+    """抓取线程执行队列中的视频任务，payload 为入队时的视频配置"""
+    return lambda payload: job_for_video(payload, config)
+
+def run_fetch_workers(config):
+    """main.py --worker：只运行抓取线程，可在多个进程中单独扩容"""
+    global job_queue, alert_engine, shard, rollups, grid
+    bili_http.load_settings(config.config_file)
+    job_queue = durable_queue.from_config(config.config_file)
+    if not job_queue:
+        print("未启用 [queue]，无法以抓取进程方式运行")
+        return
+    alert_engine = alert_rules.create_engine('view', config.config_file)
+    shard = sharding.from_config('main', config.config_file)
+    rollups = rollup.from_config(config.config_file)
+    grid = sampling_grid.from_config(config.config_file)
+    count = durable_queue.worker_count(config.config_file)
+    stop = durable_queue.start_workers(job_queue, 'video', video_job_handler(config), count)
+    print(f"已启动 {count} 个抓取线程，按Ctrl+C停止")
+    try:
+        while True:
+            report_queue_depth()
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop.set()
+        print("\n抓取进程已停止")
 
 def fetch_data_for_video(video_config, config):
     """获取单个视频的数据"""
@@ -375,6 +619,8 @@ def fetch_data_for_video(video_config, config):
     headers = {
         'User-Agent': 'Mozilla/5.0'
     }
+    # 以发起请求的时间作为采样时间，不受请求耗时影响
+    sample_time = datetime.now()
     
     online_total = get_online_total(video_config, cookies, headers)
     stats = get_video_stat(video_config, cookies, headers)
@@ -401,28 +647,38 @@ def fetch_data_for_video(video_config, config):
         }
         logging.warning(f"视频 {video_config['bvid']} 统计数据获取失败，使用0填充")
     
-    # 处理在线观看人数的特殊格式
+    online_total = parse_online_total(online_total, video_config['bvid'])
+    
+    if online_total > 0 or any(value > 0 for value in stats.values()):
+        logging.info(f"视频 {video_config['bvid']} 数据获取成功")
+    else:
+        logging.warning(f"视频 {video_config['bvid']} 所有数据值都为0")
+    
+    row = build_row(sample_time, online_total, stats)
+    # 对齐模式下“时间”为所在网格点，实际采集时间另外记录
+    return grid.stamp(row, sample_time) if grid else row
+
+def parse_online_total(online_total, bvid):
+    """处理在线观看人数的特殊格式，如 "1000+"，异常时返回0"""
     if isinstance(online_total, str):
         if online_total.endswith('+'):
             try:
                 online_total = int(online_total[:-1])  # 去掉"+"号并转换为整数
             except ValueError:
-                logging.warning(f"视频 {video_config['bvid']} 在线观看数据格式异常: {online_total}")
+                logging.warning(f"视频 {bvid} 在线观看数据格式异常: {online_total}")
                 online_total = 0
         else:
             try:
                 online_total = int(online_total)
             except ValueError:
-                logging.warning(f"视频 {video_config['bvid']} 在线观看数据格式异常: {online_total}")
+                logging.warning(f"视频 {bvid} 在线观看数据格式异常: {online_total}")
                 online_total = 0
-    
-    if online_total > 0 or any(value > 0 for value in stats.values()):
-        logging.info(f"视频 {video_config['bvid']} 数据获取成功")
-    else:
-        logging.warning(f"视频 {video_config['bvid']} 所有数据值都为0")
-    
+    return online_total
+
+def build_row(sample_time, online_total, stats):
+    """组装写入CSV的一行数据"""
     return {
-        '时间': datetime.now().strftime('%Y-%m-%d %H:%M'),
+        '时间': sample_time.strftime('%Y-%m-%d %H:%M'),
         '播放量': stats['view'],
         '在线观看人数': online_total,
         '点赞': stats['like'],
@@ -432,8 +688,8 @@ def fetch_data_for_video(video_config, config):
         '弹幕': stats['danmaku']
     }
 
-def try_get_cid_for_video(video_config, config):
-    """尝试获取单个视频的CID"""
+def try_get_cid_for_video(video_config, config, save=True):
+    """尝试获取单个视频的CID，save 为 False 时只更新 video_config，由调用方批量保存"""
     if video_config['cid']:
         return True
         
@@ -447,7 +703,8 @@ def try_get_cid_for_video(video_config, config):
         video_info = get_video_view(video_config['bvid'], cookies, headers)
         if video_info:
             cid = str(video_info['cid'])
-            config.save_cid(video_config['bvid'], cid)  # 更新配置文件
+            if save:
+                config.save_cid(video_config['bvid'], cid)  # 更新配置文件
             video_config['cid'] = cid
             print(f"成功获取视频信息：\nBVID: {video_config['bvid']}\nCID: {cid}\n标题: {video_info['title']}")
             return True
@@ -0,0 +1,225 @@
+"""
+采集器内部指标与 Prometheus 文本格式的 HTTP 暴露端点
+
+配置读取 video_config.conf 的 [metrics] 段，每个采集进程使用自己的端口:
+
+    [metrics]
+    enabled = true
+    host = 127.0.0.1
+    main_port = 9101
+    follower_port = 9102
+    dynamic_port = 9103
+
+访问 http://127.0.0.1:9101/metrics 获取指标。
+"""
+import configparser
+import functools
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LAG_BUCKETS = (0.1, 0.5, 1, 5, 15, 60, 300, 900)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class Metric:
+    """带标签的指标基类"""
+    kind = 'untyped'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def samples(self):
+        """返回 [(名称后缀, 标签值, 额外标签, 值)]"""
+        with self.lock:
+            return [('', key, None, value) for key, value in self.values.items()]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for suffix, key, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(self.label_names, key, extra)} {value}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self.callbacks = {}
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def set_function(self, func, **labels):
+        """抓取时调用 func() 取值，例如队列长度"""
+        with self.lock:
+            self.callbacks[self._key(labels)] = func
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+            callbacks = dict(self.callbacks)
+        for key, func in callbacks.items():
+            try:
+                values[key] = func()
+            except Exception:
+                continue
+        return [('', key, None, value) for key, value in values.items()]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+                self.values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def samples(self):
+        result = []
+        with self.lock:
+            for key, state in self.values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, state['counts']):
+                    cumulative += count
+                    result.append(('_bucket', key, ('le', bound), cumulative))
+                result.append(('_bucket', key, ('le', '+Inf'), state['count']))
+                result.append(('_sum', key, None, state['sum']))
+                result.append(('_count', key, None, state['count']))
+        return result
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics)
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+registry = Registry()
+
+# 采集器指标
+request_duration = registry.register(Histogram(
+    'bili_request_duration_seconds', 'Bilibili API 请求耗时', ('endpoint',)))
+request_errors = registry.register(Counter(
+    'bili_request_errors_total', 'Bilibili API 请求错误数，code 为业务码或 http_状态码/exception', ('endpoint', 'code')))
+scheduler_lag = registry.register(Histogram(
+    'bili_scheduler_lag_seconds', '任务实际执行时间晚于计划时间的秒数', ('collector',), LAG_BUCKETS))
+queue_depth = registry.register(Gauge(
+    'bili_queue_depth', '队列中等待处理的任务数', ('collector', 'queue')))
+rows_written = registry.register(Counter(
+    'bili_rows_written_total', '写入 CSV 的数据行数，用 rate() 得到每秒行数', ('collector',)))
+start_time = registry.register(Gauge(
+    'bili_process_start_time_seconds', '进程启动时间'))
+warmup_duration = registry.register(Gauge(
+    'bili_warmup_duration_seconds', '启动后取得第一轮完整样本所用的秒数', ('collector',)))
+start_time.set(time.time())
+
+
+def track_lag(job, collector):
+    """
+    在 schedule 任务真正开始执行时记录它相对计划时间的延迟。
+    同一轮 run_pending 中排在慢任务之后的任务，延迟里包含等待前面任务的时间。
+    """
+    partial = job.job_func
+    func = partial.func
+
+    def timed(*args, **kwargs):
+        # Job.run 调用 job_func 之后才计算下一次时间，此时 next_run 仍是本次的计划时间
+        scheduler_lag.observe((datetime.now() - job.next_run).total_seconds(), collector=collector)
+        return func(*args, **kwargs)
+
+    # 与 Job.do 一样保持带原函数名的 functools.partial，schedule 显示任务时要读取 args 和 keywords
+    job.job_func = functools.update_wrapper(functools.partial(timed, *partial.args, **partial.keywords), func)
+    return job
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port, host='127.0.0.1'):
+    """在后台线程启动指标端点"""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name='metrics', daemon=True)
+    thread.start()
+    print(f"指标端点已启动: http://{host}:{server.server_port}/metrics")
+    return server
+
+
+def start_from_config(name, config_file='video_config.conf'):
+    """按 [metrics] 段启动名为 name 的采集器的指标端点，未启用时返回 None"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if not config.getboolean('metrics', 'enabled', fallback=False):
+        return None
+    host = config.get('metrics', 'host', fallback='127.0.0.1')
+    port = config.getint('metrics', f'{name}_port', fallback=0)
+    try:
+        return start_server(port, host)
+    except OSError as e:
+        print(f"指标端点启动失败: {e}")
+        return None
@@ -0,0 +1,238 @@
+"""
+本地 Bilibili API 模拟服务器，用于压测采集器而不访问真实接口
+
+实现 /x/web-interface/view、/x/player/online/total、/x/relation/stat、
+/x/polymer/web-dynamic/v1/detail、/x/v2/reply/wbi/main 和 /x/web-interface/nav，
+支持注入延迟、HTTP 错误和 -352 风控错误，并校验 WBI 签名。
+
+用法:
+    python mock_bili_server.py --port 18080 --latency 50 --jitter 20 --error-rate 0.01 --risk-rate 0.01
+    BILI_API_BASE=http://127.0.0.1:18080 python main.py
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import urllib.parse
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 与客户端使用相同的混合密钥表
+MIXIN_KEY_ENC_TAB = [
+    46, 47, 18, 2, 53, 8, 23, 32, 15, 50, 10, 31, 58, 3, 45, 35, 27, 43, 5, 49,
+    33, 9, 42, 19, 29, 28, 14, 39, 12, 38, 41, 13, 37, 48, 7, 16, 24, 55, 40,
+    61, 26, 17, 0, 1, 60, 51, 30, 4, 22, 25, 54, 21, 56, 59, 6, 63, 57, 62, 11,
+    36, 20, 34, 44, 52
+]
+
+IMG_KEY = '7cd084941338484aae1ad9425b84077c'
+SUB_KEY = '4932caff0ff746eab6f01bf08b70ac45'
+
+# 需要 WBI 签名的接口
+WBI_PATHS = {'/x/polymer/web-dynamic/v1/detail', '/x/v2/reply/wbi/main'}
+
+
+def get_mixin_key(img_key, sub_key):
+    orig = img_key + sub_key
+    return ''.join([orig[MIXIN_KEY_ENC_TAB[i]] for i in range(32)])
+
+
+def verify_wbi(query_pairs):
+    """按客户端的签名算法重新计算 w_rid 并比较"""
+    params = dict(query_pairs)
+    w_rid = params.pop('w_rid', None)
+    if not w_rid or 'wts' not in params:
+        return False
+    params = dict(sorted(params.items()))
+    params = {k: v.replace("!", "").replace("'", "").replace("(", "").replace(")", "").replace("*", "")
+              for k, v in params.items()}
+    query = urllib.parse.urlencode(params)
+    expected = hashlib.md5((query + get_mixin_key(IMG_KEY, SUB_KEY)).encode()).hexdigest()
+    return expected == w_rid
+
+
+def seed_of(target):
+    """同一目标每次得到相同的基数"""
+    return zlib.crc32(str(target).encode())
+
+
+class MockState:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=500,
+                 risk_rate=0.0, verify_wbi=True, reply_pages=3):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.risk_rate = risk_rate
+        self.verify_wbi = verify_wbi
+        self.reply_pages = reply_pages
+        self.started = time.time()
+        self.requests = Counter()
+        self.lock = threading.Lock()
+
+    def grow(self, target, rate):
+        """随时间增长的计数"""
+        return seed_of(target) % 100000 + int((time.time() - self.started) * rate)
+
+
+def view_payload(state, bvid):
+    base = seed_of(bvid)
+    views = state.grow(bvid, 5)
+    return {
+        'code': 0, 'message': '0', 'ttl': 1,
+        'data': {
+            'bvid': bvid, 'aid': base, 'cid': base % 10 ** 9 + 1,
+            'title': f'模拟视频 {bvid}', 'pubdate': 1700000000, 'desc': '模拟简介' * 50,
+            'owner': {'mid': base % 10 ** 8, 'name': 'mock', 'face': ''},
+            'stat': {'aid': base, 'view': views, 'danmaku': views // 100, 'reply': views // 200,
+                     'favorite': views // 30, 'coin': views // 40, 'share': views // 500,
+                     'like': views // 10, 'now_rank': 0, 'his_rank': 0},
+            'pages': [{'cid': base % 10 ** 9 + 1, 'page': 1, 'part': 'P1', 'duration': 600}],
+        }
+    }
+
+
+def online_payload(state, bvid):
+    total = state.grow(bvid, 0.01) % 2000
+    # 真实接口在人数较多时返回 "1000+" 这样的字符串
+    text = '1000+' if total >= 1000 else str(total)
+    return {'code': 0, 'message': '0', 'ttl': 1, 'data': {'total': text, 'count': text}}
+
+
+def relation_payload(state, mid):
+    return {'code': 0, 'message': '0', 'ttl': 1,
+            'data': {'mid': int(mid), 'following': 100, 'whisper': 0, 'black': 0,
+                     'follower': state.grow(mid, 0.1)}}
+
+
+def detail_payload(state, dynamic_id):
+    likes = state.grow(dynamic_id, 0.5)
+    return {'code': 0, 'message': '0', 'ttl': 1,
+            'data': {'item': {'id_str': str(dynamic_id), 'type': 'DYNAMIC_TYPE_DRAW', 'modules': {
+                'module_author': {'mid': 1, 'name': 'mock', 'pub_ts': 1700000000},
+                'module_dynamic': {'desc': {'text': '模拟动态' * 100}},
+                'module_stat': {'like': {'count': likes}, 'forward': {'count': likes // 3},
+                                'comment': {'count': likes // 2}},
+            }}}}
+
+
+def reply_payload(state, oid, page):
+    now = int(time.time())
+    replies = [{'rpid': page * 100 + i, 'ctime': now - i * 60,
+                'member': {'mid': str(seed_of(f'{oid}-{page}-{i}') % 10 ** 9), 'uname': f'用户{i}'},
+                'content': {'message': f'第{page}页第{i}条评论\n模拟内容'}} for i in range(20)]
+    return {'code': 0, 'message': '0', 'ttl': 1,
+            'data': {'cursor': {'is_end': page >= state.reply_pages, 'session_id': 'mock-session'},
+                     'replies': replies}}
+
+
+def nav_payload(logged_in):
+    """未登录时与真实接口一样返回 -101，但仍带 wbi_img"""
+    return {'code': 0 if logged_in else -101, 'message': '0' if logged_in else '账号未登录', 'ttl': 1,
+            'data': {'isLogin': logged_in, 'wbi_img': {
+                'img_url': f'https://i0.hdslb.com/bfs/wbi/{IMG_KEY}.png',
+                'sub_url': f'https://i0.hdslb.com/bfs/wbi/{SUB_KEY}.png'}}}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        state = self.state
+        parts = urllib.parse.urlsplit(self.path)
+        path = parts.path
+        pairs = urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        params = dict(pairs)
+        with state.lock:
+            state.requests[path] += 1
+
+        if path == '/__stats':
+            with state.lock:
+                return self._reply(200, dict(state.requests))
+
+        if state.latency or state.jitter:
+            time.sleep(max(0.0, random.gauss(state.latency, state.jitter)))
+        if state.error_rate and random.random() < state.error_rate:
+            return self._reply(state.error_status, {'code': -500, 'message': '模拟服务器错误'})
+        if path in WBI_PATHS:
+            if (state.risk_rate and random.random() < state.risk_rate) or \
+                    (state.verify_wbi and not verify_wbi(pairs)):
+                return self._reply(200, {'code': -352, 'message': '风控校验失败', 'ttl': 1})
+
+        if path == '/x/web-interface/view':
+            return self._reply(200, view_payload(state, params.get('bvid', '')))
+        if path == '/x/player/online/total':
+            return self._reply(200, online_payload(state, params.get('bvid', '')))
+        if path == '/x/relation/stat':
+            return self._reply(200, relation_payload(state, params.get('vmid', '0')))
+        if path == '/x/polymer/web-dynamic/v1/detail':
+            return self._reply(200, detail_payload(state, params.get('id', '0')))
+        if path == '/x/v2/reply/wbi/main':
+            pagination = params.get('pagination_str', '')
+            page = 1 if '"offset": ""' in pagination or not pagination else 2
+            return self._reply(200, reply_payload(state, params.get('oid', '0'), page))
+        if path == '/x/web-interface/nav':
+            return self._reply(200, nav_payload('SESSDATA=' in self.headers.get('Cookie', '')))
+        if path.endswith('/GenWebTicket'):
+            return self._reply(200, {'code': 0, 'message': 'OK',
+                                     'data': {'ticket': 'mock-ticket', 'created_at': int(time.time()), 'ttl': 259200}})
+        return self._reply(404, {'code': -404, 'message': '啥都木有'})
+
+    do_GET = _handle
+    do_POST = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start(host='127.0.0.1', port=0, **options):
+    """在后台线程启动模拟服务器，返回 (server, base_url)"""
+    handler = type('BoundMockHandler', (MockHandler,), {'state': MockState(**options)})
+    server = MockServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name='mock-bili', daemon=True).start()
+    return server, f'http://{host}:{server.server_port}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地 Bilibili API 模拟服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--latency', type=float, default=0, help='平均延迟（毫秒）')
+    parser.add_argument('--jitter', type=float, default=0, help='延迟标准差（毫秒）')
+    parser.add_argument('--error-rate', type=float, default=0, help='返回 HTTP 错误的比例')
+    parser.add_argument('--error-status', type=int, default=500, help='注入错误的 HTTP 状态码，如 412')
+    parser.add_argument('--risk-rate', type=float, default=0, help='WBI 接口返回 -352 的比例')
+    parser.add_argument('--no-wbi', action='store_true', help='不校验 WBI 签名')
+    args = parser.parse_args()
+
+    server, base_url = start(args.host, args.port, latency=args.latency / 1000, jitter=args.jitter / 1000,
+                             error_rate=args.error_rate, error_status=args.error_status,
+                             risk_rate=args.risk_rate, verify_wbi=not args.no_wbi)
+    print(f"模拟服务器已启动: {base_url}，按Ctrl+C停止")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("\n模拟服务器已停止")
+
+
+if __name__ == '__main__':
+    main()
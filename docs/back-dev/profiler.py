@@ -0,0 +1,219 @@
+"""
+长期运行的监控进程的按需性能剖析
+
+平时不做任何剖析，只注册信号处理（和可选的控制端口），需要时触发:
+
+    kill -USR1 <pid>    对所有线程的调用栈采样 N 秒，输出 .folded
+                        （flamegraph.pl、speedscope 可直接读取）
+    kill -USR2 <pid>    用 cProfile 剖析主线程 N 秒，输出 .prof（pstats、snakeviz）
+
+没有这两个信号的平台（Windows）可以配置控制端口，发送一行命令触发采样:
+
+    echo "stacks 30" | nc 127.0.0.1 9111
+
+配置读取 video_config.conf 的 [profiler] 段:
+
+    [profiler]
+    enabled = true
+    host = 127.0.0.1
+    seconds = 30
+    interval = 0.01
+    main_port = 9111
+
+seconds 为默认剖析时长，interval 为调用栈采样间隔（秒），{name}_port 为各进程的
+控制端口，0 或不填为不开启。
+
+结果写在 video_monitor.log 所在目录，文件名形如 profile-main-20240101-120000.folded。
+"""
+import configparser
+import os
+import socketserver
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+try:
+    import signal
+except ImportError:
+    signal = None
+
+LOG_FILE = 'video_monitor.log'
+
+settings = {
+    'name': 'monitor',
+    'seconds': 30.0,
+    'interval': 0.01,
+}
+
+_lock = threading.Lock()
+_running = None  # 正在进行的剖析类型
+_cprofile = None
+
+
+def output_path(suffix):
+    """剖析结果放在日志文件旁边"""
+    directory = os.path.dirname(os.path.abspath(LOG_FILE))
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    return os.path.join(directory, f"profile-{settings['name']}-{stamp}{suffix}")
+
+
+def _claim(kind):
+    global _running
+    with _lock:
+        if _running:
+            print(f"已有 {_running} 剖析在进行，忽略本次请求")
+            return False
+        _running = kind
+        return True
+
+
+def _release():
+    global _running
+    with _lock:
+        _running = None
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def collect_stacks(seconds, interval):
+    """对除自身外的所有线程采样，返回 {折叠后的调用栈: 次数}"""
+    counts = Counter()
+    me = threading.get_ident()
+    deadline = time.monotonic() + seconds
+    names = {}
+    while time.monotonic() < deadline:
+        frames = sys._current_frames()
+        if frames.keys() - names.keys():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in frames.items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            counts[';'.join(reversed(stack))] += 1
+        time.sleep(interval)
+    return counts
+
+
+def write_folded(counts, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, count in counts.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+def _sample_to_file(seconds, interval, path):
+    try:
+        write_folded(collect_stacks(seconds, interval), path)
+        print(f"调用栈采样结果已写入 {path}")
+    except Exception as e:
+        print(f"调用栈采样失败: {e}")
+    finally:
+        _release()
+
+
+def start_stacks(seconds=None):
+    """在后台线程采样 seconds 秒，返回结果文件路径；已有剖析在进行时返回 None"""
+    if not _claim('stacks'):
+        return None
+    seconds = seconds or settings['seconds']
+    path = output_path('.folded')
+    print(f"开始调用栈采样 {seconds:g} 秒")
+    threading.Thread(target=_sample_to_file, args=(seconds, settings['interval'], path),
+                     name='profiler', daemon=True).start()
+    return path
+
+
+def start_cprofile(seconds=None):
+    """剖析主线程 seconds 秒，必须在主线程调用（由信号处理触发）"""
+    global _cprofile
+    if not hasattr(signal, 'setitimer') or threading.current_thread() is not threading.main_thread():
+        print("cProfile 剖析只能通过 SIGUSR2 在主线程触发")
+        return None
+    if not _claim('cprofile'):
+        return None
+    import cProfile
+
+    seconds = seconds or settings['seconds']
+    print(f"开始 cProfile 剖析 {seconds:g} 秒")
+    _cprofile = cProfile.Profile()
+    _cprofile.enable()
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    return True
+
+
+def _stop_cprofile(signum=None, frame=None):
+    global _cprofile
+    profile, _cprofile = _cprofile, None
+    if profile is None:
+        return
+    profile.disable()
+    path = output_path('.prof')
+    try:
+        profile.dump_stats(path)
+        print(f"cProfile 结果已写入 {path}")
+    except OSError as e:
+        print(f"写入 cProfile 结果失败: {e}")
+    finally:
+        _release()
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    """一行一条命令: stacks [秒]"""
+
+    def handle(self):
+        line = self.rfile.readline().decode('utf-8', 'replace').split()
+        if not line or line[0] != 'stacks':
+            self.wfile.write("用法: stacks [秒]\n".encode('utf-8'))
+            return
+        try:
+            seconds = float(line[1]) if len(line) > 1 else None
+        except ValueError:
+            self.wfile.write("秒数无效\n".encode('utf-8'))
+            return
+        path = start_stacks(seconds)
+        reply = f"结果将写入 {path}\n" if path else "已有剖析在进行\n"
+        self.wfile.write(reply.encode('utf-8'))
+
+
+class ControlServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_control_server(port, host='127.0.0.1'):
+    server = ControlServer((host, port), ControlHandler)
+    threading.Thread(target=server.serve_forever, name='profiler-control', daemon=True).start()
+    print(f"性能剖析控制端口已启动: {host}:{server.server_address[1]}")
+    return server
+
+
+def install(name, config_file='video_config.conf'):
+    """按 [profiler] 段为名为 name 的进程注册触发方式，需在主线程调用"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if not config.getboolean('profiler', 'enabled', fallback=True):
+        return False
+    settings['name'] = name
+    settings['seconds'] = config.getfloat('profiler', 'seconds', fallback=settings['seconds'])
+    settings['interval'] = config.getfloat('profiler', 'interval', fallback=settings['interval'])
+
+    if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, lambda signum, frame: start_stacks())
+        signal.signal(signal.SIGUSR2, lambda signum, frame: start_cprofile())
+        signal.signal(signal.SIGALRM, _stop_cprofile)
+
+    port = config.getint('profiler', f'{name}_port', fallback=0)
+    if port:
+        try:
+            start_control_server(port, config.get('profiler', 'host', fallback='127.0.0.1'))
+        except OSError as e:
+            print(f"性能剖析控制端口启动失败: {e}")
+    return True
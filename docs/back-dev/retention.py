@@ -0,0 +1,320 @@
+"""
+原始样本的保留期限与后台压缩
+
+采集 CSV 只保留最近 raw_days 天的原始样本。更早的样本每小时只留最后一条，
+按月写入压缩归档 {archive_dir}/{文件名}/{YYYY-MM}.hourly.csv.gz；早于 hourly_days 天
+的整月小时归档再降为每天最后一条（.daily.csv.gz）。所有归档文件记录在
+{archive_dir}/index.json 中，series_store.load(..., archive_dir=...) 会把归档与
+原始数据拼在一起，长期趋势仍然可以查询。
+
+压缩在后台线程中进行：读取和写归档时不持有锁，只在最后改写 CSV 时短暂持有与
+append_to_csv 共用的文件锁，期间追加的行会原样保留。文件锁是跨进程的
+（旁路的 .{文件名}.lock 文件），follower、dynamic 进程的写入同样受保护。
+
+配置读取 video_config.conf 的 [retention] 段:
+
+    [retention]
+    enabled = true
+    raw_days = 90
+    hourly_days = 365
+    archive_dir = archive
+    interval = 3600
+
+raw_days 不能小于 31，analyze.py 的一个月比较需要原始样本。
+
+手动执行一次:
+    python retention.py
+"""
+import codecs
+import configparser
+import gzip
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import series_store
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+MIN_RAW_DAYS = 31
+INDEX_FILE = 'index.json'
+
+
+# 打开的锁文件按数据文件路径缓存，每写一行不必重新打开；超过上限时关闭最久未用且空闲的
+MAX_LOCK_FILES = 256
+
+
+class _LockFile:
+    __slots__ = ('file', 'mutex', 'users')
+
+    def __init__(self, path):
+        directory, name = os.path.split(path)
+        self.file = open(os.path.join(directory, f'.{name}.lock'), 'a+b')
+        # flock 对同一个打开的文件不互斥，进程内的线程另用 mutex 排队
+        self.mutex = threading.Lock()
+        self.users = 0
+
+
+_lock_files = OrderedDict()
+_lock_files_guard = threading.Lock()
+
+
+class file_lock:
+    """数据文件的跨进程锁，写入 CSV 和压缩改写 CSV 时都要持有: with file_lock(path): ..."""
+    __slots__ = ('entry',)
+
+    def __init__(self, path):
+        with _lock_files_guard:
+            entry = _lock_files.get(path)
+            if entry is None:
+                entry = _lock_files[path] = _LockFile(path)
+            else:
+                _lock_files.move_to_end(path)
+            entry.users += 1
+            if len(_lock_files) > MAX_LOCK_FILES:
+                _close_idle()
+        self.entry = entry
+
+    def __enter__(self):
+        entry = self.entry
+        entry.mutex.acquire()
+        try:
+            if fcntl:
+                fcntl.flock(entry.file.fileno(), fcntl.LOCK_EX)
+            else:
+                entry.file.seek(0)
+                msvcrt.locking(entry.file.fileno(), msvcrt.LK_LOCK, 1)
+        except BaseException:
+            self._release()
+            raise
+
+    def __exit__(self, *exc):
+        entry = self.entry
+        try:
+            if fcntl:
+                fcntl.flock(entry.file.fileno(), fcntl.LOCK_UN)
+            else:
+                entry.file.seek(0)
+                msvcrt.locking(entry.file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._release()
+
+    def _release(self):
+        self.entry.mutex.release()
+        with _lock_files_guard:
+            self.entry.users -= 1
+
+
+def _close_idle():
+    """关闭最久未用且没有人持有的锁文件，调用方持有 _lock_files_guard"""
+    for key, entry in list(_lock_files.items()):
+        if len(_lock_files) <= MAX_LOCK_FILES:
+            break
+        if not entry.users:
+            entry.file.close()
+            del _lock_files[key]
+
+
+def _time(line):
+    return line.split(',', 1)[0]
+
+
+def last_per(lines, width):
+    """按时间列前 width 个字符分组（13 为小时，10 为天），每组保留最后一行"""
+    kept = {}
+    for line in lines:
+        kept[line[:width]] = line
+    return list(kept.values())
+
+
+def read_index(archive_dir):
+    try:
+        with open(os.path.join(archive_dir, INDEX_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'files': {}}
+
+
+class Compactor:
+    def __init__(self, data_dir='.', archive_dir='archive', raw_days=90, hourly_days=365):
+        self.data_dir = data_dir
+        self.archive_dir = archive_dir
+        self.raw_days = max(MIN_RAW_DAYS, raw_days)
+        self.hourly_days = max(self.raw_days, hourly_days)
+        if raw_days < MIN_RAW_DAYS:
+            print(f"raw_days 不能小于 {MIN_RAW_DAYS}，已按 {MIN_RAW_DAYS} 天保留原始样本")
+        os.makedirs(archive_dir, exist_ok=True)
+        self.index = read_index(archive_dir)
+
+    def save_index(self):
+        path = os.path.join(self.archive_dir, INDEX_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=1)
+        os.replace(path + '.tmp', path)
+
+    def archive_lines(self, kind, target, tier, month, header, lines):
+        """把同一个月的行追加到归档（gzip 多成员），已归档过的时间跳过"""
+        filename = os.path.basename(series_store.series_path(kind, target))
+        rel = f'{filename[:-4]}/{month}.{tier}.csv.gz'
+        entry = self.index['files'].get(rel)
+        if entry:
+            lines = [line for line in lines if _time(line) > entry['end']]
+        if not lines:
+            return
+        path = os.path.join(self.archive_dir, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(path, 'at', encoding='utf-8', newline='') as f:
+            if entry is None:
+                f.write(header)
+            f.writelines(lines)
+        self.index['files'][rel] = {
+            'kind': kind,
+            'target': str(target),
+            'tier': tier,
+            'start': entry['start'] if entry else _time(lines[0]),
+            'end': _time(lines[-1]),
+            'rows': (entry['rows'] if entry else 0) + len(lines),
+            'bytes': os.path.getsize(path),
+        }
+
+    def compact_file(self, kind, target):
+        """把早于 raw_days 的原始行移入小时归档，返回移出的行数"""
+        path = series_store.series_path(kind, target, self.data_dir)
+        with open(path, 'rb') as f:
+            data = f.read()
+        snapshot = len(data)
+        head = data[:data.find(b'\n') + 1]
+        bom = data.startswith(codecs.BOM_UTF8)
+        lines = data.decode('utf-8-sig', errors='surrogateescape').splitlines(keepends=True)
+        if len(lines) < 2:
+            return 0
+        header, body = lines[0], lines[1:]
+        cutoff = (datetime.now() - timedelta(days=self.raw_days)).strftime('%Y-%m-%d')
+        count = 0
+        while count < len(body) and body[count][:10] < cutoff:
+            count += 1
+        if not count:
+            return 0
+
+        # 不持有锁：按月写入小时归档
+        months = {}
+        for line in last_per(body[:count], 13):
+            months.setdefault(line[:7], []).append(line)
+        for month, month_lines in months.items():
+            self.archive_lines(kind, target, 'hourly', month, header, month_lines)
+        self.save_index()
+
+        # 持有锁：保留剩余的行和快照之后追加的内容
+        with file_lock(path):
+            with open(path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() < snapshot:
+                    print(f"{path} 在压缩期间被改写，跳过")
+                    return 0
+                f.seek(0)
+                if f.read(len(head)) != head:  # sampling_grid.ensure_column 改写了表头
+                    print(f"{path} 在压缩期间被改写，跳过")
+                    return 0
+                f.seek(snapshot)
+                tail = f.read()
+            kept = ''.join([header] + body[count:]).encode('utf-8', errors='surrogateescape')
+            with open(path + '.compact', 'wb') as f:
+                f.write((codecs.BOM_UTF8 if bom else b'') + kept + tail)
+            os.replace(path + '.compact', path)
+        return count
+
+    def demote_hourly(self):
+        """整月都早于 hourly_days 的小时归档降为每天一条"""
+        cutoff = (datetime.now() - timedelta(days=self.hourly_days)).strftime('%Y-%m')
+        demoted = 0
+        for rel, entry in list(self.index['files'].items()):
+            if entry['tier'] != 'hourly' or rel.rsplit('/', 1)[1][:7] >= cutoff:
+                continue
+            path = os.path.join(self.archive_dir, rel)
+            with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+                lines = f.readlines()
+            header, daily = lines[0], last_per(lines[1:], 10)
+            daily_rel = rel.replace('.hourly.', '.daily.')
+            daily_path = os.path.join(self.archive_dir, daily_rel)
+            with gzip.open(daily_path + '.tmp', 'wt', encoding='utf-8', newline='') as f:
+                f.write(header)
+                f.writelines(daily)
+            os.replace(daily_path + '.tmp', daily_path)
+            self.index['files'][daily_rel] = dict(entry, tier='daily', rows=len(daily),
+                                                  bytes=os.path.getsize(daily_path))
+            del self.index['files'][rel]
+            self.save_index()
+            os.remove(path)
+            demoted += 1
+        return demoted
+
+    def run_once(self):
+        """压缩目录中的全部序列，返回 (移出的行数, 降级的归档数)"""
+        moved = 0
+        with file_lock(os.path.join(self.archive_dir, INDEX_FILE)):
+            self.index = read_index(self.archive_dir)
+            for kind, targets in series_store.list_targets(self.data_dir).items():
+                for target in targets:
+                    try:
+                        moved += self.compact_file(kind, target)
+                    except Exception as e:
+                        print(f"压缩 {kind} {target} 失败: {e}")
+            demoted = self.demote_hourly()
+        return moved, demoted
+
+    def loop(self, interval):
+        while True:
+            try:
+                start = time.monotonic()
+                moved, demoted = self.run_once()
+                if moved or demoted:
+                    print(f"压缩完成: 移出 {moved} 行原始样本，{demoted} 个月降为按天保留，"
+                          f"用时 {time.monotonic() - start:.1f} 秒")
+            except Exception as e:
+                print(f"压缩任务出错: {e}")
+            time.sleep(interval)
+
+
+def _read_config(config_file):
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    return config
+
+
+def archive_dir_from_config(config_file='video_config.conf'):
+    """启用 [retention] 时返回归档目录，供读取长期数据的地方使用"""
+    config = _read_config(config_file)
+    if not config.getboolean('retention', 'enabled', fallback=False):
+        return None
+    return config.get('retention', 'archive_dir', fallback='archive')
+
+
+def compactor_from_config(config_file='video_config.conf'):
+    config = _read_config(config_file)
+    return Compactor(archive_dir=config.get('retention', 'archive_dir', fallback='archive'),
+                     raw_days=config.getint('retention', 'raw_days', fallback=90),
+                     hourly_days=config.getint('retention', 'hourly_days', fallback=365))
+
+
+def start_from_config(config_file='video_config.conf'):
+    """按 [retention] 段启动后台压缩线程，未启用时返回 None"""
+    config = _read_config(config_file)
+    if not config.getboolean('retention', 'enabled', fallback=False):
+        return None
+    compactor = compactor_from_config(config_file)
+    interval = config.getfloat('retention', 'interval', fallback=3600)
+    thread = threading.Thread(target=compactor.loop, args=(interval,), name='retention', daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == '__main__':
+    moved, demoted = compactor_from_config().run_once()
+    print(f"移出 {moved} 行原始样本，{demoted} 个月降为按天保留")
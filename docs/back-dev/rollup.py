@@ -0,0 +1,234 @@
+"""
+多分辨率汇总（5 分钟 / 1 小时 / 1 天）
+
+每写入一个样本，同时更新该序列在各个分辨率下所在时间桶的
+first/last/min/max/count。长时间窗口的分析和图表只需读取按天或按小时的汇总行，
+不必扫描全部原始样本。汇总存放在 SQLite 中，原始 CSV 仍是唯一的事实来源，
+汇总可以随时从 CSV 重建。
+
+时间桶按本地时间对齐（与 CSV 中的时间一致），1d 的桶从当天 0 点开始。
+
+配置读取 video_config.conf 的 [rollup] 段:
+
+    [rollup]
+    enabled = true
+    db = rollups.db
+
+命令行:
+    python rollup.py rebuild                       # 从目录中的全部 CSV 重建
+    python rollup.py rebuild video BV1xx411c7mD    # 只重建一个目标
+    python rollup.py show video BV1xx411c7mD view 1d
+"""
+import configparser
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+import numpy as np
+
+import retention
+import series_store
+
+RESOLUTIONS = {'5m': 300, '1h': 3600, '1d': 86400}
+_EPOCH = datetime(1970, 1, 1)
+
+
+def wall_seconds(sample_time):
+    """本地时间（不带时区）对应的秒数，与 datetime64[s] 的整数值一致"""
+    if isinstance(sample_time, str):
+        sample_time = datetime.fromisoformat(sample_time)
+    return int((sample_time - _EPOCH).total_seconds())
+
+
+def as_number(value):
+    """汇总以 REAL 存储，整数值还原为 int"""
+    return int(value) if value == int(value) else value
+
+
+def format_bucket(bucket):
+    return np.datetime_as_string(np.datetime64(int(bucket), 's'), unit='s').replace('T', ' ')
+
+
+class RollupStore:
+    def __init__(self, path='rollups.db'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS rollups (
+                kind TEXT NOT NULL,
+                target TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                resolution TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                first REAL NOT NULL,
+                last REAL NOT NULL,
+                min REAL NOT NULL,
+                max REAL NOT NULL,
+                count INTEGER NOT NULL,
+                first_time INTEGER NOT NULL,
+                last_time INTEGER NOT NULL,
+                PRIMARY KEY (kind, target, metric, resolution, bucket)
+            ) WITHOUT ROWID""")
+        # 按时间范围一次取出所有目标（anomaly.py），包含 last 列，查询不必回表
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_rollups_bucket"
+                          " ON rollups (kind, metric, resolution, bucket, last)")
+
+    def observe(self, kind, target, sample_time, values):
+        """写入一个样本：values 为 {指标: 数值}，空值跳过"""
+        at = wall_seconds(sample_time)
+        rows = []
+        for metric, value in values.items():
+            if value is None:
+                continue
+            value = float(value)
+            for resolution, seconds in RESOLUTIONS.items():
+                rows.append((kind, str(target), metric, resolution, at - at % seconds,
+                             value, value, value, value, at, at))
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 乱序到达的样本也能得到正确的 first/last
+                self.conn.executemany("""
+                    INSERT INTO rollups (kind, target, metric, resolution, bucket,
+                                         first, last, min, max, count, first_time, last_time)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?, ?)
+                    ON CONFLICT (kind, target, metric, resolution, bucket) DO UPDATE SET
+                        first = CASE WHEN excluded.first_time < first_time THEN excluded.first ELSE first END,
+                        first_time = MIN(first_time, excluded.first_time),
+                        last = CASE WHEN excluded.last_time >= last_time THEN excluded.last ELSE last END,
+                        last_time = MAX(last_time, excluded.last_time),
+                        min = MIN(min, excluded.min),
+                        max = MAX(max, excluded.max),
+                        count = count + 1""", rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def rebuild(self, kind, target, data_dir='.', archive_dir=None):
+        """从 CSV（及压缩归档）重建一个目标的全部汇总，返回写入的行数"""
+        series = series_store.load(kind, target, data_dir, archive_dir)
+        rows = []
+        if series is not None and len(series):
+            seconds = series.times.astype(np.int64)
+            for metric, values in series.columns.items():
+                valid = ~np.isnan(values)
+                at, vals = seconds[valid], values[valid]
+                if not len(at):
+                    continue
+                for resolution, width in RESOLUTIONS.items():
+                    rows.extend(aggregate(kind, target, metric, resolution, at, vals, width))
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("DELETE FROM rollups WHERE kind = ? AND target = ?", (kind, str(target)))
+                self.conn.executemany("INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def rebuild_all(self, data_dir='.', archive_dir=None):
+        total = 0
+        for kind, targets in series_store.list_targets(data_dir).items():
+            for target in targets:
+                total += self.rebuild(kind, target, data_dir, archive_dir)
+        return total
+
+    def query(self, kind, target, metric, resolution, start=None, end=None):
+        """
+        按时间顺序返回 [(桶开始秒数, first, last, min, max, count)]，
+        start/end 为本地时间秒数，闭区间
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"不支持的分辨率: {resolution}")
+        sql = ("SELECT bucket, first, last, min, max, count FROM rollups"
+               " WHERE kind = ? AND target = ? AND metric = ? AND resolution = ?")
+        args = [kind, str(target), metric, resolution]
+        if start is not None:
+            sql += " AND bucket >= ?"
+            args.append(int(start) - int(start) % RESOLUTIONS[resolution])
+        if end is not None:
+            sql += " AND bucket <= ?"
+            args.append(int(end))
+        with self.lock:
+            return self.conn.execute(sql + " ORDER BY bucket", args).fetchall()
+
+    def query_all(self, kind, metric, resolution, start, end):
+        """一次取出某种序列所有目标在 [start, end] 内的汇总: [(目标, 桶开始秒数, last)]"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT target, bucket, last FROM rollups"
+                " WHERE kind = ? AND metric = ? AND resolution = ? AND bucket >= ? AND bucket <= ?",
+                (kind, metric, resolution, int(start), int(end))).fetchall()
+
+    def covered_since(self, kind, target, metric):
+        """汇总中该序列最早的样本时间（本地时间秒数），没有汇总时为 None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT MIN(first_time) FROM rollups WHERE kind = ? AND target = ? AND metric = ? AND resolution = '1d'",
+                (kind, str(target), metric)).fetchone()
+        return row[0]
+
+    def has(self, kind, target):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM rollups WHERE kind = ? AND target = ? LIMIT 1",
+                                     (kind, str(target))).fetchone() is not None
+
+
+def aggregate(kind, target, metric, resolution, at, values, width):
+    """按时间排序的样本一次性分桶，返回汇总行"""
+    buckets = at - at % width
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    mins = np.minimum.reduceat(values, starts)
+    maxs = np.maximum.reduceat(values, starts)
+    counts = ends - starts + 1
+    return [
+        (kind, str(target), metric, resolution, int(b), float(f), float(l), float(lo), float(hi), int(c), int(ft), int(lt))
+        for b, f, l, lo, hi, c, ft, lt in zip(buckets[starts], values[starts], values[ends], mins, maxs,
+                                                counts, at[starts], at[ends])
+    ]
+
+
+def observe_row(store, kind, target, sample_time, row):
+    """按 CSV 列名组成的一行数据更新汇总，失败只打印，不影响写入 CSV"""
+    columns = series_store.SERIES[kind][1]
+    try:
+        store.observe(kind, target, sample_time, {metric: row.get(column) for metric, column in columns.items()})
+    except Exception as e:
+        print(f"更新 {kind} {target} 的汇总失败: {e}")
+
+
+def from_config(config_file='video_config.conf'):
+    """按 [rollup] 段打开汇总库，未启用时返回 None"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if not config.getboolean('rollup', 'enabled', fallback=False):
+        return None
+    return RollupStore(config.get('rollup', 'db', fallback='rollups.db'))
+
+
+def main():
+    args = sys.argv[1:]
+    config = configparser.ConfigParser()
+    config.read('video_config.conf', encoding='utf-8')
+    store = RollupStore(config.get('rollup', 'db', fallback='rollups.db'))
+    archive_dir = retention.archive_dir_from_config()
+    if args[:1] == ['rebuild'] and len(args) == 3:
+        print(f"已重建 {args[1]} {args[2]}: {store.rebuild(args[1], args[2], archive_dir=archive_dir)} 行")
+    elif args[:1] == ['rebuild']:
+        print(f"已重建全部汇总: {store.rebuild_all(archive_dir=archive_dir)} 行")
+    elif args[:1] == ['show'] and len(args) == 5:
+        for bucket, first, last, low, high, count in store.query(*args[1:]):
+            print(f"{format_bucket(bucket)}  first={first:g} last={last:g} min={low:g} max={high:g} n={count}")
+    else:
+        print("用法: python rollup.py rebuild [种类 目标] | show 种类 目标 指标 分辨率")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+按整点对齐的采样网格
+
+默认情况下视频按 schedule 的相对间隔采集，每次执行都比上一次晚一点（请求耗时、
+主循环 1 秒的轮询），不同视频的采样时间也各不相同，合并或比较多个序列需要按时间
+做就近匹配。启用 [grid] 后：
+
+- 采集任务固定在整点网格上执行（step 为 5 分钟时为 :00、:05、:10 ...），
+  视频的间隔向上取整为 step 的整数倍，间隔相同的视频在同一组网格点上采样；
+- CSV 的“时间”列写入所在网格点（采集时间向下取整），实际的采集时间另写入
+  “抓取时间”列，可以据此检查调度延迟；
+- load_matrix 把多个序列直接放到同一网格上：时间为 start + k * step 的样本就在
+  第 k 列，跨序列的求和、比较只是数组运算，不需要逐个序列匹配时间。
+
+配置读取 video_config.conf 的 [grid] 段:
+
+    [grid]
+    enabled = true
+    step_minutes = 5
+
+查看最近 24 小时全部视频播放量之和:
+    python sampling_grid.py video view --hours 24
+"""
+import argparse
+import configparser
+import csv
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import retention
+import rollup
+import series_store
+
+FETCH_TIME = '抓取时间'
+
+
+class Grid:
+    def __init__(self, step=300):
+        self.step = int(step)
+
+    def period(self, interval):
+        """视频间隔（秒）向上取整为 step 的整数倍"""
+        return max(1, -(-int(interval) // self.step)) * self.step
+
+    def slot(self, sample_time, period=None):
+        """采样时间所在的网格点（向下取整）"""
+        width = period or self.step
+        seconds = rollup.wall_seconds(sample_time)
+        return sample_time - timedelta(seconds=seconds % width, microseconds=sample_time.microsecond)
+
+    def next_slot(self, after, period):
+        """after 之后的下一个网格点"""
+        return self.slot(after, period) + timedelta(seconds=period)
+
+    def attach(self, job, interval):
+        """把 schedule 的任务对齐到网格，返回实际使用的间隔（秒）"""
+        job.grid_period = self.period(interval)
+        job.next_run = self.next_slot(datetime.now(), job.grid_period)
+        return job.grid_period
+
+    def align(self, jobs):
+        """
+        schedule 执行任务后按“当前时间 + 间隔”计算下一次时间，会逐渐偏离网格；
+        主循环每次 run_pending 之后调用，把刚执行过的任务重新放回网格点上
+        """
+        for job in jobs:
+            period = getattr(job, 'grid_period', None)
+            if period and job.last_run and self.slot(job.next_run, period) != job.next_run:
+                job.next_run = self.next_slot(job.last_run, period)
+
+    def stamp(self, row, sample_time):
+        """把一行数据的“时间”改为网格点，实际采集时间写入“抓取时间”"""
+        row['时间'] = self.slot(sample_time).strftime('%Y-%m-%d %H:%M')
+        row[FETCH_TIME] = sample_time.strftime('%Y-%m-%d %H:%M:%S')
+        return row
+
+
+def ensure_column(path, fieldnames):
+    """
+    已有的 CSV 表头缺少新列时改写表头，旧的行保持原样（缺少的列读作空值）。
+    调用方需持有 retention.file_lock，返回写入时应使用的列名
+    """
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        header = next(csv.reader(f), None)
+    if not header:
+        return fieldnames
+    missing = [name for name in fieldnames if name not in header]
+    if not missing:
+        return header
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        f.readline()
+        body = f.read()
+    with open(path + '.header', 'w', newline='', encoding='utf-8-sig') as f:
+        csv.writer(f).writerow(header + missing)
+        f.write(body)
+    os.replace(path + '.header', path)
+    print(f"{path} 的表头已增加 {', '.join(missing)} 列")
+    return header + missing
+
+
+def load_matrix(kind, metric, start, end, step, targets=None, data_dir='.', archive_dir=None):
+    """
+    把多个序列放到同一网格上: 返回 (目标列表, (目标数, (end - start) // step) 的矩阵)。
+    第 k 列为 [start + k * step, start + (k + 1) * step) 内最后一个样本，没有样本为 NaN；
+    按网格写入的数据每个网格点恰好一个样本，旧数据按所在网格点取最后一个。
+    start、end 为本地时间秒数（rollup.wall_seconds）
+    """
+    slots = (end - start) // step
+    if targets is None:
+        targets = series_store.list_targets(data_dir)[kind]
+    names, rows = [], []
+    for target in targets:
+        series = series_store.load(kind, target, data_dir, archive_dir)
+        if series is None or metric not in series.columns:
+            continue
+        window = series.between(np.datetime64(start, 's'), np.datetime64(start + slots * step - 1, 's'))
+        offsets = (series.times[window].astype(np.int64) - start) // step
+        values = series.columns[metric][window]
+        last = np.diff(offsets, append=np.iinfo(np.int64).max) != 0  # 每个网格点的最后一个样本
+        row = np.full(slots, np.nan)
+        row[offsets[last]] = values[last]
+        names.append(target)
+        rows.append(row)
+    matrix = np.vstack(rows) if rows else np.empty((0, slots))
+    return names, matrix
+
+
+def from_config(config_file='video_config.conf'):
+    """按 [grid] 段创建网格，未启用时返回 None"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if not config.getboolean('grid', 'enabled', fallback=False):
+        return None
+    return Grid(config.getint('grid', 'step_minutes', fallback=5) * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按网格对齐的多序列汇总')
+    parser.add_argument('kind', choices=list(series_store.SERIES))
+    parser.add_argument('metric')
+    parser.add_argument('--hours', type=int, default=24)
+    args = parser.parse_args()
+    grid = from_config() or Grid()
+    end = rollup.wall_seconds(grid.slot(datetime.now())) + grid.step
+    start = end - args.hours * 3600
+    targets, matrix = load_matrix(args.kind, args.metric, start, end, grid.step,
+                                  archive_dir=retention.archive_dir_from_config())
+    total = np.nansum(matrix, axis=0)
+    reported = (~np.isnan(matrix)).sum(axis=0)
+    for k in np.flatnonzero(reported):
+        print(f"{rollup.format_bucket(start + k * grid.step)[:16]}  {rollup.as_number(total[k]):>14}"
+              f"  ({reported[k]}/{len(targets)} 个序列)")
+
+
+if __name__ == '__main__':
+    main()
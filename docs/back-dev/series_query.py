@@ -0,0 +1,293 @@
+"""
+时间序列范围查询服务
+
+前端图表不再直接读取完整的 CSV，而是按目标、指标和时间范围查询，服务端把结果
+降采样到不超过 max_points 个点再返回：
+
+    GET /targets
+    GET /series?kind=video&target=BV1xx411c7mD&metric=view&start=2025-05-01&end=2025-06-01&max_points=800&method=lttb
+
+kind/metric 见 series_store.SERIES；method 为 lttb（默认，保留曲线形状）或
+minmax（每个桶保留最小值和最大值，不会漏掉尖峰）。
+
+启用 [rollup] 时可以用 resolution=5m/1h/1d 直接读取预先汇总的数据，每个点的值为
+桶内最后一个样本，另在 bands 中给出桶内的最小值和最大值；resolution=auto 按时间
+范围选择能容纳在 max_points 以内的最细分辨率，范围较短时仍读原始数据。
+启用 [retention] 时原始数据包括压缩归档中的历史样本。
+
+响应带 ETag，由数据文件的修改时间、大小和查询参数计算。浏览器用 If-None-Match
+重新请求时，文件没有变化就直接返回 304，不读取也不传输数据。
+
+配置读取 video_config.conf 的 [query] 段:
+
+    [query]
+    host = 127.0.0.1
+    port = 9110
+    data_dir = .
+    max_points = 5000
+    allow_origin = *
+
+运行:
+    python series_query.py
+"""
+import configparser
+import hashlib
+import json
+import os
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import retention
+import rollup
+import series_store
+
+DEFAULT_POINTS = 1000
+METHODS = ('lttb', 'minmax')
+RESOLUTIONS = ('raw', 'auto') + tuple(rollup.RESOLUTIONS)
+
+
+class QueryError(ValueError):
+    """查询参数错误，返回 400"""
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets 降采样，返回选中点的下标"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # 首尾两点固定，中间 n-2 个点分成 threshold-2 个桶
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(y, threshold):
+    """每个桶保留最小值和最大值所在的点，返回按时间排序的下标"""
+    n = len(y)
+    if threshold >= n or threshold < 2:
+        return np.arange(n)
+    buckets = threshold // 2
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    picked = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            chunk = y[start:end]
+            picked.append(start + int(chunk.argmin()))
+            picked.append(start + int(chunk.argmax()))
+    return np.unique(np.array(picked, dtype=np.int64))
+
+
+def parse_time(value):
+    if not value:
+        return None
+    try:
+        return np.datetime64(value.replace('T', ' ').strip(), 's')
+    except ValueError:
+        raise QueryError(f"无法解析时间: {value}") from None
+
+
+def pick_resolution(rollups, kind, target, metric, start, end, max_points):
+    """选择桶数不超过 max_points 的最细汇总分辨率；5m 也放得下时直接用原始数据"""
+    if start is None or end is None:
+        days = rollups.query(kind, target, metric, '1d')
+        if not days:
+            return 'raw'
+        start = days[0][0] if start is None else start
+        end = days[-1][0] + rollup.RESOLUTIONS['1d'] if end is None else end
+    span = max(0, end - start)
+    for resolution, width in rollup.RESOLUTIONS.items():
+        if span / width <= max_points:
+            return 'raw' if resolution == '5m' else resolution
+    return '1d'
+
+
+def query_rollup(rollups, kind, target, metric, resolution, start, end, max_points):
+    rows = rollups.query(kind, target, metric, resolution, start, end)
+    buckets = np.array([row[0] for row in rows], dtype=np.int64)
+    last = np.array([row[2] for row in rows], dtype=np.float64)
+    index = lttb(buckets.astype(np.float64), last, max_points)
+    times = np.datetime_as_string(buckets[index].astype('datetime64[s]'), unit='s').tolist()
+    picked = [rows[i] for i in index]
+    return {
+        'total': len(rows),
+        'returned': len(picked),
+        'points': [[t, rollup.as_number(row[2])] for t, row in zip(times, picked)],
+        'bands': [[t, rollup.as_number(row[3]), rollup.as_number(row[4])] for t, row in zip(times, picked)],
+    }
+
+
+def query(params, data_dir='.', points_limit=5000, rollups=None, archive_dir=None):
+    """执行一次序列查询，返回可 JSON 序列化的字典；目标不存在时返回 None"""
+    kind = params.get('kind', 'video')
+    metric = params.get('metric', '')
+    target = params.get('target', '')
+    method = params.get('method', 'lttb')
+    if kind not in series_store.SERIES:
+        raise QueryError(f"未知的种类: {kind}")
+    if metric not in series_store.SERIES[kind][1]:
+        raise QueryError(f"{kind} 没有指标 {metric}，可选: {', '.join(series_store.SERIES[kind][1])}")
+    if not target or '/' in target or '\\' in target:
+        raise QueryError("缺少或无效的 target")
+    if method not in METHODS:
+        raise QueryError(f"未知的降采样方法: {method}")
+    try:
+        max_points = min(int(params.get('max_points', DEFAULT_POINTS)), points_limit)
+    except ValueError:
+        raise QueryError("max_points 必须是整数") from None
+    if max_points < 3:
+        # lttb/minmax 在点数过小时会返回全部原始点
+        raise QueryError("max_points 不能小于 3")
+    resolution = params.get('resolution', 'raw')
+    if resolution not in RESOLUTIONS:
+        raise QueryError(f"未知的分辨率: {resolution}")
+    if resolution != 'raw' and rollups is None:
+        raise QueryError("未启用 [rollup]，只能查询原始数据")
+    start, end = parse_time(params.get('start')), parse_time(params.get('end'))
+
+    if resolution != 'raw':
+        start_s = None if start is None else int(start.astype(np.int64))
+        end_s = None if end is None else int(end.astype(np.int64))
+        if resolution == 'auto':
+            resolution = pick_resolution(rollups, kind, target, metric, start_s, end_s, max_points)
+        if resolution != 'raw':
+            result = query_rollup(rollups, kind, target, metric, resolution, start_s, end_s, max_points)
+            if not result['total'] and not rollups.has(kind, target):
+                return None
+            return {'kind': kind, 'target': target, 'metric': metric, 'method': 'lttb',
+                    'resolution': resolution, **result}
+
+    series = series_store.load(kind, target, data_dir, archive_dir)
+    if series is None or metric not in series.columns:
+        return None
+    window = series.between(start, end)
+    times = series.times[window]
+    values = series.columns[metric][window]
+    valid = ~np.isnan(values)
+    times, values = times[valid], values[valid]
+
+    total = len(times)
+    if method == 'lttb':
+        index = lttb(times.astype(np.int64).astype(np.float64), values, max_points)
+    else:
+        index = minmax(values, max_points)
+    times, values = times[index], values[index]
+    if len(values) and (values == np.round(values)).all():
+        values = values.astype(np.int64)
+    return {
+        'kind': kind,
+        'target': target,
+        'metric': metric,
+        'method': method,
+        'resolution': 'raw',
+        'total': total,
+        'returned': len(index),
+        'points': list(zip(np.datetime_as_string(times, unit='s').tolist(), values.tolist())),
+    }
+
+
+def make_etag(path, params, archive_dir=None):
+    """由数据文件（及归档索引）的签名和规范化的查询参数计算 ETag，无需读取数据"""
+    signatures = [series_store.signature(path)]
+    if archive_dir:
+        signatures.append(series_store.signature(os.path.join(archive_dir, 'index.json')))
+    key = json.dumps([path, signatures, sorted(params.items())])
+    return '"' + hashlib.md5(key.encode('utf-8')).hexdigest() + '"'
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    data_dir = '.'
+    points_limit = 5000
+    allow_origin = '*'
+    rollups = None
+    archive_dir = None
+
+    def _reply(self, status, payload=None, etag=None):
+        body = b'' if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        if payload is not None:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+            # 每次都向服务端确认，数据未变时只返回 304
+            self.send_header('Cache-Control', 'no-cache')
+        if self.allow_origin:
+            self.send_header('Access-Control-Allow-Origin', self.allow_origin)
+            self.send_header('Access-Control-Expose-Headers', 'ETag')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(parts.query))
+        if parts.path == '/targets':
+            return self._reply(200, series_store.list_targets(self.data_dir))
+        if parts.path != '/series':
+            return self._reply(404, {'error': '未知的路径'})
+
+        try:
+            path = series_store.series_path(params.get('kind', 'video'), params.get('target', ''), self.data_dir)
+        except KeyError:
+            return self._reply(400, {'error': f"未知的种类: {params.get('kind')}"})
+        etag = make_etag(path, params, self.archive_dir)
+        if etag in self.headers.get('If-None-Match', ''):
+            return self._reply(304, etag=etag)
+        try:
+            result = query(params, self.data_dir, self.points_limit, self.rollups, self.archive_dir)
+        except QueryError as e:
+            return self._reply(400, {'error': str(e)})
+        if result is None:
+            return self._reply(404, {'error': '没有该目标或指标的数据'})
+        self._reply(200, result, etag=etag)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(config_file='video_config.conf'):
+    """按 [query] 段启动查询服务，返回 server"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    host = config.get('query', 'host', fallback='127.0.0.1')
+    port = config.getint('query', 'port', fallback=9110)
+    handler = type('BoundQueryHandler', (QueryHandler,), {
+        'data_dir': config.get('query', 'data_dir', fallback='.'),
+        'points_limit': config.getint('query', 'max_points', fallback=5000),
+        'allow_origin': config.get('query', 'allow_origin', fallback='*'),
+        'rollups': rollup.from_config(config_file),
+        'archive_dir': retention.archive_dir_from_config(config_file),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"查询服务已启动: http://{host}:{server.server_port}/series")
+    return server
+
+
+def main():
+    server = start_server()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n查询服务已停止")
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+采集结果 CSV 的统一读取
+
+三个采集器各自写一种 CSV：main.py 的 {bvid}_views.csv、follower_monitor.py 的
+{mid}_follower.csv、dynamic_monitor.py 的 {动态id}_detailcount.csv。这里把它们
+统一成 (种类, 目标, 指标) 定位的时间序列，读入 NumPy 数组并按文件的修改时间和
+大小缓存，文件没有变化时不重复解析。
+"""
+import csv
+import gzip
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# 种类 -> (文件后缀, {指标: CSV 列名})
+SERIES = {
+    'video': ('_views.csv', {
+        'view': '播放量',
+        'online': '在线观看人数',
+        'like': '点赞',
+        'coin': '投币',
+        'favorite': '收藏',
+        'share': '分享',
+        'danmaku': '弹幕',
+    }),
+    'follower': ('_follower.csv', {
+        'follower': '粉丝数',
+    }),
+    'dynamic': ('_detailcount.csv', {
+        'like': '点赞数',
+        'forward': '转发数',
+        'comment': '评论数',
+    }),
+}
+
+CACHE_SIZE = 128
+
+
+class Series:
+    """一个 CSV 文件的全部列：times 为 datetime64[s]，columns 为 {指标: float64 数组}"""
+    __slots__ = ('kind', 'target', 'times', 'columns')
+
+    def __init__(self, kind, target, times, columns):
+        self.kind = kind
+        self.target = target
+        self.times = times
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.times)
+
+    def between(self, start=None, end=None):
+        """时间范围 [start, end] 对应的切片"""
+        lo = 0 if start is None else np.searchsorted(self.times, start, side='left')
+        hi = len(self.times) if end is None else np.searchsorted(self.times, end, side='right')
+        return slice(lo, hi)
+
+
+def series_path(kind, target, data_dir='.'):
+    if kind not in SERIES:
+        raise KeyError(kind)
+    return os.path.join(data_dir, f'{target}{SERIES[kind][0]}')
+
+
+def signature(path):
+    """文件的 (修改时间, 大小)，文件不存在时为 None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def list_targets(data_dir='.'):
+    """目录中已有数据的目标: {种类: [目标]}"""
+    targets = {kind: [] for kind in SERIES}
+    for filename in sorted(os.listdir(data_dir)):
+        for kind, (suffix, _) in SERIES.items():
+            if filename.endswith(suffix):
+                targets[kind].append(filename[:-len(suffix)])
+    return targets
+
+
+def _to_number(text):
+    text = text.strip().rstrip('+')  # 在线人数可能是 "1000+"
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+
+def _read_rows(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        return header, [row for row in reader if row and row[0]]
+
+
+def build_series(kind, target, header, rows):
+    metrics = SERIES[kind][1]
+    positions = {metric: header.index(column) for metric, column in metrics.items() if column in header}
+    times = np.array([row[0] for row in rows], dtype='datetime64[s]')
+    columns = {
+        metric: np.array([_to_number(row[i]) if i < len(row) else np.nan for row in rows], dtype=np.float64)
+        for metric, i in positions.items()
+    }
+    # 正常情况下按时间追加；若有乱序（例如手工合并过文件、归档与原始数据重叠）则排序去重
+    if len(times) > 1 and (np.diff(times) <= np.timedelta64(0, 's')).any():
+        order = np.argsort(times, kind='stable')
+        times = times[order]
+        keep = np.r_[times[1:] != times[:-1], True]
+        times = times[keep]
+        columns = {metric: values[order][keep] for metric, values in columns.items()}
+    return Series(kind, target, times, columns)
+
+
+def parse_csv(kind, target, path):
+    header, rows = _read_rows(path)
+    return build_series(kind, target, header, rows)
+
+
+def archive_files(kind, target, archive_dir):
+    """retention.py 为该目标写下的归档文件，按时间顺序"""
+    try:
+        with open(os.path.join(archive_dir, 'index.json'), 'r', encoding='utf-8') as f:
+            files = json.load(f)['files']
+    except (OSError, ValueError, KeyError):
+        return []
+    entries = [(entry['start'], rel) for rel, entry in files.items()
+               if entry['kind'] == kind and entry['target'] == str(target)]
+    return [os.path.join(archive_dir, rel) for _, rel in sorted(entries)]
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def load(kind, target, data_dir='.', archive_dir=None):
+    """
+    读取一个目标的序列，文件不存在时返回 None。
+    给出 archive_dir 时在前面拼上 retention.py 压缩归档的历史数据。
+    """
+    path = series_path(kind, target, data_dir)
+    sig = signature(path)
+    if archive_dir:
+        sig = (sig, signature(os.path.join(archive_dir, 'index.json')))
+    elif sig is None:
+        return None
+    key = (path, archive_dir)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == sig:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    archives = archive_files(kind, target, archive_dir) if archive_dir else []
+    if not archives and not os.path.exists(path):
+        return None
+    header, rows = [], []
+    for filename in archives + ([path] if os.path.exists(path) else []):
+        file_header, file_rows = _read_rows(filename)
+        header = header or file_header
+        rows.extend(file_rows)
+    series = build_series(kind, target, header, rows)
+    with _cache_lock:
+        _cache[key] = (sig, series)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return series
@@ -0,0 +1,250 @@
+"""
+多进程/多节点分片采集
+
+同一组采集进程（main、follower、dynamic 各为一组）共用一个 SQLite 协调库。
+每个进程定时写入心跳，心跳未过期的进程构成一致性哈希环，目标（bvid、mid、
+动态 id）按哈希分配给环上的进程。进程加入或退出（心跳过期）时环随之变化，
+只有少量目标换手。
+
+采集前必须先拿到目标的租约：只有环上的归属者能拿到，且原归属者的租约未过期前
+新归属者不会开始采集，因此换手期间同一目标不会被两个进程同时采集。租约释放时
+记录完成时间，距上次完成不足 min_gap 秒的目标也不会被新归属者重复采集。
+进程异常退出时没有机会释放，它的目标要等心跳过期（ttl 秒）后才由其他进程接管。
+
+配置读取 video_config.conf 的 [shard] 段:
+
+    [shard]
+    enabled = true
+    db = shard.db
+    ttl = 30
+    heartbeat = 10
+    lease = 120
+    vnodes = 64
+
+多个节点需能访问同一个 db 文件（SQLite 不适合放在网络文件系统上时，
+同一台机器上的多个进程最可靠）。环境变量 BILI_WORKER_ID 可指定进程标识，
+默认为 主机名-进程号。
+
+查看当前分配:
+    python sharding.py status
+"""
+import bisect
+import configparser
+import hashlib
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+import target_registry
+
+DEFAULT_TTL = 30
+DEFAULT_HEARTBEAT = 10
+DEFAULT_LEASE = 120
+DEFAULT_VNODES = 64
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """带虚拟节点的一致性哈希环"""
+
+    def __init__(self, nodes=(), vnodes=DEFAULT_VNODES):
+        self.nodes = sorted(nodes)
+        points = sorted((_hash(f'{node}#{i}'), node) for node in self.nodes for i in range(vnodes))
+        self.keys = [point for point, _ in points]
+        self.owners = [node for _, node in points]
+
+    def owner(self, key):
+        if not self.keys:
+            return None
+        index = bisect.bisect(self.keys, _hash(key)) % len(self.keys)
+        return self.owners[index]
+
+
+class ShardCoordinator:
+    """用 SQLite 记录心跳和租约的分片协调器"""
+
+    def __init__(self, group, db_path='shard.db', worker_id=None, ttl=DEFAULT_TTL,
+                 heartbeat=DEFAULT_HEARTBEAT, lease=DEFAULT_LEASE, vnodes=DEFAULT_VNODES):
+        self.group = group
+        self.worker_id = worker_id or os.getenv('BILI_WORKER_ID') or f'{socket.gethostname()}-{os.getpid()}'
+        self.ttl = ttl
+        self.heartbeat_interval = heartbeat
+        self.lease_seconds = lease
+        self.vnodes = vnodes
+        self.lock = threading.Lock()
+        self.running = False
+        self._ring = None
+        self._ring_nodes = None
+
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS workers (
+                grp TEXT NOT NULL,
+                worker_id TEXT NOT NULL,
+                heartbeat REAL NOT NULL,
+                PRIMARY KEY (grp, worker_id)
+            )""")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                grp TEXT NOT NULL,
+                target TEXT NOT NULL,
+                worker_id TEXT NOT NULL,
+                expires REAL NOT NULL,
+                last_done REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (grp, target)
+            )""")
+
+    def heartbeat(self):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO workers (grp, worker_id, heartbeat) VALUES (?, ?, ?)",
+                              (self.group, self.worker_id, now))
+            # 清理早已失联的进程
+            self.conn.execute("DELETE FROM workers WHERE grp = ? AND heartbeat < ?", (self.group, now - self.ttl * 10))
+
+    def live_workers(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT worker_id FROM workers WHERE grp = ? AND heartbeat >= ?",
+                                     (self.group, time.time() - self.ttl)).fetchall()
+        return [row[0] for row in rows]
+
+    def ring(self):
+        nodes = sorted(self.live_workers())
+        if nodes != self._ring_nodes:
+            if self._ring_nodes is not None:
+                print(f"分片成员变化: {len(self._ring_nodes)} -> {len(nodes)} 个进程")
+            self._ring = HashRing(nodes, self.vnodes)
+            self._ring_nodes = nodes
+        return self._ring
+
+    def owner(self, target):
+        return self.ring().owner(target)
+
+    def acquire(self, target, min_gap=0):
+        """
+        归属本进程、没有他人的有效租约、且距上次完成已超过 min_gap 秒时取得租约，
+        返回是否可以采集
+        """
+        owned = self.owner(target) == self.worker_id
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("SELECT worker_id, expires, last_done FROM leases WHERE grp = ? AND target = ?",
+                                        (self.group, target)).fetchone()
+                if not owned:
+                    granted = False
+                elif row and row[0] != self.worker_id and row[1] >= now:
+                    # 原归属者可能还在采集，等它的租约释放或过期
+                    granted = False
+                elif row and row[2] > now - min_gap:
+                    # 刚被采集过（可能是换手前的归属者）
+                    granted = False
+                else:
+                    self.conn.execute("INSERT INTO leases (grp, target, worker_id, expires) VALUES (?, ?, ?, ?)"
+                                      " ON CONFLICT (grp, target) DO UPDATE"
+                                      " SET worker_id = excluded.worker_id, expires = excluded.expires",
+                                      (self.group, target, self.worker_id, now + self.lease_seconds))
+                    granted = True
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return granted
+
+    def release(self, target):
+        """采集完成后释放租约并记录完成时间"""
+        with self.lock:
+            self.conn.execute("UPDATE leases SET expires = 0, last_done = ? WHERE grp = ? AND target = ? AND worker_id = ?",
+                              (time.time(), self.group, target, self.worker_id))
+
+    def _heartbeat_loop(self):
+        while self.running:
+            try:
+                self.heartbeat()
+            except sqlite3.Error as e:
+                print(f"分片心跳写入失败: {e}")
+            time.sleep(self.heartbeat_interval)
+
+    def start(self):
+        """写入首次心跳并启动心跳线程"""
+        self.heartbeat()
+        self.running = True
+        threading.Thread(target=self._heartbeat_loop, name='shard-heartbeat', daemon=True).start()
+        print(f"分片模式: 组 {self.group}，进程 {self.worker_id}，当前 {len(self.live_workers())} 个进程")
+
+    def leave(self):
+        """主动退出：删除心跳和租约，其他进程立即接管"""
+        self.running = False
+        with self.lock:
+            self.conn.execute("DELETE FROM workers WHERE grp = ? AND worker_id = ?", (self.group, self.worker_id))
+            self.conn.execute("UPDATE leases SET expires = 0 WHERE grp = ? AND worker_id = ?", (self.group, self.worker_id))
+
+
+def from_config(group, config_file='video_config.conf'):
+    """按 [shard] 段创建并启动协调器，未启用时返回 None"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if not config.getboolean('shard', 'enabled', fallback=False):
+        return None
+    coordinator = ShardCoordinator(
+        group,
+        db_path=config.get('shard', 'db', fallback='shard.db'),
+        ttl=config.getfloat('shard', 'ttl', fallback=DEFAULT_TTL),
+        heartbeat=config.getfloat('shard', 'heartbeat', fallback=DEFAULT_HEARTBEAT),
+        lease=config.getfloat('shard', 'lease', fallback=DEFAULT_LEASE),
+        vnodes=config.getint('shard', 'vnodes', fallback=DEFAULT_VNODES),
+    )
+    coordinator.start()
+    return coordinator
+
+
+def configured_targets(config_file='video_config.conf'):
+    """配置文件中各组的目标"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    targets = {
+        'main': [config.get(s, 'bvid') for s in config.sections() if s.startswith('video_')],
+        'follower': [mid.strip() for mid in config.get('user', 'mids', fallback='').split(',') if mid.strip()],
+        'dynamic': [s.split('_', 1)[1] for s in config.sections() if s.startswith('detail_')],
+    }
+    registry = target_registry.from_config(config_file)
+    if registry:
+        targets['main'] = [target.bvid for target in registry.videos()]
+    return targets
+
+
+def status(config_file='video_config.conf'):
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    db_path = config.get('shard', 'db', fallback='shard.db')
+    if not os.path.exists(db_path):
+        print(f"协调库 {db_path} 不存在，分片模式尚未运行")
+        return
+    for group, targets in configured_targets(config_file).items():
+        coordinator = ShardCoordinator(group, db_path, worker_id='status',
+                                       ttl=config.getfloat('shard', 'ttl', fallback=DEFAULT_TTL),
+                                       vnodes=config.getint('shard', 'vnodes', fallback=DEFAULT_VNODES))
+        workers = coordinator.live_workers()
+        print(f"[{group}] {len(workers)} 个进程，{len(targets)} 个目标")
+        counts = {worker: 0 for worker in workers}
+        for target in targets:
+            owner = coordinator.owner(target)
+            if owner:
+                counts[owner] += 1
+        for worker, count in sorted(counts.items()):
+            print(f"  {worker}: {count}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'status':
+        status()
+    else:
+        print("用法: python sharding.py status")
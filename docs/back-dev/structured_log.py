@@ -0,0 +1,161 @@
+"""
+异步、可采样的结构化日志
+
+async 模式下调用方只把日志记录放进队列，由后台线程写文件，不在请求路径上阻塞磁盘。
+文件中每条日志是一行 JSON，extra 传入的字段原样成为 JSON 字段；同一 code 的错误
+在每个时间窗口内只完整记录前 burst 条，之后每 sample_every 条记录一条，
+并在 suppressed 字段中给出期间丢弃的条数。文件按大小轮转。
+
+配置读取 [logging] 段，sync 模式保持原来的同步纯文本日志:
+
+    [logging]
+    mode = async
+    max_bytes = 10485760
+    backup_count = 5
+    burst = 5
+    window = 60
+    sample_every = 100
+    queue_size = 10000
+
+用法:
+    logger = structured_log.setup('comment', 'comment_log.log', 'video_lottery.conf')
+    logger.error("获取评论失败", extra={'event': 'reply_failed', 'code': -352, 'url': url})
+"""
+import atexit
+import configparser
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from datetime import datetime
+
+DEFAULTS = {
+    'mode': 'async',
+    'max_bytes': 10 * 1024 * 1024,
+    'backup_count': 5,
+    'burst': 5,
+    'window': 60.0,
+    'sample_every': 100,
+    'queue_size': 10000,
+}
+
+# LogRecord 自带的属性，其余的都来自 extra
+_RECORD_ATTRS = set(logging.makeLogRecord({}).__dict__) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录一行 JSON"""
+
+    def format(self, record):
+        event = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                event[key] = value
+        if record.exc_info:
+            event['exc'] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+class CodeSampler(logging.Filter):
+    """按 code 字段对重复错误限流和采样，没有 code 的记录不受影响"""
+
+    def __init__(self, burst=5, window=60.0, sample_every=100):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.sample_every = max(1, sample_every)
+        self.lock = threading.Lock()
+        self.state = {}  # code -> [窗口开始时间, 窗口内条数, 未记录条数]
+
+    def filter(self, record):
+        code = getattr(record, 'code', None)
+        if code is None:
+            return True
+        now = time.monotonic()
+        with self.lock:
+            state = self.state.get(code)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state else 0
+                state = self.state[code] = [now, 0, suppressed]
+            state[1] += 1
+            seen = state[1]
+            if seen > self.burst and (seen - self.burst) % self.sample_every:
+                state[2] += 1
+                return False
+            suppressed, state[2] = state[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃记录而不是阻塞调用方"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _read_settings(config_file):
+    settings = dict(DEFAULTS)
+    if not config_file:
+        return settings
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if config.has_section('logging'):
+        for key, default in DEFAULTS.items():
+            if isinstance(default, str):
+                settings[key] = config.get('logging', key, fallback=default)
+            elif isinstance(default, float):
+                settings[key] = config.getfloat('logging', key, fallback=default)
+            else:
+                settings[key] = config.getint('logging', key, fallback=default)
+    return settings
+
+
+def setup(name, log_file, config_file=None, level=logging.INFO):
+    """配置名为 name 的 logger：async 模式写 JSON 行并轮转，sync 模式为同步纯文本"""
+    settings = _read_settings(config_file)
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    logger.propagate = False
+    text_format = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+    if settings['mode'] != 'async':
+        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        file_handler.setFormatter(text_format)
+        console = logging.StreamHandler()
+        console.setFormatter(text_format)
+        logger.addHandler(file_handler)
+        logger.addHandler(console)
+        return logger
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=settings['max_bytes'], backupCount=settings['backup_count'], encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter())
+    console = logging.StreamHandler()
+    console.setFormatter(text_format)
+
+    log_queue = queue.Queue(maxsize=settings['queue_size'])
+    handler = DroppingQueueHandler(log_queue)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    handler.addFilter(CodeSampler(settings['burst'], settings['window'], settings['sample_every']))
+    logger.addHandler(handler)
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return logger
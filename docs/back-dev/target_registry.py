@@ -0,0 +1,250 @@
+"""
+视频目标登记表
+
+视频很多时，每个视频一个 [video_BV...] 段的 video_config.conf 解析慢、
+save_cid 每次都要整份重写。登记表把视频目标存进 SQLite，内存中以 bvid
+为键索引，单个目标的修改（如写回 CID）只更新一行。
+
+在 video_config.conf 中启用:
+
+    [registry]
+    enabled = true
+    db = targets.db
+
+启用后 main.py 从登记表读取视频，不再读取 [video_*] 段。其他进程（如下面的命令行）
+修改登记表后，main.py 的热加载会发现变化。
+
+命令行:
+    python target_registry.py import-conf video_config.conf   # 导入现有的 [video_*] 段
+    python target_registry.py import-csv videos.csv           # 列: bvid[,interval,interval_unit,cid,enabled]
+    python target_registry.py add BV1xx411c7mD --interval 5 --unit minutes
+    python target_registry.py disable BV1xx411c7mD
+    python target_registry.py remove BV1xx411c7mD
+    python target_registry.py list
+"""
+import argparse
+import configparser
+import csv
+import sqlite3
+import threading
+import time
+
+FIELDS = ('bvid', 'enabled', 'start_now', 'start_time', 'interval', 'interval_unit', 'cid')
+
+
+class VideoTarget:
+    """
+    一个视频目标。用 __slots__ 节省内存，同时支持 video_config['cid'] 这样的
+    字典式访问，采集代码无需区分来源是配置文件还是登记表。
+    """
+    __slots__ = FIELDS
+
+    def __init__(self, bvid, enabled=True, start_now=True, start_time='', interval=5,
+                 interval_unit='minutes', cid=None):
+        self.bvid = bvid
+        self.enabled = bool(enabled)
+        self.start_now = bool(start_now)
+        self.start_time = start_time or ''
+        self.interval = int(interval)
+        self.interval_unit = interval_unit or 'minutes'
+        self.cid = cid or None
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return FIELDS
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in FIELDS]
+
+    def update(self, values):
+        for key, value in values.items():
+            self[key] = value
+
+    def __repr__(self):
+        return f'VideoTarget({self.bvid!r}, interval={self.interval} {self.interval_unit}, cid={self.cid!r})'
+
+
+class TargetRegistry:
+    def __init__(self, path='targets.db'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS videos (
+                bvid TEXT PRIMARY KEY,
+                enabled INTEGER NOT NULL DEFAULT 1,
+                start_now INTEGER NOT NULL DEFAULT 1,
+                start_time TEXT NOT NULL DEFAULT '',
+                interval INTEGER NOT NULL DEFAULT 5,
+                interval_unit TEXT NOT NULL DEFAULT 'minutes',
+                cid TEXT,
+                updated_at REAL NOT NULL
+            )""")
+        self.index = {}
+        self.data_version = self._data_version()
+
+    def _data_version(self):
+        # 只有其他连接提交修改时才会变化，本进程写回 CID 不会触发热加载
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def changed(self):
+        with self.lock:
+            version = self._data_version()
+            if version != self.data_version:
+                self.data_version = version
+                return True
+        return False
+
+    def videos(self):
+        """读取全部视频，刷新内存索引"""
+        with self.lock:
+            rows = self.conn.execute(f"SELECT {', '.join(FIELDS)} FROM videos ORDER BY rowid").fetchall()
+        self.index = {row[0]: VideoTarget(*row) for row in rows}
+        return list(self.index.values())
+
+    def get(self, bvid):
+        return self.index.get(bvid)
+
+    def upsert_many(self, targets):
+        """批量写入，在一个事务中完成"""
+        now = time.time()
+        rows = [(t.bvid, int(t.enabled), int(t.start_now), t.start_time, t.interval, t.interval_unit, t.cid, now)
+                for t in targets]
+        with self.lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "INSERT INTO videos (bvid, enabled, start_now, start_time, interval, interval_unit, cid, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (bvid) DO UPDATE SET enabled = excluded.enabled, start_now = excluded.start_now,"
+                " start_time = excluded.start_time, interval = excluded.interval,"
+                " interval_unit = excluded.interval_unit, cid = COALESCE(excluded.cid, videos.cid),"
+                " updated_at = excluded.updated_at",
+                rows)
+            self.conn.execute("COMMIT")
+        for target in targets:
+            self.index[target.bvid] = target
+        return len(rows)
+
+    def set_cids(self, cids):
+        """只更新给定视频的 CID"""
+        now = time.time()
+        with self.lock:
+            self.conn.executemany("UPDATE videos SET cid = ?, updated_at = ? WHERE bvid = ?",
+                                  [(str(cid), now, bvid) for bvid, cid in cids.items()])
+        for bvid, cid in cids.items():
+            if bvid in self.index:
+                self.index[bvid].cid = str(cid)
+
+    def set_enabled(self, bvid, enabled):
+        with self.lock:
+            cursor = self.conn.execute("UPDATE videos SET enabled = ?, updated_at = ? WHERE bvid = ?",
+                                       (int(enabled), time.time(), bvid))
+        return cursor.rowcount > 0
+
+    def remove(self, bvid):
+        with self.lock:
+            cursor = self.conn.execute("DELETE FROM videos WHERE bvid = ?", (bvid,))
+        self.index.pop(bvid, None)
+        return cursor.rowcount > 0
+
+    def import_conf(self, config_file):
+        """导入配置文件中的 [video_*] 段"""
+        config = configparser.ConfigParser()
+        config.read(config_file, encoding='utf-8')
+        targets = []
+        for section in config.sections():
+            if section.startswith('video_'):
+                targets.append(VideoTarget(
+                    config.get(section, 'bvid'),
+                    enabled=config.getboolean(section, 'enabled', fallback=True),
+                    start_now=config.getboolean(section, 'start_now', fallback=True),
+                    start_time=config.get(section, 'start_time', fallback=''),
+                    interval=config.getint(section, 'interval', fallback=5),
+                    interval_unit=config.get(section, 'interval_unit', fallback='minutes'),
+                    cid=config.get(section, 'cid', fallback='') or None,
+                ))
+        return self.upsert_many(targets)
+
+    def import_csv(self, filename, interval=5, interval_unit='minutes'):
+        """导入 CSV 列表，至少包含 bvid 列，其余列可选"""
+        targets = []
+        with open(filename, 'r', newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                bvid = (row.get('bvid') or '').strip()
+                if not bvid:
+                    continue
+                targets.append(VideoTarget(
+                    bvid,
+                    enabled=(row.get('enabled') or 'true').strip().lower() not in ('false', '0', 'no'),
+                    interval=int(row.get('interval') or interval),
+                    interval_unit=(row.get('interval_unit') or interval_unit).strip(),
+                    cid=(row.get('cid') or '').strip() or None,
+                ))
+        return self.upsert_many(targets)
+
+
+def from_config(config_file='video_config.conf'):
+    """按 [registry] 段打开登记表，未启用时返回 None"""
+    config = configparser.ConfigParser()
+    config.read(config_file, encoding='utf-8')
+    if not config.getboolean('registry', 'enabled', fallback=False):
+        return None
+    return TargetRegistry(config.get('registry', 'db', fallback='targets.db'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='视频目标登记表')
+    parser.add_argument('--config', default='video_config.conf')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('import-conf').add_argument('file')
+    sub.add_parser('import-csv').add_argument('file')
+    add = sub.add_parser('add')
+    add.add_argument('bvid')
+    add.add_argument('--interval', type=int, default=5)
+    add.add_argument('--unit', default='minutes')
+    add.add_argument('--cid')
+    for name in ('enable', 'disable', 'remove'):
+        sub.add_parser(name).add_argument('bvid')
+    sub.add_parser('list')
+    args = parser.parse_args()
+
+    config = configparser.ConfigParser()
+    config.read(args.config, encoding='utf-8')
+    registry = TargetRegistry(config.get('registry', 'db', fallback='targets.db'))
+
+    if args.command == 'import-conf':
+        print(f"已导入 {registry.import_conf(args.file)} 个视频")
+    elif args.command == 'import-csv':
+        print(f"已导入 {registry.import_csv(args.file)} 个视频")
+    elif args.command == 'add':
+        registry.upsert_many([VideoTarget(args.bvid, interval=args.interval, interval_unit=args.unit, cid=args.cid)])
+        print(f"已添加视频 {args.bvid}")
+    elif args.command in ('enable', 'disable'):
+        if registry.set_enabled(args.bvid, args.command == 'enable'):
+            print(f"视频 {args.bvid} 已{'启用' if args.command == 'enable' else '停用'}")
+        else:
+            print(f"登记表中没有视频 {args.bvid}")
+    elif args.command == 'remove':
+        print(f"已移除视频 {args.bvid}" if registry.remove(args.bvid) else f"登记表中没有视频 {args.bvid}")
+    elif args.command == 'list':
+        for target in registry.videos():
+            state = '启用' if target.enabled else '停用'
+            print(f"{target.bvid}  {state}  每 {target.interval} {target.interval_unit}  cid={target.cid or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+notify.py 启动开销基准
+
+在全新的子进程中反复 import notify，统计导入耗时，
+并检查未启用的渠道依赖（requests、smtplib、email 等）是否被加载。
+
+用法: python bench_import.py [次数]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ["requests", "urllib3", "smtplib", "email.mime.text", "hmac", "sqlite3"]
+
+PROBE = f"""
+import sys, time
+start = time.perf_counter()
+import notify
+elapsed = time.perf_counter() - start
+loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print(elapsed, ",".join(loaded))
+"""
+
+
+def run_once():
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=HERE,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    return float(out[0]), out[1] if len(out) > 1 else ""
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    # 先运行一次生成字节码缓存，之后的测量不包含编译时间
+    subprocess.run([sys.executable, "-c", "import notify"], cwd=HERE, check=True)
+    samples = []
+    loaded = ""
+    for _ in range(runs):
+        elapsed, loaded = run_once()
+        samples.append(elapsed * 1000)
+    print(
+        f"import notify: 中位数 {statistics.median(samples):.1f} ms, "
+        f"最小 {min(samples):.1f} ms, 最大 {max(samples):.1f} ms ({runs} 次)"
+    )
+    print(f"导入时加载的渠道依赖: {loaded or '无'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,17 @@
 #!/usr/bin/env python3
 # _*_ coding:utf-8 _*_
-import base64
+import atexit
 import hashlib
-import hmac
 import json
 import os
+import random
 import re
 import threading
 import time
 import urllib.parse
-import smtplib
-from email.mime.text import MIMEText
-from email.header import Header
-from email.utils import formataddr
 
-import requests
+# requests、smtplib、email、hmac 等只在对应渠道首次使用时导入，
+# 短时运行的定时任务 import 本模块时不再为未启用的渠道付出导入开销
 
 # 原先的 print 函数和主线程的锁
 _print = print
@@ -34,6 +31,18 @@ def print(text, *args, **kw):
 # fmt: off
 push_config = {
     'HITOKOTO': True,                  # 启用一言（随机句子）
+    'HITOKOTO_TIMEOUT': 3,              # 一言接口超时（秒），失败时使用本地句子
+
+    'PUSH_ASYNC': 'true',               # 异步推送：消息先写入发件箱，由后台线程投递
+    'PUSH_OUTBOX': 'notify_outbox.db',  # 发件箱 SQLite 文件
+    'PUSH_WORKERS': 4,                  # 投递线程数
+    'PUSH_TIMEOUT': 15,                 # 推送请求超时（秒），单个渠道可用 PUSH_TIMEOUT_渠道名 覆盖
+    'PUSH_RETRIES': 3,                  # 每条消息每个渠道的最大尝试次数
+    'PUSH_FLUSH_TIMEOUT': 30,           # 进程退出前等待发件箱投递的最长时间（秒）
+    'PUSH_OUTBOX_KEEP_DAYS': 7,         # 已投递或已放弃的消息在发件箱中保留的天数
+    'SMTP_KEEPALIVE': 60,               # SMTP 连接空闲保留时间（秒），0 为每次重新登录
+    'PUSH_DIGEST_WINDOW': 60,           # alert() 合并提醒的时间窗口（秒）
+    'PUSH_DIGEST_MAX_ITEMS': 50,        # 每条摘要最多列出的提醒数，其余只计数
 
     'BARK_PUSH': '',                    # bark IP 或设备码，例：https://api.day.app/DxHcxxxxxRxxxxxxcm/
     'BARK_ARCHIVE': '',                 # bark 推送是否存档
@@ -125,14 +134,122 @@ for k in push_config:
         v = os.getenv(k)
         push_config[k] = v
 
+# 各渠道默认超时（秒），未列出的使用 PUSH_TIMEOUT
+CHANNEL_TIMEOUTS = {
+    "smtp": 30,
+}
+
+
+def channel_timeout(name: str) -> float:
+    """
+    渠道请求超时：PUSH_TIMEOUT_渠道名 > CHANNEL_TIMEOUTS > PUSH_TIMEOUT。
+    """
+    value = os.getenv(f"PUSH_TIMEOUT_{name.upper()}") or CHANNEL_TIMEOUTS.get(name)
+    return float(value or push_config.get("PUSH_TIMEOUT") or 15)
+
+
+# 按 scheme://host 复用的 HTTP 会话
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def http_session(url: str) -> "requests.Session":
+    """
+    返回该地址所在源的共享 requests.Session，复用 TCP/TLS 连接。
+    """
+    import requests
 
-def bark(title: str, content: str) -> None:
+    parts = urllib.parse.urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    with _sessions_lock:
+        session = _sessions.get(origin)
+        if session is None:
+            session = requests.Session()
+            _sessions[origin] = session
+        return session
+
+
+class SmtpPool:
+    """
+    保留登录后的 SMTP 连接，空闲超过 SMTP_KEEPALIVE 秒后关闭。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.server = None
+        self.key = None
+        self.last_used = 0.0
+
+    def _connect(self, host: str, use_ssl: bool, email: str, password: str):
+        import smtplib
+
+        timeout = channel_timeout("smtp")
+        server = (
+            smtplib.SMTP_SSL(host, timeout=timeout)
+            if use_ssl
+            else smtplib.SMTP(host, timeout=timeout)
+        )
+        server.login(email, password)
+        return server
+
+    def _alive(self, key, keepalive: float) -> bool:
+        import smtplib
+
+        if self.server is None or self.key != key:
+            return False
+        if time.time() - self.last_used > keepalive:
+            return False
+        try:
+            return self.server.noop()[0] == 250
+        except smtplib.SMTPException:
+            return False
+        except OSError:
+            return False
+
+    def sendmail(
+        self, host: str, use_ssl: bool, email: str, password: str, message: bytes
+    ) -> None:
+        keepalive = float(push_config.get("SMTP_KEEPALIVE") or 0)
+        key = (host, use_ssl, email)
+        with self.lock:
+            if not self._alive(key, keepalive):
+                self._close()
+                self.server = self._connect(host, use_ssl, email, password)
+                self.key = key
+            try:
+                self.server.sendmail(email, email, message)
+            except Exception:
+                self._close()
+                raise
+            self.last_used = time.time()
+            if keepalive <= 0:
+                self._close()
+
+    def _close(self) -> None:
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+        self.server = None
+        self.key = None
+
+    def close(self) -> None:
+        with self.lock:
+            self._close()
+
+
+smtp_pool = SmtpPool()
+atexit.register(smtp_pool.close)
+
+
+def bark(title: str, content: str) -> bool:
     """
     使用 bark 推送消息。
     """
     if not push_config.get("BARK_PUSH"):
         print("bark 服务的 BARK_PUSH 未设置!!\n取消推送")
-        return
+        return False
     print("bark 服务启动")
 
     if push_config.get("BARK_PUSH").startswith("http"):
@@ -161,14 +278,23 @@ def bark(title: str, content: str) -> None:
     ):
         data[bark_params.get(pair[0])] = pair[1]
     headers = {"Content-Type": "application/json;charset=utf-8"}
-    response = requests.post(
-        url=url, data=json.dumps(data), headers=headers, timeout=15
-    ).json()
+    response = (
+        http_session(url)
+        .post(
+            url=url,
+            data=json.dumps(data),
+            headers=headers,
+            timeout=channel_timeout("bark"),
+        )
+        .json()
+    )
 
     if response["code"] == 200:
         print("bark 推送成功！")
+        return True
     else:
         print("bark 推送失败！")
+        return False
 
 
 def console(title: str, content: str) -> None:
@@ -178,14 +304,16 @@ def console(title: str, content: str) -> None:
     print(f"{title}\n\n{content}")
 
 
-def dingding_bot(title: str, content: str) -> None:
+def dingding_bot(title: str, content: str) -> bool:
     """
     使用 钉钉机器人 推送消息。
     """
     if not push_config.get("DD_BOT_SECRET") or not push_config.get("DD_BOT_TOKEN"):
         print("钉钉机器人 服务的 DD_BOT_SECRET 或者 DD_BOT_TOKEN 未设置!!\n取消推送")
-        return
+        return False
     print("钉钉机器人 服务启动")
+    import base64
+    import hmac
 
     timestamp = str(round(time.time() * 1000))
     secret_enc = push_config.get("DD_BOT_SECRET").encode("utf-8")
@@ -198,60 +326,77 @@ def dingding_bot(title: str, content: str) -> None:
     url = f'https://oapi.dingtalk.com/robot/send?access_token={push_config.get("DD_BOT_TOKEN")}&timestamp={timestamp}&sign={sign}'
     headers = {"Content-Type": "application/json;charset=utf-8"}
     data = {"msgtype": "text", "text": {"content": f"{title}\n\n{content}"}}
-    response = requests.post(
-        url=url, data=json.dumps(data), headers=headers, timeout=15
-    ).json()
+    response = (
+        http_session(url)
+        .post(
+            url=url,
+            data=json.dumps(data),
+            headers=headers,
+            timeout=channel_timeout("dingding_bot"),
+        )
+        .json()
+    )
 
     if not response["errcode"]:
         print("钉钉机器人 推送成功！")
+        return True
     else:
         print("钉钉机器人 推送失败！")
+        return False
 
 
-def feishu_bot(title: str, content: str) -> None:
+def feishu_bot(title: str, content: str) -> bool:
     """
     使用 飞书机器人 推送消息。
     """
     if not push_config.get("FSKEY"):
         print("飞书 服务的 FSKEY 未设置!!\n取消推送")
-        return
+        return False
     print("飞书 服务启动")
 
     url = f'https://open.feishu.cn/open-apis/bot/v2/hook/{push_config.get("FSKEY")}'
     data = {"msg_type": "text", "content": {"text": f"{title}\n\n{content}"}}
-    response = requests.post(url, data=json.dumps(data)).json()
+    response = (
+        http_session(url)
+        .post(url, data=json.dumps(data), timeout=channel_timeout("feishu_bot"))
+        .json()
+    )
 
     if response.get("StatusCode") == 0 or response.get("code") == 0:
         print("飞书 推送成功！")
+        return True
     else:
         print("飞书 推送失败！错误信息如下：\n", response)
+        return False
 
 
-def go_cqhttp(title: str, content: str) -> None:
+def go_cqhttp(title: str, content: str) -> bool:
     """
     使用 go_cqhttp 推送消息。
     """
     if not push_config.get("GOBOT_URL") or not push_config.get("GOBOT_QQ"):
         print("go-cqhttp 服务的 GOBOT_URL 或 GOBOT_QQ 未设置!!\n取消推送")
-        return
+        return False
     print("go-cqhttp 服务启动")
 
     url = f'{push_config.get("GOBOT_URL")}?access_token={push_config.get("GOBOT_TOKEN")}&{push_config.get("GOBOT_QQ")}&message=标题:{title}\n内容:{content}'
-    response = requests.get(url).json()
+    response = http_session(url).get(url, timeout=channel_timeout("go_cqhttp")).json()
 
     if response["status"] == "ok":
         print("go-cqhttp 推送成功！")
+        return True
     else:
         print("go-cqhttp 推送失败！")
+        return False
 
 
-def gotify(title: str, content: str) -> None:
+def gotify(title: str, content: str) -> bool:
     """
     使用 gotify 推送消息。
     """
     if not push_config.get("GOTIFY_URL") or not push_config.get("GOTIFY_TOKEN"):
         print("gotify 服务的 GOTIFY_URL 或 GOTIFY_TOKEN 未设置!!\n取消推送")
-        return
+        return False
     print("gotify 服务启动")
 
     url = f'{push_config.get("GOTIFY_URL")}/message?token={push_config.get("GOTIFY_TOKEN")}'
@@ -260,41 +405,51 @@ def gotify(title: str, content: str) -> None:
         "message": content,
         "priority": push_config.get("GOTIFY_PRIORITY"),
     }
-    response = requests.post(url, data=data).json()
+    response = (
+        http_session(url).post(url, data=data, timeout=channel_timeout("gotify")).json()
+    )
 
     if response.get("id"):
         print("gotify 推送成功！")
+        return True
     else:
         print("gotify 推送失败！")
+        return False
 
 
-def iGot(title: str, content: str) -> None:
+def iGot(title: str, content: str) -> bool:
     """
     使用 iGot 推送消息。
     """
     if not push_config.get("IGOT_PUSH_KEY"):
         print("iGot 服务的 IGOT_PUSH_KEY 未设置!!\n取消推送")
-        return
+        return False
     print("iGot 服务启动")
 
     url = f'https://push.hellyw.com/{push_config.get("IGOT_PUSH_KEY")}'
     data = {"title": title, "content": content}
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    response = requests.post(url, data=data, headers=headers).json()
+    response = (
+        http_session(url)
+        .post(url, data=data, headers=headers, timeout=channel_timeout("iGot"))
+        .json()
+    )
 
     if response["ret"] == 0:
         print("iGot 推送成功！")
+        return True
     else:
         print(f'iGot 推送失败！{response["errMsg"]}')
+        return False
 
 
-def serverJ(title: str, content: str) -> None:
+def serverJ(title: str, content: str) -> bool:
     """
     通过 serverJ 推送消息。
     """
     if not push_config.get("PUSH_KEY"):
         print("serverJ 服务的 PUSH_KEY 未设置!!\n取消推送")
-        return
+        return False
     print("serverJ 服务启动")
 
     data = {"text": title, "desp": content.replace("\n", "\n\n")}
@@ -302,21 +457,27 @@ def serverJ(title: str, content: str) -> None:
         url = f'https://sctapi.ftqq.com/{push_config.get("PUSH_KEY")}.send'
     else:
         url = f'https://sc.ftqq.com/{push_config.get("PUSH_KEY")}.send'
-    response = requests.post(url, data=data).json()
+    response = (
+        http_session(url)
+        .post(url, data=data, timeout=channel_timeout("serverJ"))
+        .json()
+    )
 
     if response.get("errno") == 0 or response.get("code") == 0:
         print("serverJ 推送成功！")
+        return True
     else:
         print(f'serverJ 推送失败！错误码：{response["message"]}')
+        return False
 
 
-def pushdeer(title: str, content: str) -> None:
+def pushdeer(title: str, content: str) -> bool:
     """
     通过PushDeer 推送消息
     """
     if not push_config.get("DEER_KEY"):
         print("PushDeer 服务的 DEER_KEY 未设置!!\n取消推送")
-        return
+        return False
     print("PushDeer 服务启动")
     data = {
         "text": title,
@@ -328,39 +489,47 @@ def pushdeer(title: str, content: str) -> None:
     if push_config.get("DEER_URL"):
         url = push_config.get("DEER_URL")
 
-    response = requests.post(url, data=data).json()
+    response = (
+        http_session(url)
+        .post(url, data=data, timeout=channel_timeout("pushdeer"))
+        .json()
+    )
 
     if len(response.get("content").get("result")) > 0:
         print("PushDeer 推送成功！")
+        return True
     else:
         print("PushDeer 推送失败！错误信息：", response)
+        return False
 
 
-def chat(title: str, content: str) -> None:
+def chat(title: str, content: str) -> bool:
     """
     通过Chat 推送消息
     """
     if not push_config.get("CHAT_URL") or not push_config.get("CHAT_TOKEN"):
         print("chat 服务的 CHAT_URL或CHAT_TOKEN 未设置!!\n取消推送")
-        return
+        return False
     print("chat 服务启动")
     data = "payload=" + json.dumps({"text": title + "\n" + content})
     url = push_config.get("CHAT_URL") + push_config.get("CHAT_TOKEN")
-    response = requests.post(url, data=data)
+    response = http_session(url).post(url, data=data, timeout=channel_timeout("chat"))
 
     if response.status_code == 200:
         print("Chat 推送成功！")
+        return True
     else:
         print("Chat 推送失败！错误信息：", response)
+        return False
 
 
-def pushplus_bot(title: str, content: str) -> None:
+def pushplus_bot(title: str, content: str) -> bool:
     """
     通过 push+ 推送消息。
     """
     if not push_config.get("PUSH_PLUS_TOKEN"):
         print("PUSHPLUS 服务的 PUSH_PLUS_TOKEN 未设置!!\n取消推送")
-        return
+        return False
     print("PUSHPLUS 服务启动")
 
     url = "http://www.pushplus.plus/send"
@@ -372,30 +541,48 @@ def pushplus_bot(title: str, content: str) -> None:
     }
     body = json.dumps(data).encode(encoding="utf-8")
     headers = {"Content-Type": "application/json"}
-    response = requests.post(url=url, data=body, headers=headers).json()
+    response = (
+        http_session(url)
+        .post(
+            url=url, data=body, headers=headers, timeout=channel_timeout("pushplus_bot")
+        )
+        .json()
+    )
 
     if response["code"] == 200:
         print("PUSHPLUS 推送成功！")
+        return True
 
     else:
         url_old = "http://pushplus.hxtrip.com/send"
         headers["Accept"] = "application/json"
-        response = requests.post(url=url_old, data=body, headers=headers).json()
+        response = (
+            http_session(url_old)
+            .post(
+                url=url_old,
+                data=body,
+                headers=headers,
+                timeout=channel_timeout("pushplus_bot"),
+            )
+            .json()
+        )
 
         if response["code"] == 200:
             print("PUSHPLUS(hxtrip) 推送成功！")
+            return True
 
         else:
             print("PUSHPLUS 推送失败！")
+            return False
 
 
-def weplus_bot(title: str, content: str) -> None:
+def weplus_bot(title: str, content: str) -> bool:
     """
     通过 微加机器人 推送消息。
     """
     if not push_config.get("WE_PLUS_BOT_TOKEN"):
         print("微加机器人 服务的 WE_PLUS_BOT_TOKEN 未设置!!\n取消推送")
-        return
+        return False
     print("微加机器人 服务启动")
 
     template = "txt"
@@ -413,44 +600,58 @@ def weplus_bot(title: str, content: str) -> None:
     }
     body = json.dumps(data).encode(encoding="utf-8")
     headers = {"Content-Type": "application/json"}
-    response = requests.post(url=url, data=body, headers=headers).json()
+    response = (
+        http_session(url)
+        .post(
+            url=url, data=body, headers=headers, timeout=channel_timeout("weplus_bot")
+        )
+        .json()
+    )
 
     if response["code"] == 200:
         print("微加机器人 推送成功！")
+        return True
     else:
         print("微加机器人 推送失败！")
+        return False
 
 
-def qmsg_bot(title: str, content: str) -> None:
+def qmsg_bot(title: str, content: str) -> bool:
     """
     使用 qmsg 推送消息。
     """
     if not push_config.get("QMSG_KEY") or not push_config.get("QMSG_TYPE"):
         print("qmsg 的 QMSG_KEY 或者 QMSG_TYPE 未设置!!\n取消推送")
-        return
+        return False
     print("qmsg 服务启动")
 
     url = f'https://qmsg.zendee.cn/{push_config.get("QMSG_TYPE")}/{push_config.get("QMSG_KEY")}'
     payload = {"msg": f'{title}\n\n{content.replace("----", "-")}'.encode("utf-8")}
-    response = requests.post(url=url, params=payload).json()
+    response = (
+        http_session(url)
+        .post(url=url, params=payload, timeout=channel_timeout("qmsg_bot"))
+        .json()
+    )
 
     if response["code"] == 0:
         print("qmsg 推送成功！")
+        return True
     else:
         print(f'qmsg 推送失败！{response["reason"]}')
+        return False
 
 
-def wecom_app(title: str, content: str) -> None:
+def wecom_app(title: str, content: str) -> bool:
     """
     通过 企业微信 APP 推送消息。
     """
     if not push_config.get("QYWX_AM"):
         print("QYWX_AM 未设置!!\n取消推送")
-        return
+        return False
     QYWX_AM_AY = re.split(",", push_config.get("QYWX_AM"))
     if 4 < len(QYWX_AM_AY) > 5:
         print("QYWX_AM 设置错误!!\n取消推送")
-        return
+        return False
     print("企业微信 APP 服务启动")
 
     corpid = QYWX_AM_AY[0]
@@ -471,11 +672,19 @@ def wecom_app(title: str, content: str) -> None:
 
     if response == "ok":
         print("企业微信推送成功！")
+        return True
     else:
         print("企业微信推送失败！错误信息如下：\n", response)
+        return False
 
 
 class WeCom:
+    # access_token 缓存：(ORIGIN, CORPID, CORPSECRET) -> (token, 过期时间)
+    _tokens = {}
+    _tokens_lock = threading.Lock()
+    # token 无效或过期时接口返回的错误码
+    TOKEN_ERRCODES = (40014, 42001)
+
     def __init__(self, corpid, corpsecret, agentid):
         self.CORPID = corpid
         self.CORPSECRET = corpsecret
@@ -484,20 +693,40 @@ class WeCom:
         if push_config.get("QYWX_ORIGIN"):
             self.ORIGIN = push_config.get("QYWX_ORIGIN")
 
-    def get_access_token(self):
-        url = f"{self.ORIGIN}/cgi-bin/gettoken"
-        values = {
-            "corpid": self.CORPID,
-            "corpsecret": self.CORPSECRET,
-        }
-        req = requests.post(url, params=values)
-        data = json.loads(req.text)
-        return data["access_token"]
+    def get_access_token(self, force_refresh=False):
+        key = (self.ORIGIN, self.CORPID, self.CORPSECRET)
+        with WeCom._tokens_lock:
+            cached = WeCom._tokens.get(key)
+            if cached and not force_refresh and cached[1] > time.time():
+                return cached[0]
+            url = f"{self.ORIGIN}/cgi-bin/gettoken"
+            values = {
+                "corpid": self.CORPID,
+                "corpsecret": self.CORPSECRET,
+            }
+            req = http_session(url).post(
+                url, params=values, timeout=channel_timeout("wecom_app")
+            )
+            data = json.loads(req.text)
+            # 提前 5 分钟过期，避免临界时刻使用失效的 token
+            expires_in = int(data.get("expires_in", 7200))
+            WeCom._tokens[key] = (data["access_token"], time.time() + expires_in - 300)
+            return data["access_token"]
+
+    def _send(self, send_values):
+        send_msges = bytes(json.dumps(send_values), "utf-8")
+        respone = None
+        for force_refresh in (False, True):
+            send_url = f"{self.ORIGIN}/cgi-bin/message/send?access_token={self.get_access_token(force_refresh)}"
+            respone = http_session(send_url).post(
+                send_url, send_msges, timeout=channel_timeout("wecom_app")
+            )
+            respone = respone.json()
+            if respone.get("errcode") not in self.TOKEN_ERRCODES:
+                break
+        return respone["errmsg"]
 
     def send_text(self, message, touser="@all"):
-        send_url = (
-            f"{self.ORIGIN}/cgi-bin/message/send?access_token={self.get_access_token()}"
-        )
         send_values = {
             "touser": touser,
             "msgtype": "text",
@@ -505,15 +734,9 @@ class WeCom:
             "text": {"content": message},
             "safe": "0",
         }
-        send_msges = bytes(json.dumps(send_values), "utf-8")
-        respone = requests.post(send_url, send_msges)
-        respone = respone.json()
-        return respone["errmsg"]
+        return self._send(send_values)
 
     def send_mpnews(self, title, message, media_id, touser="@all"):
-        send_url = (
-            f"{self.ORIGIN}/cgi-bin/message/send?access_token={self.get_access_token()}"
-        )
         send_values = {
             "touser": touser,
             "msgtype": "mpnews",
@@ -531,19 +754,16 @@ class WeCom:
                 ]
             },
         }
-        send_msges = bytes(json.dumps(send_values), "utf-8")
-        respone = requests.post(send_url, send_msges)
-        respone = respone.json()
-        return respone["errmsg"]
+        return self._send(send_values)
 
 
-def wecom_bot(title: str, content: str) -> None:
+def wecom_bot(title: str, content: str) -> bool:
     """
     通过 企业微信机器人 推送消息。
     """
     if not push_config.get("QYWX_KEY"):
         print("企业微信机器人 服务的 QYWX_KEY 未设置!!\n取消推送")
-        return
+        return False
     print("企业微信机器人服务启动")
 
     origin = "https://qyapi.weixin.qq.com"
@@ -553,23 +773,32 @@ def wecom_bot(title: str, content: str) -> None:
     url = f"{origin}/cgi-bin/webhook/send?key={push_config.get('QYWX_KEY')}"
     headers = {"Content-Type": "application/json;charset=utf-8"}
     data = {"msgtype": "text", "text": {"content": f"{title}\n\n{content}"}}
-    response = requests.post(
-        url=url, data=json.dumps(data), headers=headers, timeout=15
-    ).json()
+    response = (
+        http_session(url)
+        .post(
+            url=url,
+            data=json.dumps(data),
+            headers=headers,
+            timeout=channel_timeout("wecom_bot"),
+        )
+        .json()
+    )
 
     if response["errcode"] == 0:
         print("企业微信机器人推送成功！")
+        return True
     else:
         print("企业微信机器人推送失败！")
+        return False
 
 
-def telegram_bot(title: str, content: str) -> None:
+def telegram_bot(title: str, content: str) -> bool:
     """
     使用 telegram 机器人 推送消息。
     """
     if not push_config.get("TG_BOT_TOKEN") or not push_config.get("TG_USER_ID"):
         print("tg 服务的 bot_token 或者 user_id 未设置!!\n取消推送")
-        return
+        return False
     print("tg 服务启动")
 
     if push_config.get("TG_API_HOST"):
@@ -598,17 +827,27 @@ def telegram_bot(title: str, content: str) -> None:
             push_config.get("TG_PROXY_HOST"), push_config.get("TG_PROXY_PORT")
         )
         proxies = {"http": proxyStr, "https": proxyStr}
-    response = requests.post(
-        url=url, headers=headers, params=payload, proxies=proxies
-    ).json()
+    response = (
+        http_session(url)
+        .post(
+            url=url,
+            headers=headers,
+            params=payload,
+            proxies=proxies,
+            timeout=channel_timeout("telegram_bot"),
+        )
+        .json()
+    )
 
     if response["ok"]:
         print("tg 推送成功！")
+        return True
     else:
         print("tg 推送失败！")
+        return False
 
 
-def aibotk(title: str, content: str) -> None:
+def aibotk(title: str, content: str) -> bool:
     """
     使用 智能微秘书 推送消息。
     """
@@ -620,7 +859,7 @@ def aibotk(title: str, content: str) -> None:
         print(
             "智能微秘书 的 AIBOTK_KEY 或者 AIBOTK_TYPE 或者 AIBOTK_NAME 未设置!!\n取消推送"
         )
-        return
+        return False
     print("智能微秘书 服务启动")
 
     if push_config.get("AIBOTK_TYPE") == "room":
@@ -639,15 +878,21 @@ def aibotk(title: str, content: str) -> None:
         }
     body = json.dumps(data).encode(encoding="utf-8")
     headers = {"Content-Type": "application/json"}
-    response = requests.post(url=url, data=body, headers=headers).json()
+    response = (
+        http_session(url)
+        .post(url=url, data=body, headers=headers, timeout=channel_timeout("aibotk"))
+        .json()
+    )
     print(response)
     if response["code"] == 0:
         print("智能微秘书 推送成功！")
+        return True
     else:
         print(f'智能微秘书 推送失败！{response["error"]}')
+        return False
 
 
-def smtp(title: str, content: str) -> None:
+def smtp(title: str, content: str) -> bool:
     """
     使用 SMTP 邮件 推送消息。
     """
@@ -661,8 +906,11 @@ def smtp(title: str, content: str) -> None:
         print(
             "SMTP 邮件 的 SMTP_SERVER 或者 SMTP_SSL 或者 SMTP_EMAIL 或者 SMTP_PASSWORD 或者 SMTP_NAME 未设置!!\n取消推送"
         )
-        return
+        return False
     print("SMTP 邮件 服务启动")
+    from email.header import Header
+    from email.mime.text import MIMEText
+    from email.utils import formataddr
 
     message = MIMEText(content, "plain", "utf-8")
     message["From"] = formataddr(
@@ -680,32 +928,27 @@ def smtp(title: str, content: str) -> None:
     message["Subject"] = Header(title, "utf-8")
 
     try:
-        smtp_server = (
-            smtplib.SMTP_SSL(push_config.get("SMTP_SERVER"))
-            if push_config.get("SMTP_SSL") == "true"
-            else smtplib.SMTP(push_config.get("SMTP_SERVER"))
-        )
-        smtp_server.login(
-            push_config.get("SMTP_EMAIL"), push_config.get("SMTP_PASSWORD")
-        )
-        smtp_server.sendmail(
-            push_config.get("SMTP_EMAIL"),
+        smtp_pool.sendmail(
+            push_config.get("SMTP_SERVER"),
+            push_config.get("SMTP_SSL") == "true",
             push_config.get("SMTP_EMAIL"),
+            push_config.get("SMTP_PASSWORD"),
             message.as_bytes(),
         )
-        smtp_server.close()
         print("SMTP 邮件 推送成功！")
+        return True
     except Exception as e:
         print(f"SMTP 邮件 推送失败！{e}")
+        return False
 
 
-def pushme(title: str, content: str) -> None:
+def pushme(title: str, content: str) -> bool:
     """
     使用 PushMe 推送消息。
     """
     if not push_config.get("PUSHME_KEY"):
         print("PushMe 服务的 PUSHME_KEY 未设置!!\n取消推送")
-        return
+        return False
     print("PushMe 服务启动")
 
     url = (
@@ -720,15 +963,17 @@ def pushme(title: str, content: str) -> None:
         "date": push_config.get("date") if push_config.get("date") else "",
         "type": push_config.get("type") if push_config.get("type") else "",
     }
-    response = requests.post(url, data=data)
+    response = http_session(url).post(url, data=data, timeout=channel_timeout("pushme"))
 
     if response.status_code == 200 and response.text == "success":
         print("PushMe 推送成功！")
+        return True
     else:
         print(f"PushMe 推送失败！{response.status_code} {response.text}")
+        return False
 
 
-def chronocat(title: str, content: str) -> None:
+def chronocat(title: str, content: str) -> bool:
     """
     使用 CHRONOCAT 推送消息。
     """
@@ -738,7 +983,7 @@ def chronocat(title: str, content: str) -> None:
         or not push_config.get("CHRONOCAT_TOKEN")
     ):
         print("CHRONOCAT 服务的 CHRONOCAT_URL 或 CHRONOCAT_QQ 未设置!!\n取消推送")
-        return
+        return False
 
     print("CHRONOCAT 服务启动")
 
@@ -751,6 +996,7 @@ def chronocat(title: str, content: str) -> None:
         "Authorization": f'Bearer {push_config.get("CHRONOCAT_TOKEN")}',
     }
 
+    ok = True
     for chat_type, ids in [(1, user_ids), (2, group_ids)]:
         if not ids:
             continue
@@ -764,17 +1010,24 @@ def chronocat(title: str, content: str) -> None:
                     }
                 ],
             }
-            response = requests.post(url, headers=headers, data=json.dumps(data))
+            response = http_session(url).post(
+                url,
+                headers=headers,
+                data=json.dumps(data),
+                timeout=channel_timeout("chronocat"),
+            )
             if response.status_code == 200:
                 if chat_type == 1:
                     print(f"QQ个人消息:{ids}推送成功！")
                 else:
                     print(f"QQ群消息:{ids}推送成功！")
             else:
+                ok = False
                 if chat_type == 1:
                     print(f"QQ个人消息:{ids}推送失败！")
                 else:
                     print(f"QQ群消息:{ids}推送失败！")
+    return ok
 
 
 def parse_headers(headers):
@@ -828,13 +1081,13 @@ def parse_body(body, content_type, value_format_fn=None):
     return parsed
 
 
-def custom_notify(title: str, content: str) -> None:
+def custom_notify(title: str, content: str) -> bool:
     """
     通过 自定义通知 推送消息。
     """
     if not push_config.get("WEBHOOK_URL") or not push_config.get("WEBHOOK_METHOD"):
         print("自定义通知的 WEBHOOK_URL 或 WEBHOOK_METHOD 未设置!!\n取消推送")
-        return
+        return False
 
     print("自定义通知服务启动")
 
@@ -846,7 +1099,7 @@ def custom_notify(title: str, content: str) -> None:
 
     if "$title" not in WEBHOOK_URL and "$title" not in WEBHOOK_BODY:
         print("请求头或者请求体中必须包含 $title 和 $content")
-        return
+        return False
 
     headers = parse_headers(WEBHOOK_HEADERS)
     body = parse_body(
@@ -857,14 +1110,83 @@ def custom_notify(title: str, content: str) -> None:
     formatted_url = WEBHOOK_URL.replace(
         "$title", urllib.parse.quote_plus(title)
     ).replace("$content", urllib.parse.quote_plus(content))
-    response = requests.request(
-        method=WEBHOOK_METHOD, url=formatted_url, headers=headers, timeout=15, data=body
+    response = http_session(formatted_url).request(
+        method=WEBHOOK_METHOD,
+        url=formatted_url,
+        headers=headers,
+        timeout=channel_timeout("custom_notify"),
+        data=body,
     )
 
     if response.status_code == 200:
         print("自定义通知推送成功！")
+        return True
     else:
         print(f"自定义通知推送失败！{response.status_code} {response.text}")
+        return False
+
+
+# 一言接口不可用时使用的本地句子
+HITOKOTO_FALLBACK = [
+    ("路漫漫其修远兮，吾将上下而求索。", "离骚"),
+    ("不积跬步，无以至千里；不积小流，无以成江海。", "劝学"),
+    ("长风破浪会有时，直挂云帆济沧海。", "行路难"),
+    ("纸上得来终觉浅，绝知此事要躬行。", "冬夜读书示子聿"),
+    ("千里之行，始于足下。", "道德经"),
+    ("业精于勤，荒于嬉；行成于思，毁于随。", "进学解"),
+]
+
+
+class HitokotoPool:
+    """
+    后台预取的一言句子池，取用时不发起网络请求。
+    池空时返回本地句子，并在后台线程补充。
+    """
+
+    URL = "https://v1.hitokoto.cn/"
+
+    def __init__(self, size: int = 5):
+        self.size = size
+        self.pool = []
+        self.lock = threading.Lock()
+        self.refilling = False
+
+    def get(self) -> str:
+        with self.lock:
+            sentence = self.pool.pop() if self.pool else None
+            need_refill = len(self.pool) < self.size and not self.refilling
+            if need_refill:
+                self.refilling = True
+        if need_refill:
+            threading.Thread(target=self._refill, name="hitokoto", daemon=True).start()
+        if sentence is None:
+            sentence = "{}    ----{}".format(*random.choice(HITOKOTO_FALLBACK))
+        return sentence
+
+    def _fetch(self) -> str:
+        timeout = float(push_config.get("HITOKOTO_TIMEOUT") or 3)
+        res = http_session(self.URL).get(self.URL, timeout=timeout).json()
+        return res["hitokoto"] + "    ----" + res["from"]
+
+    def _refill(self) -> None:
+        try:
+            while True:
+                with self.lock:
+                    if len(self.pool) >= self.size:
+                        return
+                try:
+                    sentence = self._fetch()
+                except Exception:
+                    # 接口不可用时等下次取用再试
+                    return
+                with self.lock:
+                    self.pool.append(sentence)
+        finally:
+            with self.lock:
+                self.refilling = False
+
+
+hitokoto_pool = HitokotoPool()
 
 
 def one() -> str:
@@ -872,76 +1194,439 @@ def one() -> str:
     获取一条一言。
     :return:
     """
-    url = "https://v1.hitokoto.cn/"
-    res = requests.get(url).json()
-    return res["hitokoto"] + "    ----" + res["from"]
+    return hitokoto_pool.get()
+
+
+# 推送渠道注册表：(渠道函数名, 启用所需的配置项)，按此顺序推送
+CHANNELS = [
+    ("bark", ("BARK_PUSH",)),
+    ("console", ("CONSOLE",)),
+    ("dingding_bot", ("DD_BOT_TOKEN", "DD_BOT_SECRET")),
+    ("feishu_bot", ("FSKEY",)),
+    ("go_cqhttp", ("GOBOT_URL", "GOBOT_QQ")),
+    ("gotify", ("GOTIFY_URL", "GOTIFY_TOKEN")),
+    ("iGot", ("IGOT_PUSH_KEY",)),
+    ("serverJ", ("PUSH_KEY",)),
+    ("pushdeer", ("DEER_KEY",)),
+    ("chat", ("CHAT_URL", "CHAT_TOKEN")),
+    ("pushplus_bot", ("PUSH_PLUS_TOKEN",)),
+    ("weplus_bot", ("WE_PLUS_BOT_TOKEN",)),
+    ("qmsg_bot", ("QMSG_KEY", "QMSG_TYPE")),
+    ("wecom_app", ("QYWX_AM",)),
+    ("wecom_bot", ("QYWX_KEY",)),
+    ("telegram_bot", ("TG_BOT_TOKEN", "TG_USER_ID")),
+    ("aibotk", ("AIBOTK_KEY", "AIBOTK_TYPE", "AIBOTK_NAME")),
+    (
+        "smtp",
+        ("SMTP_SERVER", "SMTP_SSL", "SMTP_EMAIL", "SMTP_PASSWORD", "SMTP_NAME"),
+    ),
+    ("pushme", ("PUSHME_KEY",)),
+    ("chronocat", ("CHRONOCAT_URL", "CHRONOCAT_QQ", "CHRONOCAT_TOKEN")),
+    ("custom_notify", ("WEBHOOK_URL", "WEBHOOK_METHOD")),
+]
+
+
+def configured_channels() -> list:
+    """
+    当前配置下可用的推送渠道名称。
+    """
+    return [name for name, keys in CHANNELS if all(push_config.get(key) for key in keys)]
 
 
 def add_notify_function():
-    notify_function = []
-    if push_config.get("BARK_PUSH"):
-        notify_function.append(bark)
-    if push_config.get("CONSOLE"):
-        notify_function.append(console)
-    if push_config.get("DD_BOT_TOKEN") and push_config.get("DD_BOT_SECRET"):
-        notify_function.append(dingding_bot)
-    if push_config.get("FSKEY"):
-        notify_function.append(feishu_bot)
-    if push_config.get("GOBOT_URL") and push_config.get("GOBOT_QQ"):
-        notify_function.append(go_cqhttp)
-    if push_config.get("GOTIFY_URL") and push_config.get("GOTIFY_TOKEN"):
-        notify_function.append(gotify)
-    if push_config.get("IGOT_PUSH_KEY"):
-        notify_function.append(iGot)
-    if push_config.get("PUSH_KEY"):
-        notify_function.append(serverJ)
-    if push_config.get("DEER_KEY"):
-        notify_function.append(pushdeer)
-    if push_config.get("CHAT_URL") and push_config.get("CHAT_TOKEN"):
-        notify_function.append(chat)
-    if push_config.get("PUSH_PLUS_TOKEN"):
-        notify_function.append(pushplus_bot)
-    if push_config.get("WE_PLUS_BOT_TOKEN"):
-        notify_function.append(weplus_bot)
-    if push_config.get("QMSG_KEY") and push_config.get("QMSG_TYPE"):
-        notify_function.append(qmsg_bot)
-    if push_config.get("QYWX_AM"):
-        notify_function.append(wecom_app)
-    if push_config.get("QYWX_KEY"):
-        notify_function.append(wecom_bot)
-    if push_config.get("TG_BOT_TOKEN") and push_config.get("TG_USER_ID"):
-        notify_function.append(telegram_bot)
-    if (
-        push_config.get("AIBOTK_KEY")
-        and push_config.get("AIBOTK_TYPE")
-        and push_config.get("AIBOTK_NAME")
-    ):
-        notify_function.append(aibotk)
-    if (
-        push_config.get("SMTP_SERVER")
-        and push_config.get("SMTP_SSL")
-        and push_config.get("SMTP_EMAIL")
-        and push_config.get("SMTP_PASSWORD")
-        and push_config.get("SMTP_NAME")
-    ):
-        notify_function.append(smtp)
-    if push_config.get("PUSHME_KEY"):
-        notify_function.append(pushme)
-    if (
-        push_config.get("CHRONOCAT_URL")
-        and push_config.get("CHRONOCAT_QQ")
-        and push_config.get("CHRONOCAT_TOKEN")
-    ):
-        notify_function.append(chronocat)
-    if push_config.get("WEBHOOK_URL") and push_config.get("WEBHOOK_METHOD"):
-        notify_function.append(custom_notify)
-
+    notify_function = [channel_function(name) for name in configured_channels()]
     if not notify_function:
         print(f"无推送渠道，请检查通知变量是否正确")
     return notify_function
 
 
-def send(title: str, content: str, ignore_default_config: bool = False, **kwargs):
+class Outbox:
+    """
+    持久化发件箱：每条消息按渠道拆成一行写入 SQLite，由后台线程池投递。
+    投递失败（抛出异常或渠道返回 False）按指数退避重试，超过 PUSH_RETRIES 次后
+    标记为 failed。多个进程可以共用同一个数据库，每条消息只会被一个进程取出，
+    且只由配置了该渠道的进程投递。已完成的消息保留 keep_days 天后删除。
+    """
+
+    # 投递中的消息超过该时间（秒）未完成，视为进程中断，重新投递
+    LEASE_SECONDS = 300
+    # 清理已完成消息的间隔（秒）
+    PRUNE_INTERVAL = 3600
+
+    def __init__(self, path: str, workers: int = 4, retries: int = 3, keep_days: float = 7):
+        self.path = path
+        self.workers = workers
+        self.retries = retries
+        self.keep_days = keep_days
+        self.pruned_at = 0.0
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.threads = []
+        self.sending = 0
+        import sqlite3
+
+        self.conn = sqlite3.connect(
+            path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idem_key TEXT UNIQUE,
+                channel TEXT NOT NULL,
+                title TEXT NOT NULL,
+                content TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_error TEXT
+            )
+            """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_at)"
+        )
+
+    def enqueue(self, channel: str, title: str, content: str, key: str) -> bool:
+        """
+        写入一条待投递消息，idem_key 已存在时忽略并返回 False。
+        """
+        now = time.time()
+        with self.cond:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO outbox (idem_key, channel, title, content, next_at, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, channel, title, content, now, now),
+            )
+            self.cond.notify()
+        return cursor.rowcount > 0
+
+    def start(self) -> None:
+        with self.lock:
+            if self.threads:
+                return
+            # 上次进程退出时仍在投递的消息重新排队
+            self.conn.execute(
+                "UPDATE outbox SET status = 'pending' WHERE status = 'sending' AND next_at < ?",
+                (time.time(),),
+            )
+            self.prune()
+            for i in range(self.workers):
+                t = threading.Thread(
+                    target=self._worker, name=f"notify-outbox-{i}", daemon=True
+                )
+                t.start()
+                self.threads.append(t)
+
+    def prune(self) -> int:
+        """
+        删除 keep_days 天前创建的已完成（sent/failed）消息，返回删除的行数。
+        """
+        self.pruned_at = time.time()
+        cursor = self.conn.execute(
+            "DELETE FROM outbox WHERE status IN ('sent', 'failed') AND created_at < ?",
+            (self.pruned_at - self.keep_days * 86400,),
+        )
+        return cursor.rowcount
+
+    def _claim(self):
+        """
+        取出一条本进程可投递的到期消息并标记为投递中，没有时返回 None。
+        其他进程可能同时取出同一条，以 UPDATE 的影响行数判断是否由本进程取得。
+        """
+        if time.time() - self.pruned_at > self.PRUNE_INTERVAL:
+            self.prune()
+        channels = configured_channels()
+        if not channels:
+            return None
+        marks = ", ".join("?" * len(channels))
+        while True:
+            now = time.time()
+            row = self.conn.execute(
+                "SELECT id, channel, title, content, attempts FROM outbox"
+                f" WHERE status = 'pending' AND next_at <= ? AND channel IN ({marks})"
+                " ORDER BY next_at LIMIT 1",
+                (now, *channels),
+            ).fetchone()
+            if row is None:
+                return None
+            cursor = self.conn.execute(
+                "UPDATE outbox SET status = 'sending', next_at = ? WHERE id = ? AND status = 'pending'",
+                (now + self.LEASE_SECONDS, row[0]),
+            )
+            if cursor.rowcount:
+                self.sending += 1
+                return row
+
+    def _next_due(self) -> float:
+        channels = configured_channels()
+        row = self.conn.execute(
+            "SELECT MIN(next_at) FROM outbox WHERE status = 'pending'"
+            f" AND channel IN ({', '.join('?' * len(channels))})",
+            channels,
+        ).fetchone()
+        return row[0] if row and row[0] is not None else time.time() + 60
+
+    def _worker(self) -> None:
+        while True:
+            with self.cond:
+                row = self._claim()
+                while row is None:
+                    self.cond.wait(max(0.05, min(60, self._next_due() - time.time())))
+                    row = self._claim()
+            msg_id, channel, title, content, attempts = row
+            error = None
+            try:
+                func = channel_function(channel)
+                if func is None:
+                    raise ValueError(f"未知的推送渠道 {channel}")
+                if func(title, content) is False:
+                    raise RuntimeError("渠道返回推送失败")
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            attempts += 1
+            with self.cond:
+                self.sending -= 1
+                if error is None:
+                    self.conn.execute(
+                        "UPDATE outbox SET status = 'sent', attempts = ?, last_error = NULL WHERE id = ?",
+                        (attempts, msg_id),
+                    )
+                elif attempts >= self.retries:
+                    print(f"{channel} 推送失败，已放弃：{error}")
+                    self.conn.execute(
+                        "UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                        (attempts, error, msg_id),
+                    )
+                else:
+                    delay = 5 * 2 ** (attempts - 1)
+                    print(f"{channel} 推送失败，{delay} 秒后重试：{error}")
+                    self.conn.execute(
+                        "UPDATE outbox SET status = 'pending', attempts = ?, last_error = ?, next_at = ? WHERE id = ?",
+                        (attempts, error, time.time() + delay, msg_id),
+                    )
+                self.cond.notify_all()
+
+    def pending(self) -> int:
+        """
+        尚未投递完成（等待、投递中或等待重试）的消息数。
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'sending')"
+            ).fetchone()
+        return row[0]
+
+    def flush(self, timeout: float) -> bool:
+        """
+        等待当前已到期的消息投递完成，返回是否全部完成。
+        """
+        deadline = time.time() + timeout
+        with self.cond:
+            while True:
+                due = self.conn.execute(
+                    "SELECT COUNT(*) FROM outbox WHERE status = 'pending' AND next_at <= ?",
+                    (time.time(),),
+                ).fetchone()[0]
+                if not due and not self.sending:
+                    return True
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self.cond.wait(min(remaining, 1))
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox() -> Outbox:
+    """
+    返回进程内唯一的发件箱，首次调用时创建并启动投递线程。
+    """
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = Outbox(
+                push_config.get("PUSH_OUTBOX") or "notify_outbox.db",
+                workers=int(push_config.get("PUSH_WORKERS") or 4),
+                retries=int(push_config.get("PUSH_RETRIES") or 3),
+                keep_days=float(push_config.get("PUSH_OUTBOX_KEEP_DAYS") or 7),
+            )
+            _outbox.start()
+        return _outbox
+
+
+def _flush_at_exit() -> None:
+    # 先发出未到时间窗口的摘要，再等待发件箱投递
+    flush_digests()
+    if _outbox is None:
+        return
+    timeout = float(push_config.get("PUSH_FLUSH_TIMEOUT") or 30)
+    _outbox.flush(timeout)
+    pending = _outbox.pending()
+    if pending:
+        print(f"仍有 {pending} 条通知未投递，将在下次运行时继续")
+
+
+def channel_function(name: str):
+    """
+    按名称查找推送渠道函数。
+    """
+    func = globals().get(name)
+    return func if callable(func) else None
+
+
+def make_idempotency_key(
+    channel: str, title: str, content: str, key: str = None, part: int = 0
+) -> str:
+    """
+    生成幂等键：调用方给出 key 时按 key 和拆分后的序号去重，
+    否则同一分钟内同渠道、同标题、同内容的消息只投递一次。
+    """
+    base = f"{key}\n{part}" if key else f"{title}\n{content}\n{int(time.time() // 60)}"
+    return hashlib.sha1(f"{channel}\n{base}".encode("utf-8")).hexdigest()
+
+
+# 各渠道单条消息的长度上限：(上限, 计量单位)
+CHANNEL_LIMITS = {
+    "bark": (3000, "bytes"),
+    "dingding_bot": (20000, "bytes"),
+    "telegram_bot": (4096, "chars"),
+    "wecom_app": (2048, "bytes"),
+    "wecom_bot": (2048, "bytes"),
+}
+
+
+def _measure(text: str, unit: str) -> int:
+    return len(text.encode("utf-8")) if unit == "bytes" else len(text)
+
+
+def _cut(text: str, limit: int, unit: str) -> str:
+    """
+    截取不超过 limit 的最长前缀。
+    """
+    if unit != "bytes":
+        return text[:limit]
+    return text.encode("utf-8")[:limit].decode("utf-8", "ignore")
+
+
+def split_content(title: str, content: str, channel: str) -> list:
+    """
+    按渠道长度上限把内容拆成多条，优先在换行处切分，返回 [(标题, 内容)]。
+    """
+    if channel not in CHANNEL_LIMITS:
+        return [(title, content)]
+    limit, unit = CHANNEL_LIMITS[channel]
+    # 渠道会发送 "标题\n\n内容"，并为 (i/n) 后缀预留空间
+    budget = limit - _measure(f"{title} (99/99)\n\n", unit)
+    if _measure(content, unit) <= limit - _measure(f"{title}\n\n", unit):
+        return [(title, content)]
+    if budget <= 0:
+        return [(title, _cut(content, max(limit // 2, 1), unit))]
+
+    # current 为 None 表示还没有正在拼接的一条，空字符串则是保留下来的空行
+    chunks, current = [], None
+    for line in content.split("\n"):
+        if _measure(line, unit) > budget:
+            # 单行超长时硬切，每段至少一个字符，预算小于单个字符的宽度时也能结束
+            if current is not None:
+                chunks.append(current)
+                current = None
+            while _measure(line, unit) > budget:
+                head = _cut(line, budget, unit) or line[0]
+                chunks.append(head)
+                line = line[len(head) :]
+            if not line:
+                continue
+        candidate = line if current is None else f"{current}\n{line}"
+        if _measure(candidate, unit) > budget:
+            chunks.append(current)
+            current = line
+        else:
+            current = candidate
+    if current is not None:
+        chunks.append(current)
+    total = len(chunks)
+    return [(f"{title} ({i}/{total})", chunk) for i, chunk in enumerate(chunks, 1)]
+
+
+class DigestBuffer:
+    """
+    按规则合并提醒：同一规则在时间窗口内的提醒汇总为一条摘要推送。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.groups = {}
+
+    def add(self, rule: str, title: str, content: str, window: float) -> None:
+        with self.lock:
+            group = self.groups.get(rule)
+            if group is None:
+                timer = threading.Timer(window, self.flush, args=(rule,))
+                timer.daemon = True
+                group = {"items": [], "timer": timer}
+                self.groups[rule] = group
+                timer.start()
+            group["items"].append((title, content))
+
+    def flush(self, rule: str = None) -> None:
+        """
+        立即发送指定规则（默认全部）的摘要。
+        """
+        with self.lock:
+            rules = [rule] if rule is not None else list(self.groups)
+            groups = [(r, self.groups.pop(r)) for r in rules if r in self.groups]
+        for r, group in groups:
+            group["timer"].cancel()
+            title, content = format_digest(r, group["items"])
+            send(title, content)
+
+
+def format_digest(rule: str, items: list) -> tuple:
+    """
+    把同一规则的多条提醒合成一条摘要，超过 PUSH_DIGEST_MAX_ITEMS 的只计数。
+    """
+    if len(items) == 1:
+        return items[0]
+    max_items = int(push_config.get("PUSH_DIGEST_MAX_ITEMS") or 50)
+    lines = [f"【{title}】{content}" for title, content in items[:max_items]]
+    if len(items) > max_items:
+        lines.append(f"……另有 {len(items) - max_items} 条")
+    return f"{rule}：{len(items)} 条提醒", "\n".join(lines)
+
+
+_digests = DigestBuffer()
+
+
+def alert(rule: str, title: str, content: str, window: float = None) -> None:
+    """
+    按规则合并推送：窗口内同一 rule 的提醒合并为一条摘要，
+    无论触发多少条，每个窗口每个渠道只推送一次（超长时按渠道上限拆分）。
+    """
+    if window is None:
+        window = float(push_config.get("PUSH_DIGEST_WINDOW") or 60)
+    _digests.add(rule, title, content, window)
+
+
+def flush_digests() -> None:
+    """
+    立即发送所有未到时间窗口的摘要。
+    """
+    _digests.flush()
+
+
+atexit.register(_flush_at_exit)
+
+
+def send(
+    title: str,
+    content: str,
+    ignore_default_config: bool = False,
+    idempotency_key: str = None,
+    **kwargs,
+):
     if kwargs:
         global push_config
         if ignore_default_config:
@@ -960,18 +1645,43 @@ def send(title: str, content: str, ignore_default_config: bool = False, **kwargs
             print(f"{title} 在SKIP_PUSH_TITLE环境变量内，跳过推送！")
             return
 
+    if not idempotency_key:
+        # 在追加一言之前按调用方的标题和内容生成，随机的一言不影响一分钟内的去重
+        idempotency_key = f"{title}\n{content}\n{int(time.time() // 60)}"
+
     hitokoto = push_config.get("HITOKOTO")
     content += "\n\n" + one() if hitokoto != "false" else ""
 
     notify_function = add_notify_function()
+    if str(push_config.get("PUSH_ASYNC")).lower() != "false":
+        # 写入发件箱后立即返回，由后台线程投递
+        outbox = get_outbox()
+        for mode in notify_function:
+            parts = split_content(title, content, mode.__name__)
+            for i, (part_title, part) in enumerate(parts):
+                key = make_idempotency_key(
+                    mode.__name__, part_title, part, idempotency_key, i
+                )
+                outbox.enqueue(mode.__name__, part_title, part, key)
+        return
+
     ts = [
-        threading.Thread(target=mode, args=(title, content), name=mode.__name__)
+        threading.Thread(
+            target=_send_parts,
+            args=(mode, split_content(title, content, mode.__name__)),
+            name=mode.__name__,
+        )
         for mode in notify_function
     ]
     [t.start() for t in ts]
     [t.join() for t in ts]
 
 
+def _send_parts(mode, parts: list) -> None:
+    for part_title, part in parts:
+        mode(part_title, part)
+
+
 def main():
     send("title", "content")
 